@@ -20,6 +20,26 @@ from src.core.logging import get_logger
 logger = get_logger("main")
 
 
+def _select_event_loop() -> str:
+    """优先使用 uvloop，不可用时（如 Windows）回退到 asyncio"""
+    try:
+        import uvloop  # noqa: F401
+
+        return "uvloop"
+    except ImportError:
+        return "asyncio"
+
+
+def _select_http_protocol() -> str:
+    """优先使用 httptools 解析 HTTP，不可用时回退到 h11"""
+    try:
+        import httptools  # noqa: F401
+
+        return "httptools"
+    except ImportError:
+        return "h11"
+
+
 def main():
     """
     主函数
@@ -47,13 +67,24 @@ def main():
         port=settings.api_port
     ))
     
-    logger.info(f"Starting server on {settings.api_host}:{settings.api_port}")
+    loop = _select_event_loop()
+    http = _select_http_protocol()
+    # 自动重载模式只支持单进程
+    workers = 1 if settings.debug else settings.api_workers
+
+    logger.info(
+        f"Starting server on {settings.api_host}:{settings.api_port} "
+        f"(loop={loop}, http={http}, workers={workers})"
+    )
     
     uvicorn.run(
         "src.api.app:app",
         host=settings.api_host,
         port=settings.api_port,
         reload=settings.debug,
+        workers=workers,
+        loop=loop,
+        http=http,
         log_level="info" if settings.debug else "warning",
         access_log=settings.debug,
     )
@@ -1,26 +1,40 @@
 # Agent module
-from .orchestrator import AgentOrchestrator
-from .schemas.task import Task, TaskPlan, TaskStep
-from .tool_recorder import (ToolCallEntry, ToolRecorder, get_tool_recorder,
-                            record_tool_call)
-from .tracer import (AgentTracer, TraceEvent, TraceEventType, create_tracer,
-                     get_tracer, set_tracer)
+# 导出项按需加载（PEP 562），导入 src.agent.tracer 等子模块时不会拉起整个 Agent 子系统
+from typing import TYPE_CHECKING
 
-__all__ = [
-    "AgentOrchestrator",
-    "Task",
-    "TaskStep",
-    "TaskPlan",
+from src.core.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .orchestrator import AgentOrchestrator
+    from .schemas.task import Task, TaskPlan, TaskStep
+    from .tool_recorder import (SQLiteToolRecorder, ToolCallEntry,
+                                ToolRecorder, get_tool_recorder,
+                                record_tool_call)
+    from .tracer import (AgentTracer, TraceEvent, TraceEventType,
+                         create_tracer, get_latest_tracer, get_tracer,
+                         set_tracer)
+
+_LAZY_EXPORTS = {
+    "AgentOrchestrator": ".orchestrator",
+    "Task": ".schemas.task",
+    "TaskStep": ".schemas.task",
+    "TaskPlan": ".schemas.task",
     # Tracer
-    "AgentTracer",
-    "TraceEventType",
-    "TraceEvent",
-    "create_tracer",
-    "get_tracer",
-    "set_tracer",
+    "AgentTracer": ".tracer",
+    "TraceEventType": ".tracer",
+    "TraceEvent": ".tracer",
+    "create_tracer": ".tracer",
+    "get_tracer": ".tracer",
+    "get_latest_tracer": ".tracer",
+    "set_tracer": ".tracer",
     # Tool Recorder
-    "ToolRecorder",
-    "ToolCallEntry",
-    "get_tool_recorder",
-    "record_tool_call",
-]
+    "ToolRecorder": ".tool_recorder",
+    "SQLiteToolRecorder": ".tool_recorder",
+    "ToolCallEntry": ".tool_recorder",
+    "get_tool_recorder": ".tool_recorder",
+    "record_tool_call": ".tool_recorder",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _LAZY_EXPORTS)
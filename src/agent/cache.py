@@ -0,0 +1,168 @@
+"""
+LLM 响应缓存
+
+为 Planner / Reasoner 的 LLM 调用提供两级缓存：
+- 第一级：提示词哈希精确匹配
+- 第二级：语义相似度匹配（需要提供 Embedder）
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.core.logging import get_logger
+
+if TYPE_CHECKING:
+    from src.rag.embedder import Embedder
+
+logger = get_logger("agent.cache")
+
+
+class SemanticResponseCache:
+    """
+    语义响应缓存
+
+    - 精确匹配：按提示词的 sha256 查找
+    - 语义匹配：对 semantic_text 做向量化，在同一分区内余弦相似度超过阈值即命中
+      （分区用于隔离上下文不同的条目，例如不同的对话历史或执行结果）
+    - 两级共用同一个 LRU 容量，条目可设置过期时间
+    """
+
+    def __init__(
+        self,
+        embedder: Optional["Embedder"] = None,
+        maxsize: int = 256,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: Optional[float] = None,
+    ):
+        """
+        初始化缓存
+
+        Args:
+            embedder: 向量化器，为空时只做精确匹配
+            maxsize: 最大缓存条目数
+            similarity_threshold: 语义命中的最小余弦相似度
+            ttl_seconds: 过期时间（秒），为空则不过期
+        """
+        self.embedder = embedder
+        self.maxsize = maxsize
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (response, 分区, 归一化向量或 None, 写入时间)
+        self._entries: (
+            "OrderedDict[str, Tuple[str, str, Optional[np.ndarray], float]]"
+        ) = OrderedDict()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """根据提示词各部分生成精确匹配键"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _remove_expired(self) -> None:
+        """移除已过期的条目"""
+        if self.ttl_seconds is None:
+            return
+        deadline = time.monotonic() - self.ttl_seconds
+        expired = [k for k, entry in self._entries.items() if entry[3] <= deadline]
+        for key in expired:
+            del self._entries[key]
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        """向量化并归一化，失败时返回 None"""
+        if self.embedder is None or not text:
+            return None
+        try:
+            vector = np.asarray(await self.embedder.embed_text(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    async def get(
+        self, key: str, semantic_text: str = None, partition: str = ""
+    ) -> Optional[str]:
+        """
+        查找缓存
+
+        Args:
+            key: 精确匹配键
+            semantic_text: 用于语义匹配的文本
+            partition: 语义匹配分区
+
+        Returns:
+            缓存的响应，未命中返回 None
+        """
+        self._remove_expired()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[0]
+
+        query_vector = await self._embed(semantic_text) if semantic_text else None
+        if query_vector is not None:
+            keys = [
+                k
+                for k, (_, part, vec, _) in self._entries.items()
+                if vec is not None and part == partition
+            ]
+            if keys:
+                matrix = np.stack([self._entries[k][2] for k in keys])
+                scores = matrix @ query_vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    best_key = keys[best]
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    logger.debug(f"Semantic cache hit (score={scores[best]:.3f})")
+                    return self._entries[best_key][0]
+
+        self.misses += 1
+        return None
+
+    async def put(
+        self, key: str, response: str, semantic_text: str = None, partition: str = ""
+    ) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 精确匹配键
+            response: LLM 响应
+            semantic_text: 用于语义匹配的文本
+            partition: 语义匹配分区
+        """
+        vector = await self._embed(semantic_text) if semantic_text else None
+        self._entries[key] = (response, partition, vector, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
@@ -4,6 +4,7 @@
 """
 
 import asyncio
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any, Dict, Optional
 
 from src.core.exceptions import ExecutionException
@@ -11,6 +12,8 @@ from src.core.logging import get_logger
 
 from .schemas.task import StepStatus, TaskPlan, TaskStep
 from .skill_selector import SkillSelector
+from .tool_cache import NO_CACHE_FLAG, CachedToolClient, ToolRunCache
+from .tool_pool import BoundedToolClient
 
 if TYPE_CHECKING:
     from src.mcp.client import MCPClient
@@ -19,6 +22,22 @@ if TYPE_CHECKING:
 logger = get_logger("agent.executor")
 
 
+@dataclass(slots=True)
+class _PlanRun:
+    """
+    单次规划执行的状态
+
+    每次 execute_plan 独立创建，同一执行器上并发执行的规划互不影响
+
+    Attributes:
+        plan_context: 规划级别的上下文（同一规划内各步骤共享）
+        mcp_client: 带本次执行专属工具结果缓存的客户端
+    """
+
+    plan_context: Dict[str, Any]
+    mcp_client: CachedToolClient
+
+
 class Executor:
     """
     任务执行器
@@ -30,17 +49,52 @@ class Executor:
     - 收集和整合执行结果
     """
 
-    def __init__(self, skill_selector: SkillSelector, mcp_client: "MCPClient"):
+    def __init__(
+        self,
+        skill_selector: SkillSelector,
+        mcp_client: "MCPClient",
+        tool_cache_size: int = 512,
+        tool_cache_ttl: Optional[float] = 30.0,
+        max_parallel_steps: Optional[int] = None,
+        tool_concurrency: Optional[Dict[str, int]] = None,
+        default_tool_concurrency: int = 4,
+        max_concurrent_tools: Optional[int] = None,
+        tool_timeout: Optional[float] = None,
+    ):
         """
         初始化执行器
 
         Args:
             skill_selector: 技能选择器
             mcp_client: MCP 客户端
+            tool_cache_size: 工具调用缓存最大条目数
+            tool_cache_ttl: 工具调用缓存过期时间（秒），为空则不过期
+            max_parallel_steps: 同时执行的最大步骤数，为空则不限制
+            tool_concurrency: 各工具的最大并发调用数
+            default_tool_concurrency: 未单独配置的工具的最大并发调用数
+            max_concurrent_tools: 全部工具的最大并发调用数，为空则不限制
+            tool_timeout: 单次工具调用超时（秒），为空则不限制
         """
         self.skill_selector = skill_selector
         self.mcp_client = mcp_client
-        self._execution_context: Dict[str, Any] = {}
+        self._tool_cache_size = tool_cache_size
+        self._tool_cache_ttl = tool_cache_ttl
+        # 直接调用 call_tool 时使用的缓存；执行规划时每次使用独立的缓存
+        self._tool_cache = ToolRunCache(
+            maxsize=tool_cache_size, ttl_seconds=tool_cache_ttl
+        )
+        # 缓存命中直接返回，未命中的调用才占用并发名额
+        self._bounded_client = BoundedToolClient(
+            mcp_client,
+            tool_concurrency=tool_concurrency,
+            default_concurrency=default_tool_concurrency,
+            max_concurrent=max_concurrent_tools,
+            timeout=tool_timeout,
+        )
+        self._cached_client = CachedToolClient(self._bounded_client, self._tool_cache)
+        self._step_semaphore = (
+            asyncio.Semaphore(max_parallel_steps) if max_parallel_steps else None
+        )
         logger.debug("Executor initialized")
 
     async def execute_plan(
@@ -58,70 +112,172 @@ class Executor:
         """
         logger.info(f"Executing plan: {plan.plan_id} with {len(plan.steps)} steps")
 
-        self._execution_context = context or {}
+        # 工具结果缓存只在同一规划内复用，天气、车票等实时数据不跨请求共享
+        run = self._start_run(plan, context)
         results = []
 
-        while not plan.is_completed() and not plan.has_failed():
-            next_step = plan.get_next_step()
-            if not next_step:
-                logger.warning("No executable step found, breaking loop")
-                break
-
-            try:
-                result = await self.execute_step(next_step, plan)
-                results.append(
-                    {
-                        "step_id": next_step.step_id,
-                        "description": next_step.description,
-                        "result": result,
-                        "status": "completed",
-                    }
-                )
-            except Exception as e:
-                logger.error(f"Step {next_step.step_id} failed: {str(e)}")
+        # 存在循环依赖时直接判定规划失败，不执行任何步骤
+        blocked = plan.get_blocked_steps()
+        if blocked:
+            error = "步骤依赖存在循环，无法执行"
+            logger.error(
+                f"Plan {plan.plan_id} has cyclic dependencies: "
+                f"{[step.step_id for step in blocked]}"
+            )
+            for step in blocked:
+                step.status = StepStatus.FAILED
+                step.error = error
                 results.append(
                     {
-                        "step_id": next_step.step_id,
-                        "description": next_step.description,
-                        "error": str(e),
+                        "step_id": step.step_id,
+                        "description": step.description,
+                        "error": error,
                         "status": "failed",
                     }
                 )
-                # 失败后不再继续执行后续步骤
+            return {
+                "plan_id": plan.plan_id,
+                "goal": plan.goal,
+                "completed": False,
+                "steps_results": results,
+                "final_result": results[-1],
+            }
+
+        # 增量维护未完成步骤数，避免每轮扫描全部步骤
+        remaining = sum(
+            1
+            for step in plan.steps
+            if step.status not in (StepStatus.COMPLETED, StepStatus.SKIPPED)
+        )
+        failed = False
+
+        # 按依赖图驱动：TaskPlan 维护就绪队列，步骤完成时推进后继步骤
+        while True:
+            ready_steps = plan.get_ready_steps()
+            if not ready_steps:
+                break
+
+            # 无相互依赖的步骤并发执行
+            tasks = [
+                asyncio.create_task(self._execute_step_bounded(step, plan, run))
+                for step in ready_steps
+            ]
+            done, pending = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_EXCEPTION
+            )
+
+            # 任一步骤失败则取消同批次仍在执行的步骤
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+            completed_steps = []
+            for step, task in zip(ready_steps, tasks):
+                if task in pending:
+                    step.status = StepStatus.PENDING
+                    continue
+
+                error = task.exception()
+                if error is None:
+                    results.append(
+                        {
+                            "step_id": step.step_id,
+                            "description": step.description,
+                            "result": task.result(),
+                            "status": "completed",
+                        }
+                    )
+                    completed_steps.append(step)
+                    remaining -= 1
+                else:
+                    logger.error(f"Step {step.step_id} failed: {str(error)}")
+                    results.append(
+                        {
+                            "step_id": step.step_id,
+                            "description": step.description,
+                            "error": str(error),
+                            "status": "failed",
+                        }
+                    )
+                    failed = True
+
+            # 失败后不再继续执行后续步骤
+            if failed:
                 break
 
+            # 更新后继步骤的未完成依赖数
+            for step in completed_steps:
+                plan.mark_completed(step.step_id)
+
+        completed = not failed and remaining == 0
+        if not failed and not completed:
+            logger.warning("No executable step found, breaking loop")
+
         return {
             "plan_id": plan.plan_id,
             "goal": plan.goal,
-            "completed": plan.is_completed(),
+            "completed": completed,
             "steps_results": results,
             "final_result": results[-1] if results else None,
         }
 
-    async def execute_step(self, step: TaskStep, plan: TaskPlan) -> Any:
+    def _start_run(
+        self, plan: TaskPlan, context: Optional[Dict[str, Any]] = None
+    ) -> _PlanRun:
+        """创建一次规划执行的上下文与工具结果缓存"""
+        tool_cache = ToolRunCache(
+            maxsize=self._tool_cache_size, ttl_seconds=self._tool_cache_ttl
+        )
+        return _PlanRun(
+            plan_context={
+                "original_query": plan.original_query,
+                "goal": plan.goal,
+                "total_steps": len(plan.steps),
+                # 合并全局执行上下文
+                **(context or {}),
+            },
+            mcp_client=CachedToolClient(self._bounded_client, tool_cache),
+        )
+
+    async def _execute_step_bounded(
+        self, step: TaskStep, plan: TaskPlan, run: _PlanRun
+    ) -> Any:
+        """在并发上限内执行步骤"""
+        if self._step_semaphore is None:
+            return await self.execute_step(step, plan, run)
+        async with self._step_semaphore:
+            return await self.execute_step(step, plan, run)
+
+    async def execute_step(
+        self, step: TaskStep, plan: TaskPlan, run: Optional[_PlanRun] = None
+    ) -> Any:
         """
         执行单个步骤
 
         Args:
             step: 任务步骤
             plan: 所属的任务规划
+            run: 所属的规划执行，为空则单独创建
 
         Returns:
             步骤执行结果
         """
         logger.info(f"Executing step {step.step_id}: {step.description}")
         step.status = StepStatus.RUNNING
+        if run is None:
+            run = self._start_run(plan)
 
         try:
             # 获取前置步骤的结果作为上下文
-            step_context = self._get_step_context(step, plan)
+            step_context = self._get_step_context(step, plan, run)
 
             # 选择技能
             skill = self.skill_selector.select_skill(step.skill_name)
 
             # 执行技能
             result = await self._execute_skill(
-                skill=skill, step=step, context=step_context
+                skill=skill, step=step, context=step_context, run=run
             )
 
             # 更新步骤状态
@@ -137,11 +293,15 @@ class Executor:
             logger.error(f"Step {step.step_id} failed: {str(e)}")
             raise ExecutionException(
                 message=f"步骤 {step.step_id} 执行失败: {str(e)}",
-                details={"step": step.dict()},
+                details={"step": step.to_dict()},
             )
 
     async def _execute_skill(
-        self, skill: "BaseSkill", step: TaskStep, context: Dict[str, Any]
+        self,
+        skill: "BaseSkill",
+        step: TaskStep,
+        context: Dict[str, Any],
+        run: _PlanRun,
     ) -> Any:
         """
         执行技能
@@ -150,17 +310,25 @@ class Executor:
             skill: 技能实例
             step: 任务步骤
             context: 执行上下文
+            run: 所属的规划执行
 
         Returns:
             技能执行结果
         """
+        # 有副作用的工具可通过 __no_cache__ 跳过缓存
+        tool_params = step.tool_params
+        mcp_client = run.mcp_client
+        if tool_params.get(NO_CACHE_FLAG):
+            tool_params = {k: v for k, v in tool_params.items() if k != NO_CACHE_FLAG}
+            mcp_client = self._bounded_client
+
         # 准备技能执行参数
         execution_params = {
             "description": step.description,
             "tool_name": step.tool_name,
-            "tool_params": step.tool_params,
+            "tool_params": tool_params,
             "context": context,
-            "mcp_client": self.mcp_client,
+            "mcp_client": mcp_client,
         }
 
         # 调用技能的 execute 方法
@@ -168,41 +336,42 @@ class Executor:
 
         return result
 
-    def _get_step_context(self, step: TaskStep, plan: TaskPlan) -> Dict[str, Any]:
+    def _get_step_context(
+        self, step: TaskStep, plan: TaskPlan, run: _PlanRun
+    ) -> Dict[str, Any]:
         """
         获取步骤执行上下文
 
         Args:
             step: 当前步骤
             plan: 任务规划
+            run: 所属的规划执行
 
         Returns:
             上下文字典
         """
-        context = {
-            "original_query": plan.original_query,
-            "goal": plan.goal,
-            "current_step_id": step.step_id,
-            "total_steps": len(plan.steps),
-            "previous_results": {},
-        }
+        steps = plan.steps
 
         # 添加依赖步骤的结果
+        previous_results = {}
         for dep_id in step.depends_on:
-            if dep_id <= len(plan.steps):
-                dep_step = plan.steps[dep_id - 1]
+            if dep_id <= len(steps):
+                dep_step = steps[dep_id - 1]
                 if dep_step.status == StepStatus.COMPLETED:
-                    context["previous_results"][dep_id] = dep_step.result
-
-        # 合并全局执行上下文
-        context.update(self._execution_context)
+                    previous_results[dep_id] = dep_step.result
 
-        return context
+        return {
+            "current_step_id": step.step_id,
+            "previous_results": previous_results,
+            **run.plan_context,
+        }
 
     async def call_tool(self, tool_name: str, params: Dict[str, Any]) -> Any:
         """
         直接调用 MCP 工具
 
+        相同工具名和参数的调用结果会被缓存，参数中带 __no_cache__ 时跳过缓存
+
         Args:
             tool_name: 工具名称
             params: 工具参数
@@ -211,9 +380,9 @@ class Executor:
             工具执行结果
         """
         logger.debug(f"Calling tool: {tool_name} with params: {params}")
-        return await self.mcp_client.call_tool(tool_name, params)
+        return await self._cached_client.call_tool(tool_name, params)
 
     def reset_context(self) -> None:
-        """重置执行上下文"""
-        self._execution_context = {}
+        """清空直接调用 call_tool 时的工具结果缓存"""
+        self._tool_cache.clear()
         logger.debug("Execution context reset")
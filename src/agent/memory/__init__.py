@@ -1,6 +1,20 @@
 # Memory module
-from .long_term import LongTermMemory
-from .manager import MemoryManager
-from .short_term import ShortTermMemory
+# 导出项按需加载（PEP 562）
+from typing import TYPE_CHECKING
 
-__all__ = ["ShortTermMemory", "LongTermMemory", "MemoryManager"]
+from src.core.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .long_term import LongTermMemory
+    from .manager import MemoryManager
+    from .short_term import ShortTermMemory
+
+_LAZY_EXPORTS = {
+    "ShortTermMemory": ".short_term",
+    "LongTermMemory": ".long_term",
+    "MemoryManager": ".manager",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _LAZY_EXPORTS)
@@ -3,15 +3,28 @@
 存储跨会话的持久化信息
 """
 
+import heapq
+import itertools
+import re
+import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
+from src.core.clock import now
 from src.core.logging import get_logger
 
 logger = get_logger("memory.long_term")
 
+# 分词：英文/数字按词，中文按单字
+_TOKEN_PATTERN = re.compile(r"[a-z0-9_]+|[\u4e00-\u9fff]")
+
+
+def _tokenize(text: str) -> FrozenSet[str]:
+    """将文本切分为词元集合"""
+    return frozenset(_TOKEN_PATTERN.findall(text.lower()))
+
 
 class MemoryEntry(BaseModel):
     """记忆条目"""
@@ -20,11 +33,14 @@ class MemoryEntry(BaseModel):
     content: str
     category: str = "general"  # general, fact, preference, task_history
     importance: float = 0.5  # 0-1 重要性评分
-    created_at: datetime = Field(default_factory=datetime.now)
-    accessed_at: datetime = Field(default_factory=datetime.now)
+    created_at: datetime = Field(default_factory=now)
+    accessed_at: datetime = Field(default_factory=now)
     access_count: int = 0
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
+    # 写入时预先计算的词元集合，用于相关性匹配
+    _tokens: FrozenSet[str] = PrivateAttr(default=frozenset())
+
 
 class LongTermMemory:
     """
@@ -39,11 +55,13 @@ class LongTermMemory:
     def __init__(self):
         """初始化长期记忆"""
         self._memories: Dict[str, MemoryEntry] = {}
-        self._memory_index: Dict[str, List[str]] = {
-            "general": [],
-            "fact": [],
-            "preference": [],
-            "task_history": [],
+        self._id_counter = itertools.count()
+        # 类别 -> 有序 ID 集合（dict 保持插入顺序，删除为 O(1)）
+        self._memory_index: Dict[str, Dict[str, None]] = {
+            "general": {},
+            "fact": {},
+            "preference": {},
+            "task_history": {},
         }
         logger.debug("LongTermMemory initialized")
 
@@ -66,9 +84,7 @@ class LongTermMemory:
         Returns:
             记忆条目ID
         """
-        entry_id = (
-            f"mem_{datetime.now().strftime('%Y%m%d%H%M%S')}_{len(self._memories)}"
-        )
+        entry_id = f"mem_{next(self._id_counter)}_{time.time_ns()}"
         entry = MemoryEntry(
             entry_id=entry_id,
             content=content,
@@ -76,12 +92,10 @@ class LongTermMemory:
             importance=importance,
             metadata=metadata or {},
         )
+        entry._tokens = _tokenize(content)
 
         self._memories[entry_id] = entry
-        if category in self._memory_index:
-            self._memory_index[category].append(entry_id)
-        else:
-            self._memory_index[category] = [entry_id]
+        self._memory_index.setdefault(category, {})[entry_id] = None
 
         logger.debug(f"Stored memory: {entry_id} in category '{category}'")
         return entry_id
@@ -104,24 +118,29 @@ class LongTermMemory:
             记忆条目列表
         """
         if category:
-            entry_ids = self._memory_index.get(category, [])
+            entry_ids = self._memory_index.get(category, {}).keys()
         else:
-            entry_ids = list(self._memories.keys())
+            entry_ids = self._memories.keys()
 
-        # 获取并过滤
-        entries = []
-        for eid in entry_ids:
-            entry = self._memories.get(eid)
-            if entry and entry.importance >= min_importance:
-                # 更新访问信息
-                entry.accessed_at = datetime.now()
-                entry.access_count += 1
-                entries.append(entry)
+        # 获取并过滤（不修改条目）；用生成器逐条送入堆，不构建中间列表
+        candidates = (
+            entry
+            for entry in (self._memories.get(eid) for eid in entry_ids)
+            if entry and entry.importance >= min_importance
+        )
+
+        # 按重要性和访问时间取前 limit 条（堆大小始终不超过 limit）
+        top = heapq.nlargest(
+            limit, candidates, key=lambda e: (e.importance, e.accessed_at)
+        )
 
-        # 按重要性和访问时间排序
-        entries.sort(key=lambda e: (e.importance, e.accessed_at), reverse=True)
+        # 只更新实际返回条目的访问信息
+        accessed_at = now()
+        for entry in top:
+            entry.accessed_at = accessed_at
+            entry.access_count += 1
 
-        return entries[:limit]
+        return top
 
     def get_by_id(self, entry_id: str) -> Optional[MemoryEntry]:
         """根据ID获取记忆"""
@@ -139,7 +158,7 @@ class LongTermMemory:
         if entry_id in self._memories:
             entry = self._memories.pop(entry_id)
             if entry.category in self._memory_index:
-                self._memory_index[entry.category].remove(entry_id)
+                self._memory_index[entry.category].pop(entry_id, None)
             logger.debug(f"Deleted memory: {entry_id}")
             return True
         return False
@@ -174,7 +193,7 @@ class LongTermMemory:
         """
         获取与查询相关的历史记录
 
-        注：当前使用简单的关键词匹配，生产环境应使用向量检索
+        注：当前使用词元集合的 Jaccard 相似度，生产环境应使用向量检索
 
         Args:
             query: 查询内容
@@ -183,15 +202,32 @@ class LongTermMemory:
         Returns:
             相关历史内容列表
         """
-        # 简单实现：返回最近的任务历史
-        entries = self.retrieve(category="task_history", limit=limit)
+        query_tokens = _tokenize(query)
+
+        def score(entry: MemoryEntry):
+            tokens = entry._tokens
+            union = len(query_tokens | tokens)
+            similarity = len(query_tokens & tokens) / union if union else 0.0
+            # 相似度相同时优先返回较新的记录
+            return similarity, entry.created_at
+
+        entry_ids = self._memory_index.get("task_history", {})
+        entries = heapq.nlargest(
+            limit, (self._memories[eid] for eid in entry_ids), key=score
+        )
+
+        accessed_at = now()
+        for entry in entries:
+            entry.accessed_at = accessed_at
+            entry.access_count += 1
+
         return [e.content for e in entries]
 
     def clear(self) -> None:
         """清空所有记忆"""
         self._memories.clear()
-        for key in self._memory_index:
-            self._memory_index[key] = []
+        for entry_ids in self._memory_index.values():
+            entry_ids.clear()
         logger.debug("LongTermMemory cleared")
 
     def get_stats(self) -> Dict[str, Any]:
@@ -5,6 +5,7 @@
 
 from typing import Any, Dict, List, Optional
 
+from src.core.config import settings
 from src.core.logging import get_logger
 
 from ..schemas.message import Message, MessageRole
@@ -13,6 +14,17 @@ from .short_term import ShortTermMemory
 
 logger = get_logger("memory.manager")
 
+# 早期对话摘要提示词
+SUMMARY_PROMPT = """请将以下对话压缩为一段简洁的摘要，保留用户的关键信息、需求和已得到的结论。
+
+## 已有摘要
+{previous_summary}
+
+## 新增对话
+{conversation}
+
+请直接输出更新后的摘要："""
+
 
 class MemoryManager:
     """
@@ -23,7 +35,11 @@ class MemoryManager:
     """
 
     def __init__(
-        self, short_term: ShortTermMemory = None, long_term: LongTermMemory = None
+        self,
+        short_term: ShortTermMemory = None,
+        long_term: LongTermMemory = None,
+        context_window: int = None,
+        summary_trigger_chars: int = None,
     ):
         """
         初始化记忆管理器
@@ -31,9 +47,19 @@ class MemoryManager:
         Args:
             short_term: 短期记忆实例
             long_term: 长期记忆实例
+            context_window: 上下文中逐字保留的最近消息数
+            summary_trigger_chars: 窗口外未摘要的对话达到该字符数时才更新摘要
         """
         self.short_term = short_term or ShortTermMemory()
         self.long_term = long_term or LongTermMemory()
+        self.context_window = context_window or settings.context_window_messages
+        self.summary_trigger_chars = (
+            summary_trigger_chars or settings.summary_trigger_chars
+        )
+
+        # 滚动摘要：覆盖序号小于 _summarized_upto 的消息
+        self._summary = ""
+        self._summarized_upto = 0
         logger.debug("MemoryManager initialized")
 
     def add_user_input(self, content: str) -> Message:
@@ -73,33 +99,88 @@ class MemoryManager:
         """
         return self.short_term.get_messages_for_llm()
 
-    def get_enhanced_context(self, current_query: str) -> Dict[str, Any]:
+    def get_enhanced_context(
+        self,
+        current_query: str,
+        include_history: bool = True,
+        include_preferences: bool = True,
+        include_messages: bool = True,
+        history_limit: int = 3,
+    ) -> Dict[str, Any]:
         """
         获取增强上下文
         包含短期记忆 + 相关的长期记忆
 
         Args:
             current_query: 当前查询
+            include_history: 是否检索相关历史任务
+            include_preferences: 是否检索用户偏好
+            include_messages: 是否包含 LLM 格式的消息列表
+            history_limit: 相关历史任务数量
 
         Returns:
-            增强上下文字典
+            增强上下文字典（未启用的部分为空列表）
         """
-        # 短期对话历史
-        conversation = self.short_term.get_context_summary()
+        # 短期对话历史：较早对话的摘要在前（稳定，利于前缀缓存），最近消息在后
+        conversation = self.short_term.get_context_summary(self.context_window)
+        if self._summary:
+            conversation = f"[早前对话摘要]\n{self._summary}\n\n{conversation}"
 
         # 相关历史记录
-        relevant_history = self.long_term.get_relevant_history(current_query, limit=3)
+        relevant_history = (
+            self.long_term.get_relevant_history(current_query, limit=history_limit)
+            if include_history
+            else []
+        )
 
         # 用户偏好
-        preferences = self.long_term.retrieve(category="preference", limit=5)
+        preferences = (
+            self.long_term.retrieve(category="preference", limit=5)
+            if include_preferences
+            else []
+        )
 
         return {
             "conversation_history": conversation,
             "relevant_past_tasks": relevant_history,
             "user_preferences": [p.content for p in preferences],
-            "messages_for_llm": self.get_conversation_context(),
+            "messages_for_llm": (
+                self.get_conversation_context() if include_messages else []
+            ),
         }
 
+    async def refresh_summary(self, llm) -> bool:
+        """
+        将滑出上下文窗口的对话合并进滚动摘要
+
+        只有未摘要的窗口外对话达到 summary_trigger_chars 时才调用 LLM，
+        否则沿用已有摘要
+
+        Args:
+            llm: LLM 实例
+
+        Returns:
+            是否更新了摘要
+        """
+        pending = self.short_term.get_messages_before_window(
+            self.context_window, since=self._summarized_upto
+        )
+        if sum(len(m.content) for m in pending) < self.summary_trigger_chars:
+            return False
+        # 等待 LLM 期间可能有新消息加入，覆盖范围以发起摘要时为准
+        upto = self.short_term.added_count - self.context_window
+
+        prompt = SUMMARY_PROMPT.format(
+            previous_summary=self._summary or "（无）",
+            conversation=ShortTermMemory.format_messages(pending),
+        )
+        self._summary = await llm.chat(
+            messages=[{"role": "user", "content": prompt}], temperature=0.2
+        )
+        self._summarized_upto = upto
+        logger.debug(f"Conversation summary refreshed ({len(pending)} messages)")
+        return True
+
     def save_task_result(self, task_id: str, query: str, result: str) -> None:
         """
         保存任务结果到长期记忆
@@ -125,6 +206,8 @@ class MemoryManager:
     def clear_conversation(self) -> None:
         """清空当前对话（短期记忆）"""
         self.short_term.clear()
+        self._summary = ""
+        self._summarized_upto = 0
         logger.debug("Conversation cleared")
 
     def get_memory_stats(self) -> Dict[str, Any]:
@@ -4,7 +4,8 @@
 """
 
 from collections import deque
-from typing import Any, Dict, List, Optional
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
 
 from src.core.config import settings
 from src.core.logging import get_logger
@@ -13,6 +14,10 @@ from ..schemas.message import Message, MessageRole
 
 logger = get_logger("memory.short_term")
 
+# 上下文摘要中的角色前缀
+_USER_PREFIX = "用户: "
+_ASSISTANT_PREFIX = "助手: "
+
 
 class ShortTermMemory:
     """
@@ -32,6 +37,8 @@ class ShortTermMemory:
         self.max_messages = max_messages or settings.max_history_length
         self._messages: deque[Message] = deque(maxlen=self.max_messages)
         self._system_message: Optional[Message] = None
+        # 累计加入的非系统消息数量，用于定位滑动窗口外的消息
+        self._added_count = 0
         logger.debug(
             f"ShortTermMemory initialized with max_messages={self.max_messages}"
         )
@@ -43,12 +50,17 @@ class ShortTermMemory:
         Args:
             message: 消息对象
         """
+        # 入队时预先生成 LLM 格式与摘要预览，避免每次读取重复转换
+        message.get_llm_format()
+        message.get_preview()
+
         if message.role == MessageRole.SYSTEM:
             # 系统消息单独存储，不受滑动窗口限制
             self._system_message = message
             logger.debug("System message updated")
         else:
             self._messages.append(message)
+            self._added_count += 1
             logger.debug(f"Added {message.role} message, total: {len(self._messages)}")
 
     def add_user_message(self, content: str) -> Message:
@@ -73,10 +85,10 @@ class ShortTermMemory:
         Returns:
             消息列表
         """
-        messages = []
-        if include_system and self._system_message:
-            messages.append(self._system_message)
-        messages.extend(list(self._messages))
+        messages = (
+            [self._system_message] if include_system and self._system_message else []
+        )
+        messages.extend(self._messages)
         return messages
 
     def get_messages_for_llm(self) -> List[Dict[str, Any]]:
@@ -86,7 +98,18 @@ class ShortTermMemory:
         Returns:
             LLM 格式的消息列表
         """
-        return [msg.to_llm_format() for msg in self.get_messages()]
+        return [msg.get_llm_format() for msg in self.get_messages()]
+
+    def get_messages_json(self) -> bytes:
+        """
+        获取 LLM 格式消息列表的 JSON 字节串
+
+        复用每条消息缓存的编码结果，只做拼接
+
+        Returns:
+            JSON 数组字节串
+        """
+        return b"[" + b",".join(m.get_llm_bytes() for m in self.get_messages()) + b"]"
 
     def get_last_n_messages(self, n: int) -> List[Message]:
         """
@@ -98,37 +121,66 @@ class ShortTermMemory:
         Returns:
             消息列表
         """
-        messages = list(self._messages)
-        return messages[-n:] if n < len(messages) else messages
+        total = len(self._messages)
+        return list(islice(self._messages, max(0, total - n), total))
+
+    @property
+    def added_count(self) -> int:
+        """累计加入的非系统消息数量（清空后归零）"""
+        return self._added_count
 
-    def get_context_summary(self) -> str:
+    def get_context_summary(self, window: int = 5) -> str:
         """
         获取上下文摘要
         用于传递给 Planner 做任务规划
 
+        Args:
+            window: 包含的最近消息数量
+
         Returns:
             上下文摘要字符串
         """
-        messages = self.get_last_n_messages(5)
-        summary_parts = []
-        for msg in messages:
-            role = "用户" if msg.role == MessageRole.USER else "助手"
-            # 截断过长的内容
-            content = (
-                msg.content[:200] + "..." if len(msg.content) > 200 else msg.content
-            )
-            summary_parts.append(f"{role}: {content}")
-        return "\n".join(summary_parts)
+        total = len(self._messages)
+        recent = islice(self._messages, max(0, total - window), total)
+        return self.format_messages(recent)
+
+    def get_messages_before_window(self, window: int, since: int = 0) -> List[Message]:
+        """
+        获取最近 window 条之前、且序号不小于 since 的消息
+
+        Args:
+            window: 最近消息窗口大小
+            since: 起始序号（按累计加入顺序，从 0 开始）
+
+        Returns:
+            消息列表（已被滑动窗口淘汰的消息不再返回）
+        """
+        total = len(self._messages)
+        first_index = self._added_count - total
+        start = max(0, since - first_index)
+        end = max(0, total - window)
+        return list(islice(self._messages, start, end)) if start < end else []
+
+    @staticmethod
+    def format_messages(messages: Iterable[Message]) -> str:
+        """将消息格式化为带角色前缀的预览文本"""
+        return "\n".join(
+            (_USER_PREFIX if msg.role == MessageRole.USER else _ASSISTANT_PREFIX)
+            + msg.get_preview()
+            for msg in messages
+        )
 
     def clear(self) -> None:
         """清空所有消息"""
         self._messages.clear()
         self._system_message = None
+        self._added_count = 0
         logger.debug("ShortTermMemory cleared")
 
     def set_system_message(self, content: str) -> None:
         """设置系统消息"""
         self._system_message = Message(role=MessageRole.SYSTEM, content=content)
+        self._system_message.get_llm_format()
 
     def __len__(self) -> int:
         """返回消息数量（不含系统消息）"""
@@ -3,24 +3,39 @@ Agent 编排器
 核心控制模块，协调所有组件完成任务
 """
 
-import uuid
-from datetime import datetime
-from typing import Any, Dict, List, Optional
-
+import asyncio
+import inspect
+from os import urandom
+from time import time_ns
+from typing import (Any, AsyncIterator, Callable, Dict, List, Optional, Set,
+                    Tuple, Union)
+
+from src.core.clock import request_clock
 from src.core.config import settings
 from src.core.exceptions import AgentException
 from src.core.logging import get_logger
+from src.llm.batched import BatchedLLM
 
+from .cache import SemanticResponseCache
 from .executor import Executor
 from .memory.manager import MemoryManager
 from .planner import Planner
 from .reasoner import Reasoner
 from .schemas.message import Message, MessageRole
-from .schemas.task import Task, TaskPlan
+from .schemas.task import Task, TaskPlan, step_to_dict
 from .skill_selector import SkillSelector
 
 logger = get_logger("agent.orchestrator")
 
+# 响应中的步骤字段：(TaskStep 属性名, 输出键名)
+_RESPONSE_STEP_FIELDS = (
+    ("step_id", "step_id"),
+    ("description", "description"),
+    ("skill_name", "skill"),
+    ("tool_name", "tool"),
+    ("status", "status"),
+)
+
 
 # Agent 系统提示词
 AGENT_SYSTEM_PROMPT = """你是 SkillMCP-Agent，一个强大的智能助手。
@@ -50,7 +65,13 @@ class AgentOrchestrator:
     核心思维循环：理解 → 规划 → 执行 → 推理 → 回答
     """
 
-    def __init__(self, llm, mcp_client, memory_manager: MemoryManager = None):
+    def __init__(
+        self,
+        llm,
+        mcp_client,
+        memory_manager: MemoryManager = None,
+        embedder=None,
+    ):
         """
         初始化 Agent 编排器
 
@@ -58,23 +79,61 @@ class AgentOrchestrator:
             llm: LLM 实例
             mcp_client: MCP 客户端实例
             memory_manager: 记忆管理器实例
+            embedder: 向量化器（可选，用于 LLM 响应的语义缓存）
         """
+        # 并发请求的微批处理（Planner/Reasoner 的 chat 调用共享批次）
+        if settings.enable_batching:
+            llm = BatchedLLM(
+                llm,
+                batch_window_ms=settings.batch_window_ms,
+                max_batch_size=settings.max_batch_size,
+            )
+
         self.llm = llm
         self.mcp_client = mcp_client
 
+        # Planner 与 Reasoner 共享的 LLM 响应缓存
+        self.response_cache = (
+            SemanticResponseCache(
+                embedder=embedder,
+                maxsize=settings.llm_cache_size,
+                similarity_threshold=settings.llm_cache_similarity,
+                ttl_seconds=settings.llm_cache_ttl,
+            )
+            if settings.llm_cache_enabled
+            else None
+        )
+
         # 初始化各组件
         self.memory = memory_manager or MemoryManager()
         self.skill_selector = SkillSelector()
-        self.planner = Planner(llm=llm)
+        self.planner = Planner(
+            llm=llm,
+            response_cache=self.response_cache,
+            skip_trivial_plans=settings.skip_plan_when_no_skills,
+        )
         self.executor = Executor(
-            skill_selector=self.skill_selector, mcp_client=mcp_client
+            skill_selector=self.skill_selector,
+            mcp_client=mcp_client,
+            max_parallel_steps=settings.max_parallel_steps,
+            tool_concurrency=settings.tool_concurrency,
+            default_tool_concurrency=settings.default_tool_concurrency,
+            max_concurrent_tools=settings.max_concurrent_tools,
+            tool_timeout=settings.tool_timeout,
+            tool_cache_ttl=settings.tool_cache_ttl,
         )
-        self.reasoner = Reasoner(llm=llm)
+        self.reasoner = Reasoner(llm=llm, response_cache=self.response_cache)
 
         # 状态追踪
         self._current_task: Optional[Task] = None
         self._iteration_count = 0
         self._max_iterations = settings.max_iterations
+        # 已写入记忆的系统提示词对应的技能版本号
+        self._system_prompt_version: Optional[int] = None
+        # 尚未完成的后台记忆写入（持有引用，避免任务被回收）
+        self._pending_writes: Set[asyncio.Task] = set()
+        # 后台摘要任务（调用 LLM，不计入记忆写入，同一时间只保留一个）
+        self._summary_task: Optional[asyncio.Task] = None
 
         logger.info("AgentOrchestrator initialized")
 
@@ -88,12 +147,20 @@ class AgentOrchestrator:
             metadata: 技能元数据
         """
         self.skill_selector.register_skill(name, skill, metadata)
-        # 更新 Planner 的技能列表
-        self.planner.update_skills(self.skill_selector.get_skills_for_planner())
+        # 更新 Planner 的技能列表与系统提示词
+        self.planner.update_skills(
+            self.skill_selector.get_skills_for_planner(),
+            version=self.skill_selector.skills_version,
+        )
+        self._update_system_prompt()
         logger.info(f"Skill registered: {name}")
 
     def _update_system_prompt(self) -> None:
-        """更新系统提示词"""
+        """更新系统提示词（技能未变化时跳过）"""
+        version = self.skill_selector.skills_version
+        if self._system_prompt_version == version:
+            return
+
         skills_list = self.skill_selector.list_skills()
         skills_desc = (
             "\n".join([f"- {s['name']}: {s['description']}" for s in skills_list])
@@ -102,8 +169,11 @@ class AgentOrchestrator:
 
         system_prompt = AGENT_SYSTEM_PROMPT.format(skills_description=skills_desc)
         self.memory.set_system_prompt(system_prompt)
+        self._system_prompt_version = version
 
-    async def chat(self, user_input: str, session_id: str = None) -> Dict[str, Any]:
+    async def chat(
+        self, user_input: str, session_id: str = None, stream: bool = False
+    ) -> Union[Dict[str, Any], AsyncIterator[Dict[str, Any]]]:
         """
         处理用户输入的主入口
 
@@ -117,98 +187,230 @@ class AgentOrchestrator:
         Args:
             user_input: 用户输入
             session_id: 会话ID（用于多轮对话）
+            stream: 是否流式输出最终回答
 
         Returns:
-            包含回答和执行详情的字典
+            包含回答和执行详情的字典；stream 为 True 时返回事件异步生成器，
+            依次产出 {"type": "token", "delta": ...} 与 {"type": "done", "response": ...}
         """
-        logger.info(f"Processing user input: {user_input[:50]}...")
-
-        # 更新系统提示词
-        self._update_system_prompt()
-
-        # 创建任务
-        task = self._create_task(user_input, session_id)
-        self._current_task = task
-
-        # 添加用户消息到记忆
-        self.memory.add_user_input(user_input)
-
-        try:
-            # ===== 阶段1: 规划 =====
-            logger.info("Phase 1: Planning")
-            context = self.memory.get_enhanced_context(user_input)
+        if stream:
+            return self._chat_stream(user_input, session_id)
+
+        # 一次请求内的规划、执行与记忆写入共享同一个时间戳
+        with request_clock():
+            task = self._start_task(user_input, session_id)
+
+            try:
+                plan, execution_results = await self._plan_and_execute(task, user_input)
+
+                # ===== 阶段3: 推理与整合 =====
+                logger.info("Phase 3: Reasoning")
+
+                if execution_results.get("completed"):
+                    final_answer = await self.reasoner.synthesize(
+                        original_query=user_input,
+                        goal=plan.goal,
+                        execution_results=execution_results,
+                    )
+                else:
+                    # 执行未完成，处理错误
+                    final_answer = await self.reasoner.handle_error(
+                        original_query=user_input,
+                        error_info="任务执行未能完成",
+                        partial_results=execution_results,
+                    )
+
+                return self._finish_task(
+                    task, user_input, plan, execution_results, final_answer
+                )
 
-            plan = await self.planner.plan(
-                user_query=user_input, context=context.get("conversation_history", "")
-            )
-            task.plan = plan
-            task.status = "planning_completed"
+            except Exception as e:
+                return self._fail_task(task, e)
 
-            # ===== 阶段2: 执行 =====
-            logger.info("Phase 2: Executing")
-            task.status = "executing"
+    async def _chat_stream(
+        self, user_input: str, session_id: str = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式处理用户输入
 
-            execution_results = await self.executor.execute_plan(
-                plan=plan, context=context
-            )
+        规划与执行阶段与 chat 相同，推理阶段逐片段产出回答
 
-            task.status = "execution_completed"
+        Yields:
+            {"type": "token", "delta": 文本片段}，最后为 {"type": "done", "response": 响应字典}
+        """
+        # 生成器在各 yield 之间会切换上下文，时钟只在不跨 yield 的阶段内固定
+        with request_clock() as started:
+            task = self._start_task(user_input, session_id)
 
-            # ===== 阶段3: 推理与整合 =====
-            logger.info("Phase 3: Reasoning")
+        try:
+            with request_clock(started):
+                plan, execution_results = await self._plan_and_execute(task, user_input)
 
+            logger.info("Phase 3: Reasoning (streaming)")
+            chunks = []
             if execution_results.get("completed"):
-                final_answer = await self.reasoner.synthesize(
+                async for chunk in self.reasoner.synthesize_stream(
                     original_query=user_input,
                     goal=plan.goal,
                     execution_results=execution_results,
-                )
+                ):
+                    chunks.append(chunk)
+                    yield {"type": "token", "delta": chunk}
             else:
-                # 执行未完成，处理错误
-                final_answer = await self.reasoner.handle_error(
+                error_answer = await self.reasoner.handle_error(
                     original_query=user_input,
                     error_info="任务执行未能完成",
                     partial_results=execution_results,
                 )
+                chunks.append(error_answer)
+                yield {"type": "token", "delta": error_answer}
 
-            # 更新任务状态
-            task.final_answer = final_answer
-            task.status = "completed"
-            task.completed_at = datetime.now()
+            with request_clock(started):
+                response = self._finish_task(
+                    task, user_input, plan, execution_results, "".join(chunks)
+                )
 
-            # 添加助手回复到记忆
-            self.memory.add_agent_response(final_answer)
+        except Exception as e:
+            response = self._fail_task(task, e)
 
-            # 保存到长期记忆
-            self.memory.save_task_result(
-                task_id=task.task_id, query=user_input, result=final_answer[:500]
-            )
+        yield {"type": "done", "response": response}
+
+    def _start_task(self, user_input: str, session_id: str = None) -> Task:
+        """创建任务并记录用户输入"""
+        logger.info(f"Processing user input: {user_input[:50]}...")
 
-            # 构建响应
-            response = self._build_response(task, plan, execution_results, final_answer)
+        # 首次对话（或清空对话后）写入系统提示词
+        if self._system_prompt_version is None:
+            self._update_system_prompt()
 
-            logger.info(f"Task {task.task_id} completed successfully")
-            return response
+        # 创建任务
+        task = self._create_task(user_input, session_id)
+        self._current_task = task
+
+        # 添加用户消息到记忆
+        self.memory.add_user_input(user_input)
+        return task
+
+    async def _plan_and_execute(
+        self, task: Task, user_input: str
+    ) -> Tuple[TaskPlan, Dict[str, Any]]:
+        """执行规划与执行阶段"""
+        # 先等待上一轮的后台写入，保证检索到的长期记忆是最新的
+        await self.flush_pending_writes()
+
+        # ===== 阶段1: 规划 =====
+        logger.info("Phase 1: Planning")
+        context = self.memory.get_enhanced_context(user_input)
+
+        plan = await self.planner.plan(
+            user_query=user_input, context=context.get("conversation_history", "")
+        )
+        task.plan = plan
+        task.status = "planning_completed"
+
+        # ===== 阶段2: 执行 =====
+        logger.info("Phase 2: Executing")
+        task.status = "executing"
+
+        execution_results = await self.executor.execute_plan(plan=plan, context=context)
+
+        task.status = "execution_completed"
+        return plan, execution_results
+
+    def _finish_task(
+        self,
+        task: Task,
+        user_input: str,
+        plan: TaskPlan,
+        execution_results: Dict[str, Any],
+        final_answer: str,
+    ) -> Dict[str, Any]:
+        """记录最终回答并构建响应"""
+        # 更新任务状态
+        task.final_answer = final_answer
+        task.status = "completed"
+        task.completed_at = time_ns()
+
+        # 添加助手回复到记忆
+        self.memory.add_agent_response(final_answer)
+
+        # 保存到长期记忆（后台执行，不阻塞响应返回）
+        self._schedule_write(
+            self.memory.save_task_result,
+            task_id=task.task_id,
+            query=user_input,
+            result=final_answer[:500],
+        )
+        # 对话变长时把较早的对话压缩为摘要（后台执行，不阻塞下一轮请求）
+        self._schedule_summary()
+
+        # 构建响应
+        response = self._build_response(task, plan, execution_results, final_answer)
+
+        logger.info(f"Task {task.task_id} completed successfully")
+        return response
 
+    @staticmethod
+    async def _run_background(func: Callable[..., Any], *args, **kwargs) -> None:
+        """执行后台记忆操作（func 可以是普通函数或协程函数），只记录异常"""
+        try:
+            result = func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                await result
         except Exception as e:
-            logger.error(f"Task failed: {str(e)}")
-            task.status = "failed"
+            logger.error(f"Background memory write failed: {e}")
+
+    def _schedule_write(self, func: Callable[..., Any], *args, **kwargs) -> None:
+        """在后台执行记忆写入（func 可以是普通函数或协程函数）"""
+        write = asyncio.create_task(self._run_background(func, *args, **kwargs))
+        self._pending_writes.add(write)
+        write.add_done_callback(self._pending_writes.discard)
+
+    def _schedule_summary(self) -> None:
+        """
+        在后台更新滚动摘要
 
-            # 尝试生成错误响应
-            error_answer = f"抱歉，处理您的请求时遇到了问题：{str(e)}"
-            self.memory.add_agent_response(error_answer)
+        上一次摘要仍在进行时跳过，未摘要的对话留到下一轮再合并
+        """
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        self._summary_task = asyncio.create_task(
+            self._run_background(self.memory.refresh_summary, self.llm)
+        )
+
+    async def flush_pending_writes(self) -> None:
+        """等待所有后台记忆写入完成（不等待摘要）"""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes)
+
+    async def aclose(self) -> None:
+        """关闭编排器，等待后台写入与摘要完成"""
+        await self.flush_pending_writes()
+        if self._summary_task is not None:
+            await self._summary_task
+            self._summary_task = None
+        logger.info("AgentOrchestrator closed")
+
+    def _fail_task(self, task: Task, error: Exception) -> Dict[str, Any]:
+        """记录失败并构建错误响应"""
+        logger.error(f"Task failed: {str(error)}")
+        task.status = "failed"
 
-            return {
-                "success": False,
-                "answer": error_answer,
-                "error": str(e),
-                "task_id": task.task_id,
-            }
+        # 尝试生成错误响应
+        error_answer = f"抱歉，处理您的请求时遇到了问题：{str(error)}"
+        self.memory.add_agent_response(error_answer)
+
+        return {
+            "success": False,
+            "answer": error_answer,
+            "error": str(error),
+            "task_id": task.task_id,
+        }
 
     def _create_task(self, user_input: str, session_id: str = None) -> Task:
         """创建任务对象"""
         return Task(
-            task_id=f"task_{uuid.uuid4().hex[:8]}",
+            task_id=f"task_{urandom(4).hex()}",
             user_query=user_input,
             metadata={"session_id": session_id},
         )
@@ -229,26 +431,15 @@ class AgentOrchestrator:
                 "plan_id": plan.plan_id,
                 "goal": plan.goal,
                 "reasoning": plan.reasoning,
-                "steps": [
-                    {
-                        "step_id": s.step_id,
-                        "description": s.description,
-                        "skill": s.skill_name,
-                        "tool": s.tool_name,
-                        "status": s.status,
-                    }
-                    for s in plan.steps
-                ],
+                "steps": [step_to_dict(s, _RESPONSE_STEP_FIELDS) for s in plan.steps],
             },
             "execution": {
                 "completed": execution_results.get("completed", False),
                 "steps_count": len(execution_results.get("steps_results", [])),
             },
             "metadata": {
-                "created_at": task.created_at.isoformat(),
-                "completed_at": (
-                    task.completed_at.isoformat() if task.completed_at else None
-                ),
+                "created_at": task.created_at_iso,
+                "completed_at": task.completed_at_iso,
             },
         }
 
@@ -273,6 +464,7 @@ class AgentOrchestrator:
     def clear_conversation(self) -> None:
         """清空当前对话"""
         self.memory.clear_conversation()
+        self._system_prompt_version = None
         self._current_task = None
         self._iteration_count = 0
         logger.info("Conversation cleared")
@@ -3,60 +3,98 @@
 负责将用户输入拆解为可执行的任务步骤
 """
 
-import json
-import uuid
-from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import logging
+import re
+from os import urandom
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from src.core.exceptions import PlanningException
 from src.core.logging import get_logger
+from src.core.serialization import loads
 
-from .schemas.task import StepStatus, TaskPlan, TaskStep
+try:
+    import json_repair
+except ImportError:  # json_repair 为可选依赖
+    json_repair = None
+
+from .cache import SemanticResponseCache
+from .schemas.task import TaskPlan, TaskStep
 
 if TYPE_CHECKING:
     from src.llm.base import BaseLLM
 
 logger = get_logger("agent.planner")
 
+# markdown 代码块中的 JSON 对象
+_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.S)
+
+# 寒暄类查询：无需规划，直接回答
+_TRIVIAL_RE = re.compile(
+    r"^(你好|您好|哈喽|嗨|hi|hello|hey|谢谢|多谢|谢啦|thanks|thank you|"
+    r"再见|拜拜|bye|好的|好|ok|okay|嗯+)[\s,，!！.。~～]*$",
+    re.I,
+)
+
+
+def _direct_answer_plan_data(goal: str, reasoning: str) -> Dict[str, Any]:
+    """构建只有一个直接回答步骤的规划数据"""
+    return {
+        "goal": goal,
+        "reasoning": reasoning,
+        "steps": [
+            {
+                "step_id": 1,
+                "description": "直接回答用户的问题",
+                "skill_name": "direct_answer",
+                "tool_name": None,
+                "tool_params": {},
+                "depends_on": [],
+            }
+        ],
+    }
+
 
 # 规划提示词模板
-PLANNER_SYSTEM_PROMPT = """你是一个任务规划专家。你的职责是将用户的请求拆解为具体的执行步骤。
-
-## 可用技能列表
-{skills_description}
+# 提示词按"静态在前、可变在后"排列，保证 LLM 服务端的前缀缓存可以命中：
+# 固定指令 -> 技能列表（技能变化时才变） -> 用户请求与上下文
+PLANNER_INSTRUCTIONS = """你是一个任务规划专家。你的职责是将用户的请求拆解为具体的执行步骤。
 
 ## 输出要求
 请严格按照以下 JSON 格式输出任务规划：
 
 ```json
-{{
+{
     "goal": "任务目标的简要描述",
     "reasoning": "你的规划思路",
     "steps": [
-        {{
+        {
             "step_id": 1,
             "description": "步骤描述",
             "skill_name": "使用的技能名称",
             "tool_name": "具体工具名称（可选）",
-            "tool_params": {{}},
+            "tool_params": {},
             "depends_on": []
-        }}
+        }
     ]
-}}
+}
 ```
 
 ## 规划原则
-1. 每个步骤必须使用已有的技能
+1. 每个步骤必须使用下方可用技能列表中的技能
 2. 步骤之间的依赖关系要明确
 3. 优先使用简单直接的方案
 4. 如果任务不需要工具，可以只用一个直接回答的步骤
 """
 
-PLANNER_USER_PROMPT = """## 对话上下文
-{context}
+PLANNER_SKILLS_PROMPT = """## 可用技能列表
+{skills_description}"""
 
-## 用户请求
+PLANNER_USER_PROMPT = """## 用户请求
 {user_query}
 
+## 对话上下文
+{context}
+
 请为这个请求制定执行计划。"""
 
 
@@ -71,21 +109,43 @@ class Planner:
     - 确定步骤间的依赖关系
     """
 
-    def __init__(self, llm: "BaseLLM", available_skills: Dict[str, Any] = None):
+    def __init__(
+        self,
+        llm: "BaseLLM",
+        available_skills: Dict[str, Any] = None,
+        response_cache: Optional[SemanticResponseCache] = None,
+        skip_trivial_plans: bool = False,
+    ):
         """
         初始化规划器
 
         Args:
             llm: LLM 实例
             available_skills: 可用技能字典 {skill_name: skill_description}
+            response_cache: LLM 响应缓存（可选）
+            skip_trivial_plans: 没有专门技能或寒暄类查询时跳过 LLM 规划
         """
         self.llm = llm
         self.available_skills = available_skills or {}
+        self.response_cache = response_cache
+        self.skip_trivial_plans = skip_trivial_plans
+        self._skills_version = 0
+        # (技能版本号, 渲染后的技能列表提示词)
+        self._skills_prompt_cache: Optional[Tuple[int, str]] = None
         logger.debug(f"Planner initialized with {len(self.available_skills)} skills")
 
-    def update_skills(self, skills: Dict[str, Any]) -> None:
-        """更新可用技能列表"""
+    def update_skills(self, skills: Dict[str, Any], version: int = None) -> None:
+        """
+        更新可用技能列表
+
+        Args:
+            skills: 可用技能字典
+            version: 技能集合版本号（通常来自 SkillSelector），为空时自增
+        """
         self.available_skills = skills
+        self._skills_version = (
+            version if version is not None else self._skills_version + 1
+        )
         logger.debug(f"Updated available skills: {list(skills.keys())}")
 
     def _build_skills_description(self) -> str:
@@ -106,6 +166,18 @@ class Planner:
 
         return "\n".join(lines)
 
+    def _get_skills_prompt(self) -> str:
+        """获取技能列表提示词（技能版本不变时复用缓存）"""
+        cached = self._skills_prompt_cache
+        if cached is not None and cached[0] == self._skills_version:
+            return cached[1]
+
+        skills_prompt = PLANNER_SKILLS_PROMPT.format(
+            skills_description=self._build_skills_description()
+        )
+        self._skills_prompt_cache = (self._skills_version, skills_prompt)
+        return skills_prompt
+
     async def plan(
         self, user_query: str, context: str = "", max_steps: int = 5
     ) -> TaskPlan:
@@ -125,23 +197,40 @@ class Planner:
         """
         logger.info(f"Planning for query: {user_query[:50]}...")
 
+        # 结果必然是单步直接回答时，不必调用 LLM
+        if self.skip_trivial_plans and self._is_trivial(user_query):
+            logger.debug("Skipping LLM planning for trivial query")
+            return self._direct_answer_plan(user_query, max_steps)
+
         # 构建提示词
-        system_prompt = PLANNER_SYSTEM_PROMPT.format(
-            skills_description=self._build_skills_description()
-        )
+        skills_prompt = self._get_skills_prompt()
         user_prompt = PLANNER_USER_PROMPT.format(
-            context=context or "（无历史上下文）", user_query=user_query
+            user_query=user_query, context=context or "（无历史上下文）"
         )
 
         try:
-            # 调用 LLM 获取规划
-            response = await self.llm.chat(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.3,  # 低温度以获得更稳定的规划
-            )
+            # 相同技能与上下文下的相同查询复用缓存的规划；规划的工具参数携带
+            # 城市、日期等实体，相似但不同的查询（北京天气/上海天气）不能共用，
+            # 因此只做精确匹配
+            response = None
+            if self.response_cache is not None:
+                cache_key = SemanticResponseCache.make_key(skills_prompt, user_prompt)
+                response = await self.response_cache.get(cache_key)
+
+            if response is None:
+                # 调用 LLM 获取规划
+                response = await self.llm.chat(
+                    messages=[
+                        {"role": "system", "content": PLANNER_INSTRUCTIONS},
+                        {"role": "system", "content": skills_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    temperature=0.3,  # 低温度以获得更稳定的规划
+                )
+                if self.response_cache is not None:
+                    await self.response_cache.put(cache_key, response)
+            else:
+                logger.debug("Using cached plan response")
 
             # 解析 JSON 响应
             plan_data = self._parse_plan_response(response)
@@ -152,7 +241,9 @@ class Planner:
             )
 
             logger.info(f"Plan created with {len(plan.steps)} steps")
-            logger.debug(f"Plan details: {plan.to_dict()}")
+            # 仅在 DEBUG 级别时才构建规划字典
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Plan details: {plan.to_dict()}")
 
             return plan
 
@@ -162,6 +253,22 @@ class Planner:
                 message=f"任务规划失败: {str(e)}", details={"query": user_query}
             )
 
+    def _is_trivial(self, user_query: str) -> bool:
+        """判断查询是否只需直接回答：没有专门技能，或为寒暄类查询"""
+        if not self.available_skills.keys() - {"direct_answer"}:
+            return True
+        return bool(_TRIVIAL_RE.match(user_query.strip()))
+
+    def _direct_answer_plan(self, user_query: str, max_steps: int = 5) -> TaskPlan:
+        """构建直接回答的 TaskPlan"""
+        return self._build_task_plan(
+            plan_data=_direct_answer_plan_data(
+                goal="直接回答用户问题", reasoning="无需调用工具，直接回答"
+            ),
+            original_query=user_query,
+            max_steps=max_steps,
+        )
+
     def _parse_plan_response(self, response: str) -> Dict[str, Any]:
         """
         解析 LLM 的规划响应
@@ -172,38 +279,38 @@ class Planner:
         Returns:
             解析后的规划字典
         """
-        # 尝试提取 JSON 块
-        json_str = response
-
-        # 如果响应包含 markdown 代码块，提取其中的 JSON
-        if "```json" in response:
-            start = response.find("```json") + 7
-            end = response.find("```", start)
-            json_str = response[start:end].strip()
-        elif "```" in response:
-            start = response.find("```") + 3
-            end = response.find("```", start)
-            json_str = response[start:end].strip()
-
-        try:
-            return json.loads(json_str)
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse JSON: {e}, trying to extract manually")
-            # 返回一个默认的直接回答计划
-            return {
-                "goal": "直接回答用户问题",
-                "reasoning": "无法解析规划，使用直接回答",
-                "steps": [
-                    {
-                        "step_id": 1,
-                        "description": "直接回答用户的问题",
-                        "skill_name": "direct_answer",
-                        "tool_name": None,
-                        "tool_params": {},
-                        "depends_on": [],
-                    }
-                ],
-            }
+        # 依次尝试：整体解析 -> 代码块 -> 首尾花括号之间的内容
+        candidates = [response.strip()]
+        match = _FENCE_RE.search(response)
+        if match:
+            candidates.append(match.group(1))
+        start, end = response.find("{"), response.rfind("}")
+        if 0 <= start < end:
+            candidates.append(response[start : end + 1])
+
+        for candidate in candidates:
+            try:
+                data = loads(candidate)
+            except ValueError:
+                continue
+            if isinstance(data, dict):
+                return data
+
+        # 格式有瑕疵（尾逗号、单引号等）时尝试修复，避免退化为直接回答
+        if json_repair is not None:
+            try:
+                data = json_repair.loads(candidates[-1])
+            except Exception as e:
+                logger.debug(f"json_repair failed: {e}")
+            else:
+                if isinstance(data, dict) and data.get("steps"):
+                    return data
+
+        logger.warning("Failed to parse plan JSON, falling back to direct answer")
+        # 返回一个默认的直接回答计划
+        return _direct_answer_plan_data(
+            goal="直接回答用户问题", reasoning="无法解析规划，使用直接回答"
+        )
 
     def _build_task_plan(
         self, plan_data: Dict[str, Any], original_query: str, max_steps: int
@@ -222,20 +329,30 @@ class Planner:
         steps = []
         raw_steps = plan_data.get("steps", [])[:max_steps]
 
+        # LLM 输出的字段类型不可靠，这里显式转换；
+        # 解析出的容器只属于本次规划，类型已正确时直接使用，不再复制
         for step_data in raw_steps:
-            step = TaskStep(
-                step_id=step_data.get("step_id", len(steps) + 1),
-                description=step_data.get("description", ""),
-                skill_name=step_data.get("skill_name", "direct_answer"),
-                tool_name=step_data.get("tool_name"),
-                tool_params=step_data.get("tool_params", {}),
-                depends_on=step_data.get("depends_on", []),
-                status=StepStatus.PENDING,
+            tool_name = step_data.get("tool_name")
+            tool_params = step_data.get("tool_params") or {}
+            depends_on = step_data.get("depends_on") or []
+            if type(tool_params) is not dict:
+                tool_params = dict(tool_params)
+            if not all(type(dep) is int for dep in depends_on):
+                depends_on = [int(dep) for dep in depends_on]
+
+            steps.append(
+                TaskStep(
+                    step_id=int(step_data.get("step_id", len(steps) + 1)),
+                    description=str(step_data.get("description", "")),
+                    skill_name=str(step_data.get("skill_name") or "direct_answer"),
+                    tool_name=str(tool_name) if tool_name is not None else None,
+                    tool_params=tool_params,
+                    depends_on=depends_on,
+                )
             )
-            steps.append(step)
 
         return TaskPlan(
-            plan_id=f"plan_{uuid.uuid4().hex[:8]}",
+            plan_id=f"plan_{urandom(4).hex()}",
             original_query=original_query,
             goal=plan_data.get("goal", "完成用户请求"),
             steps=steps,
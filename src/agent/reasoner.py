@@ -3,19 +3,63 @@
 负责结果整合和最终回答生成
 """
 
-from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import re
+from typing import (TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional,
+                    Tuple)
 
 from src.core.logging import get_logger
+from src.core.serialization import dumps_bytes
+
+from .cache import SemanticResponseCache
 
 if TYPE_CHECKING:
     from src.llm.base import BaseLLM
 
 logger = get_logger("agent.reasoner")
 
+# 以句末标点结尾的文本视为完整的句子
+_SENTENCE_END_RE = re.compile(r"[。！？!?.…][\"'”’）)]*\s*$")
+
+# 单个步骤结果写入提示词的最大长度
+RESULT_MAX_LENGTH = 1000
+_TRUNCATED_SUFFIX = "...(已截断)"
+
+
+def _truncate(obj: Any, max_length: int = RESULT_MAX_LENGTH) -> str:
+    """
+    将结果转换为不超过 max_length 的文本
 
-# 结果整合提示词
+    字符串先切片再使用；dict/list 序列化为 JSON 字节后再切片，
+    避免对大对象生成完整的 repr 字符串
+    """
+    if isinstance(obj, str):
+        if len(obj) > max_length:
+            return obj[:max_length] + _TRUNCATED_SUFFIX
+        return obj
+
+    if isinstance(obj, (dict, list, tuple)):
+        data = dumps_bytes(obj)
+        if len(data) > max_length:
+            # 按字节切片可能截断多字节字符，忽略不完整的尾部
+            text = data[:max_length].decode("utf-8", errors="ignore")
+            return text + _TRUNCATED_SUFFIX
+        return data.decode("utf-8")
+
+    text = str(obj)
+    if len(text) > max_length:
+        return text[:max_length] + _TRUNCATED_SUFFIX
+    return text
+
+
+# 结果整合提示词（固定要求在前、可变内容在后，便于 LLM 前缀缓存命中）
 SYNTHESIZE_PROMPT = """你是一个智能助手，需要根据任务执行结果生成最终回答。
 
+## 要求
+1. 综合所有步骤的结果
+2. 生成清晰、有条理的回答
+3. 如果有步骤失败，说明原因并提供可能的解决方案
+4. 回答应该直接解决用户的原始问题
+
 ## 原始问题
 {original_query}
 
@@ -25,12 +69,6 @@ SYNTHESIZE_PROMPT = """你是一个智能助手，需要根据任务执行结果
 ## 执行结果
 {execution_results}
 
-## 要求
-1. 综合所有步骤的结果
-2. 生成清晰、有条理的回答
-3. 如果有步骤失败，说明原因并提供可能的解决方案
-4. 回答应该直接解决用户的原始问题
-
 请生成最终回答："""
 
 
@@ -45,14 +83,18 @@ class Reasoner:
     - 处理异常情况
     """
 
-    def __init__(self, llm: "BaseLLM"):
+    def __init__(
+        self, llm: "BaseLLM", response_cache: Optional[SemanticResponseCache] = None
+    ):
         """
         初始化推理引擎
 
         Args:
             llm: LLM 实例
+            response_cache: LLM 响应缓存（可选）
         """
         self.llm = llm
+        self.response_cache = response_cache
         logger.debug("Reasoner initialized")
 
     async def synthesize(
@@ -71,29 +113,131 @@ class Reasoner:
         """
         logger.info("Synthesizing final answer from execution results")
 
-        # 格式化执行结果
-        results_text = self._format_results(execution_results)
-
         # 如果只有一个步骤且成功，可以直接返回结果
-        if self._can_use_direct_result(execution_results):
-            final_result = execution_results.get("final_result", {})
-            result_content = final_result.get("result", "")
-            if isinstance(result_content, str) and len(result_content) > 10:
-                logger.debug("Using direct result without LLM synthesis")
-                return result_content
+        direct_result = self._get_direct_result(execution_results)
+        if direct_result is not None:
+            logger.debug("Using direct result without LLM synthesis")
+            return direct_result
 
         # 使用 LLM 综合结果
-        prompt = SYNTHESIZE_PROMPT.format(
-            original_query=original_query, goal=goal, execution_results=results_text
+        prompt, cache_keys = self._build_synthesis_prompt(
+            original_query, goal, execution_results
         )
+        cached = await self._get_cached_answer(original_query, cache_keys)
+        if cached is not None:
+            return cached
 
         response = await self.llm.chat(
             messages=[{"role": "user", "content": prompt}], temperature=0.5
         )
+        await self._cache_answer(original_query, cache_keys, response)
 
         logger.debug("Final answer synthesized successfully")
         return response
 
+    async def synthesize_stream(
+        self, original_query: str, goal: str, execution_results: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        """
+        综合执行结果，流式生成最终回答
+
+        Args:
+            original_query: 原始用户查询
+            goal: 任务目标
+            execution_results: 执行结果
+
+        Yields:
+            回答文本片段（直接结果或缓存命中时只产出一个片段）
+        """
+        logger.info("Streaming final answer from execution results")
+
+        direct_result = self._get_direct_result(execution_results)
+        if direct_result is not None:
+            logger.debug("Using direct result without LLM synthesis")
+            yield direct_result
+            return
+
+        prompt, cache_keys = self._build_synthesis_prompt(
+            original_query, goal, execution_results
+        )
+        cached = await self._get_cached_answer(original_query, cache_keys)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        async for chunk in self.llm.stream_chat(
+            messages=[{"role": "user", "content": prompt}], temperature=0.5
+        ):
+            chunks.append(chunk)
+            yield chunk
+
+        await self._cache_answer(original_query, cache_keys, "".join(chunks))
+        logger.debug("Final answer streamed successfully")
+
+    def _get_direct_result(self, execution_results: Dict[str, Any]) -> Optional[str]:
+        """获取可直接作为回答的单步骤结果，不满足条件时返回 None"""
+        if not self._can_use_direct_result(execution_results):
+            return None
+
+        final_result = execution_results.get("final_result", {})
+        result_content = final_result.get("result", "")
+        if not isinstance(result_content, str) or not result_content.strip():
+            return None
+
+        # 较长的文本，或已经是完整句子的短文本，无需 LLM 再加工
+        if len(result_content) > 10 or _SENTENCE_END_RE.search(result_content):
+            return result_content
+        return None
+
+    def _build_synthesis_prompt(
+        self, original_query: str, goal: str, execution_results: Dict[str, Any]
+    ) -> Tuple[str, Optional[Tuple[str, str]]]:
+        """
+        构建结果整合提示词
+
+        Returns:
+            (提示词, 缓存键与分区)，未启用缓存时后者为 None
+        """
+        results_text = self._format_results(execution_results)
+        prompt = SYNTHESIZE_PROMPT.format(
+            original_query=original_query, goal=goal, execution_results=results_text
+        )
+
+        if self.response_cache is None:
+            return prompt, None
+        return prompt, (
+            SemanticResponseCache.make_key(prompt),
+            SemanticResponseCache.make_key(goal, results_text),
+        )
+
+    async def _get_cached_answer(
+        self, original_query: str, cache_keys: Optional[Tuple[str, str]]
+    ) -> Optional[str]:
+        """执行结果相同（同一分区）时，相同/相似的问题复用缓存的回答"""
+        if cache_keys is None:
+            return None
+
+        cache_key, partition = cache_keys
+        cached = await self.response_cache.get(
+            cache_key, semantic_text=original_query, partition=partition
+        )
+        if cached is not None:
+            logger.debug("Using cached synthesized answer")
+        return cached
+
+    async def _cache_answer(
+        self, original_query: str, cache_keys: Optional[Tuple[str, str]], answer: str
+    ) -> None:
+        """写入回答缓存"""
+        if cache_keys is None:
+            return
+
+        cache_key, partition = cache_keys
+        await self.response_cache.put(
+            cache_key, answer, semantic_text=original_query, partition=partition
+        )
+
     def _format_results(self, execution_results: Dict[str, Any]) -> str:
         """格式化执行结果为文本"""
         lines = []
@@ -104,19 +248,15 @@ class Reasoner:
             description = step_result.get("description", "")
             status = step_result.get("status", "unknown")
 
-            lines.append(f"\n### 步骤 {step_id}: {description}")
-            lines.append(f"状态: {status}")
-
             if status == "completed":
-                result = step_result.get("result", "")
                 # 截断过长的结果
-                result_str = str(result)
-                if len(result_str) > 1000:
-                    result_str = result_str[:1000] + "...(已截断)"
-                lines.append(f"结果: {result_str}")
+                detail = f"结果: {_truncate(step_result.get('result', ''))}"
             else:
-                error = step_result.get("error", "未知错误")
-                lines.append(f"错误: {error}")
+                detail = f"错误: {step_result.get('error', '未知错误')}"
+
+            lines.extend(
+                (f"\n### 步骤 {step_id}: {description}", f"状态: {status}", detail)
+            )
 
         return "\n".join(lines)
 
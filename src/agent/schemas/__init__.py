@@ -1,5 +1,22 @@
 # Agent schemas module
-from .message import Message, MessageRole
-from .task import StepStatus, Task, TaskPlan, TaskStep
+# 导出项按需加载（PEP 562），只用 Message 时不会导入 task 模块，反之亦然
+from typing import TYPE_CHECKING
 
-__all__ = ["Task", "TaskStep", "TaskPlan", "StepStatus", "Message", "MessageRole"]
+from src.core.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from .message import Message, MessageRole
+    from .task import StepStatus, Task, TaskPlan, TaskStep
+
+_LAZY_EXPORTS = {
+    "Task": ".task",
+    "TaskStep": ".task",
+    "TaskPlan": ".task",
+    "StepStatus": ".task",
+    "Message": ".message",
+    "MessageRole": ".message",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _LAZY_EXPORTS)
@@ -1,12 +1,19 @@
 """
 消息数据结构定义
+
+消息在每轮对话中频繁创建，使用 slots dataclass 而非 pydantic 模型，
+省去构造时的字段校验与实例 __dict__；对外 API 的校验由 src.api.schemas 负责
 """
 
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from src.core.serialization import dumps_bytes
+
+# 消息预览的最大长度
+PREVIEW_LENGTH = 200
 
 
 class MessageRole(str, Enum):
@@ -18,39 +25,80 @@ class MessageRole(str, Enum):
     TOOL = "tool"
 
 
-class ToolCall(BaseModel):
-    """工具调用信息"""
+@dataclass(slots=True)
+class ToolCall:
+    """
+    工具调用信息
+
+    Attributes:
+        tool_name: 工具名称
+        tool_params: 调用参数
+        call_id: 调用ID
+    """
 
-    tool_name: str = Field(..., description="工具名称")
-    tool_params: Dict[str, Any] = Field(default_factory=dict, description="调用参数")
-    call_id: Optional[str] = Field(None, description="调用ID")
+    tool_name: str
+    tool_params: Dict[str, Any] = field(default_factory=dict)
+    call_id: Optional[str] = None
 
 
-class ToolResult(BaseModel):
-    """工具执行结果"""
+@dataclass(slots=True)
+class ToolResult:
+    """
+    工具执行结果
+
+    Attributes:
+        call_id: 对应的调用ID
+        tool_name: 工具名称
+        success: 是否成功
+        result: 执行结果
+        error: 错误信息
+    """
 
-    call_id: str = Field(..., description="对应的调用ID")
-    tool_name: str = Field(..., description="工具名称")
-    success: bool = Field(..., description="是否成功")
-    result: Any = Field(None, description="执行结果")
-    error: Optional[str] = Field(None, description="错误信息")
+    call_id: str
+    tool_name: str
+    success: bool
+    result: Any = None
+    error: Optional[str] = None
 
 
-class Message(BaseModel):
+@dataclass(slots=True)
+class Message:
     """
     对话消息
+
+    Attributes:
+        role: 消息角色（存储为字符串值）
+        content: 消息内容
+        timestamp: 时间戳
+        tool_calls: 工具调用列表
+        tool_result: 工具执行结果
+        metadata: 元数据
     """
 
-    role: MessageRole = Field(..., description="消息角色")
-    content: str = Field(..., description="消息内容")
-    timestamp: datetime = Field(default_factory=datetime.now, description="时间戳")
-    tool_calls: List[ToolCall] = Field(default_factory=list, description="工具调用列表")
-    tool_result: Optional[ToolResult] = Field(None, description="工具执行结果")
-    metadata: Dict[str, Any] = Field(default_factory=dict, description="元数据")
+    role: MessageRole
+    content: str
+    timestamp: datetime = field(default_factory=datetime.now)
+    tool_calls: List[ToolCall] = field(default_factory=list)
+    tool_result: Optional[ToolResult] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    # 缓存的 LLM 格式与摘要预览（消息加入记忆后内容不再变化）
+    _llm_format: Optional[Dict[str, Any]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _preview: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _llm_bytes: Optional[bytes] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        # 与原先 use_enum_values 的行为保持一致：角色存储为字符串值
+        if isinstance(self.role, MessageRole):
+            self.role = self.role.value
 
     def to_llm_format(self) -> Dict[str, Any]:
         """转换为 LLM API 格式"""
-        msg = {"role": self.role.value, "content": self.content}
+        msg = {"role": MessageRole(self.role).value, "content": self.content}
         if self.tool_calls:
             msg["tool_calls"] = [
                 {
@@ -68,5 +116,25 @@ class Message(BaseModel):
             msg["name"] = self.tool_result.tool_name
         return msg
 
-    class Config:
-        use_enum_values = True
+    def get_llm_format(self) -> Dict[str, Any]:
+        """获取缓存的 LLM 格式，首次调用时生成"""
+        if self._llm_format is None:
+            self._llm_format = self.to_llm_format()
+        return self._llm_format
+
+    def get_llm_bytes(self) -> bytes:
+        """获取缓存的 LLM 格式 JSON 字节串，首次调用时生成"""
+        if self._llm_bytes is None:
+            self._llm_bytes = dumps_bytes(self.get_llm_format())
+        return self._llm_bytes
+
+    def get_preview(self) -> str:
+        """获取截断到 PREVIEW_LENGTH 的内容预览，首次调用时生成"""
+        if self._preview is None:
+            content = self.content
+            self._preview = (
+                content[:PREVIEW_LENGTH] + "..."
+                if len(content) > PREVIEW_LENGTH
+                else content
+            )
+        return self._preview
@@ -1,12 +1,46 @@
 """
 任务与规划的数据结构定义
+
+每个步骤/规划都会创建这些对象，使用 slots dataclass 而非 pydantic 模型，
+省去构造时的字段校验与实例 __dict__；LLM 输出的类型转换在 Planner 中完成
 """
 
+from collections import deque
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from enum import Enum
+from time import time_ns
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+# 步骤摘要字段：(TaskStep 属性名, 输出键名)
+PLAN_STEP_FIELDS = (
+    ("step_id", "step_id"),
+    ("description", "description"),
+    ("skill_name", "skill_name"),
+    ("tool_name", "tool_name"),
+    ("status", "status"),
+)
+
+
+def step_to_dict(step: "TaskStep", step_fields=PLAN_STEP_FIELDS) -> Dict[str, Any]:
+    """
+    按字段表生成步骤摘要字典
+
+    Args:
+        step: 任务步骤
+        step_fields: (属性名, 输出键名) 元组序列
+
+    Returns:
+        步骤摘要字典
+    """
+    return {key: getattr(step, attr) for attr, key in step_fields}
+
+
+def ns_to_iso(timestamp_ns: Optional[int]) -> Optional[str]:
+    """将纳秒时间戳格式化为本地时间的 ISO 字符串，为空时返回 None"""
+    if timestamp_ns is None:
+        return None
+    return datetime.fromtimestamp(timestamp_ns / 1e9).isoformat()
 
 
 class StepStatus(str, Enum):
@@ -19,52 +53,217 @@ class StepStatus(str, Enum):
     SKIPPED = "skipped"  # 跳过
 
 
-class TaskStep(BaseModel):
+@dataclass(slots=True)
+class TaskStep:
     """
     任务步骤
     表示规划后的单个执行步骤
+
+    Attributes:
+        step_id: 步骤序号
+        description: 步骤描述
+        skill_name: 需要使用的技能名称
+        tool_name: 需要调用的工具名称
+        tool_params: 工具参数
+        depends_on: 依赖的步骤ID列表
+        status: 执行状态（存储为字符串值）
+        result: 执行结果
+        error: 错误信息
     """
 
-    step_id: int = Field(..., description="步骤序号")
-    description: str = Field(..., description="步骤描述")
-    skill_name: str = Field(..., description="需要使用的技能名称")
-    tool_name: Optional[str] = Field(None, description="需要调用的工具名称")
-    tool_params: Dict[str, Any] = Field(default_factory=dict, description="工具参数")
-    depends_on: List[int] = Field(default_factory=list, description="依赖的步骤ID列表")
-    status: StepStatus = Field(default=StepStatus.PENDING, description="执行状态")
-    result: Optional[Any] = Field(None, description="执行结果")
-    error: Optional[str] = Field(None, description="错误信息")
+    step_id: int
+    description: str
+    skill_name: str
+    tool_name: Optional[str] = None
+    tool_params: Dict[str, Any] = field(default_factory=dict)
+    depends_on: List[int] = field(default_factory=list)
+    status: StepStatus = StepStatus.PENDING
+    result: Optional[Any] = None
+    error: Optional[str] = None
 
-    class Config:
-        use_enum_values = True
+    def __post_init__(self):
+        # 与原先 use_enum_values 的行为保持一致：状态存储为字符串值
+        if isinstance(self.status, StepStatus):
+            self.status = self.status.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式（浅拷贝各字段）"""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
 
 
-class TaskPlan(BaseModel):
+@dataclass(slots=True)
+class TaskPlan:
     """
     任务规划
     包含多个有序步骤的执行计划
+
+    Attributes:
+        plan_id: 规划ID
+        original_query: 原始用户查询
+        goal: 任务目标总结
+        steps: 执行步骤列表
+        created_at: 创建时间（纳秒时间戳）
+        reasoning: 规划推理过程
     """
 
-    plan_id: str = Field(..., description="规划ID")
-    original_query: str = Field(..., description="原始用户查询")
-    goal: str = Field(..., description="任务目标总结")
-    steps: List[TaskStep] = Field(default_factory=list, description="执行步骤列表")
-    created_at: datetime = Field(default_factory=datetime.now, description="创建时间")
-    reasoning: str = Field(default="", description="规划推理过程")
+    plan_id: str
+    original_query: str
+    goal: str
+    steps: List[TaskStep] = field(default_factory=list)
+    created_at: int = field(default_factory=time_ns)
+    reasoning: str = ""
+
+    # 依赖图缓存（按步骤下标）：后继列表与拓扑序
+    _dependents: Optional[List[List[int]]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _topo_order: Optional[List[int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # 调度状态（按步骤下标）：未完成依赖数、就绪队列、已标记完成的步骤、步骤ID索引
+    _indegree: Optional[List[int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _ready: Optional[deque] = field(default=None, init=False, repr=False, compare=False)
+    _marked: Optional[set] = field(default=None, init=False, repr=False, compare=False)
+    _index_by_id: Optional[Dict[int, int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def created_at_iso(self) -> str:
+        """创建时间的 ISO 字符串（按需格式化）"""
+        return ns_to_iso(self.created_at)
+
+    def _dependency_indices(self, step: TaskStep) -> List[int]:
+        """获取步骤依赖的步骤下标（忽略越界的依赖）"""
+        total = len(self.steps)
+        return [dep_id - 1 for dep_id in step.depends_on if 1 <= dep_id <= total]
+
+    def build_dependency_graph(self) -> None:
+        """
+        构建依赖图
+
+        计算每个步骤的后继列表，并用 Kahn 算法得到拓扑序；
+        存在环时，环上的步骤不会出现在拓扑序中
+        """
+        total = len(self.steps)
+        dependents: List[List[int]] = [[] for _ in range(total)]
+        indegree = [0] * total
+
+        for index, step in enumerate(self.steps):
+            for dep_index in self._dependency_indices(step):
+                dependents[dep_index].append(index)
+                indegree[index] += 1
+
+        ready = deque(i for i in range(total) if indegree[i] == 0)
+        order = []
+        while ready:
+            index = ready.popleft()
+            order.append(index)
+            for successor in dependents[index]:
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    ready.append(successor)
+
+        self._dependents = dependents
+        self._topo_order = order
+
+    def get_dependents(self) -> List[List[int]]:
+        """获取每个步骤（按下标）的后继步骤下标列表"""
+        if self._dependents is None:
+            self.build_dependency_graph()
+        return self._dependents
+
+    def get_topological_order(self) -> List[int]:
+        """获取步骤下标的拓扑序"""
+        if self._topo_order is None:
+            self.build_dependency_graph()
+        return self._topo_order
+
+    def get_blocked_steps(self) -> List[TaskStep]:
+        """获取因循环依赖无法执行的步骤（不在拓扑序中：环上的步骤及其后继）"""
+        scheduled = set(self.get_topological_order())
+        return [step for i, step in enumerate(self.steps) if i not in scheduled]
+
+    def get_pending_indegrees(self) -> List[int]:
+        """获取每个步骤尚未完成的依赖数量"""
+        return [
+            sum(
+                1
+                for dep_index in self._dependency_indices(step)
+                if self.steps[dep_index].status != StepStatus.COMPLETED
+            )
+            for step in self.steps
+        ]
+
+    def _init_schedule(self) -> None:
+        """根据当前步骤状态初始化调度状态"""
+        self._indegree = self.get_pending_indegrees()
+        self._index_by_id = {step.step_id: i for i, step in enumerate(self.steps)}
+        self._marked = {
+            index
+            for index, step in enumerate(self.steps)
+            if step.status == StepStatus.COMPLETED
+        }
+        self._ready = deque(
+            index
+            for index, step in enumerate(self.steps)
+            if step.status == StepStatus.PENDING and self._indegree[index] == 0
+        )
+
+    def mark_completed(self, step_id: int) -> None:
+        """
+        标记步骤完成，并将依赖已全部完成的后继步骤加入就绪队列
+
+        Args:
+            step_id: 步骤ID
+        """
+        if self._ready is None:
+            self._init_schedule()
+
+        index = self._index_by_id.get(step_id)
+        if index is None or index in self._marked:
+            return
+
+        self.steps[index].status = StepStatus.COMPLETED
+        self._release(index)
+
+    def _release(self, index: int) -> None:
+        """将步骤计为已完成，依赖已全部完成的后继步骤加入就绪队列"""
+        self._marked.add(index)
+        indegree = self._indegree
+        for successor in self.get_dependents()[index]:
+            indegree[successor] -= 1
+            if (
+                indegree[successor] == 0
+                and self.steps[successor].status == StepStatus.PENDING
+            ):
+                self._ready.append(successor)
+
+    def get_ready_steps(self) -> List[TaskStep]:
+        """获取所有依赖已完成、可立即执行的步骤"""
+        if self._ready is None:
+            self._init_schedule()
+
+        # 直接修改 status 完成（未经 mark_completed）的步骤同样释放后继步骤
+        if len(self._marked) < len(self.steps):
+            for index, step in enumerate(self.steps):
+                if step.status == StepStatus.COMPLETED and index not in self._marked:
+                    self._release(index)
+
+        # 就绪队列中已开始执行或已结束的步骤顺带移除
+        ready = self._ready
+        for _ in range(len(ready)):
+            index = ready.popleft()
+            if self.steps[index].status == StepStatus.PENDING:
+                ready.append(index)
+        return [self.steps[index] for index in ready]
 
     def get_next_step(self) -> Optional[TaskStep]:
         """获取下一个待执行的步骤"""
-        for step in self.steps:
-            if step.status == StepStatus.PENDING:
-                # 检查依赖是否完成
-                deps_completed = all(
-                    self.steps[dep_id - 1].status == StepStatus.COMPLETED
-                    for dep_id in step.depends_on
-                    if dep_id <= len(self.steps)
-                )
-                if deps_completed:
-                    return step
-        return None
+        ready = self.get_ready_steps()
+        return ready[0] if ready else None
 
     def is_completed(self) -> bool:
         """检查计划是否全部完成"""
@@ -84,31 +283,49 @@ class TaskPlan(BaseModel):
             "goal": self.goal,
             "original_query": self.original_query,
             "reasoning": self.reasoning,
-            "steps": [
-                {
-                    "step_id": s.step_id,
-                    "description": s.description,
-                    "skill_name": s.skill_name,
-                    "tool_name": s.tool_name,
-                    "status": s.status,
-                    "result": str(s.result)[:200] if s.result else None,
-                }
-                for s in self.steps
-            ],
+            "steps": [self._step_with_result(s) for s in self.steps],
         }
 
+    @staticmethod
+    def _step_with_result(step: TaskStep) -> Dict[str, Any]:
+        """步骤摘要加上截断后的结果"""
+        data = step_to_dict(step)
+        data["result"] = str(step.result)[:200] if step.result else None
+        return data
+
 
-class Task(BaseModel):
+@dataclass(slots=True)
+class Task:
     """
     任务对象
     表示一个完整的用户任务
+
+    Attributes:
+        task_id: 任务ID
+        user_query: 用户原始输入
+        plan: 任务规划
+        final_answer: 最终回答
+        status: 任务状态
+        created_at: 创建时间（纳秒时间戳）
+        completed_at: 完成时间（纳秒时间戳）
+        metadata: 元数据
     """
 
-    task_id: str = Field(..., description="任务ID")
-    user_query: str = Field(..., description="用户原始输入")
-    plan: Optional[TaskPlan] = Field(None, description="任务规划")
-    final_answer: Optional[str] = Field(None, description="最终回答")
-    status: str = Field(default="created", description="任务状态")
-    created_at: datetime = Field(default_factory=datetime.now, description="创建时间")
-    completed_at: Optional[datetime] = Field(None, description="完成时间")
-    metadata: Dict[str, Any] = Field(default_factory=dict, description="元数据")
+    task_id: str
+    user_query: str
+    plan: Optional[TaskPlan] = None
+    final_answer: Optional[str] = None
+    status: str = "created"
+    created_at: int = field(default_factory=time_ns)
+    completed_at: Optional[int] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def created_at_iso(self) -> str:
+        """创建时间的 ISO 字符串（按需格式化）"""
+        return ns_to_iso(self.created_at)
+
+    @property
+    def completed_at_iso(self) -> Optional[str]:
+        """完成时间的 ISO 字符串，未完成时为 None"""
+        return ns_to_iso(self.completed_at)
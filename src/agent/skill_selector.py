@@ -3,7 +3,9 @@
 根据任务步骤选择合适的技能
 """
 
-from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from types import MappingProxyType
+from typing import (TYPE_CHECKING, Any, Dict, Iterable, List, Mapping,
+                    Optional, Set)
 
 from src.core.exceptions import SkillNotFoundException
 from src.core.logging import get_logger
@@ -28,8 +30,22 @@ class SkillSelector:
         """初始化技能选择器"""
         self._skills: Dict[str, "BaseSkill"] = {}
         self._skill_metadata: Dict[str, Dict[str, Any]] = {}
+        # 只读视图：对外返回时无需复制
+        self._skills_view = MappingProxyType(self._skills)
+        self._skill_metadata_view = MappingProxyType(self._skill_metadata)
+        # 小写技能名 -> 注册名，注册时预先计算，模糊匹配时不再逐个转换
+        self._skills_lower: Dict[str, str] = {}
+        # 技能集合版本号，注册/注销时递增，供下游判断派生数据是否过期
+        self._skills_version = 0
+        # 技能列表缓存，注册/注销时失效
+        self._list_cache: Optional[List[Dict[str, Any]]] = None
         logger.debug("SkillSelector initialized")
 
+    @property
+    def skills_version(self) -> int:
+        """技能集合版本号"""
+        return self._skills_version
+
     def register_skill(
         self, name: str, skill: "BaseSkill", metadata: Dict[str, Any] = None
     ) -> None:
@@ -42,10 +58,12 @@ class SkillSelector:
             metadata: 技能元数据
         """
         self._skills[name] = skill
+        self._skills_lower[name.lower()] = name
         self._skill_metadata[name] = metadata or {
             "description": getattr(skill, "description", ""),
             "tools": getattr(skill, "required_tools", []),
         }
+        self._invalidate_caches()
         logger.info(f"Registered skill: {name}")
 
     def unregister_skill(self, name: str) -> bool:
@@ -61,10 +79,18 @@ class SkillSelector:
         if name in self._skills:
             del self._skills[name]
             del self._skill_metadata[name]
+            if self._skills_lower.get(name.lower()) == name:
+                del self._skills_lower[name.lower()]
+            self._invalidate_caches()
             logger.info(f"Unregistered skill: {name}")
             return True
         return False
 
+    def _invalidate_caches(self) -> None:
+        """技能集合变化：递增版本号并清除派生数据缓存"""
+        self._skills_version += 1
+        self._list_cache = None
+
     def get_skill(self, name: str) -> Optional["BaseSkill"]:
         """
         获取技能实例
@@ -96,12 +122,18 @@ class SkillSelector:
             logger.debug(f"Selected skill: {skill_name}")
             return self._skills[skill_name]
 
-        # 尝试模糊匹配
+        # 忽略大小写的精确匹配
         skill_name_lower = skill_name.lower()
-        for name, skill in self._skills.items():
-            if skill_name_lower in name.lower() or name.lower() in skill_name_lower:
+        name = self._skills_lower.get(skill_name_lower)
+        if name is not None:
+            logger.debug(f"Selected skill: {name} for request: {skill_name}")
+            return self._skills[name]
+
+        # 尝试模糊匹配
+        for name_lower, name in self._skills_lower.items():
+            if skill_name_lower in name_lower or name_lower in skill_name_lower:
                 logger.debug(f"Fuzzy matched skill: {name} for request: {skill_name}")
-                return skill
+                return self._skills[name]
 
         # 后备到 direct_answer
         if fallback and "direct_answer" in self._skills:
@@ -115,34 +147,40 @@ class SkillSelector:
             details={"available_skills": list(self._skills.keys())},
         )
 
-    def get_all_skills(self) -> Dict[str, "BaseSkill"]:
-        """获取所有注册的技能"""
-        return self._skills.copy()
+    def get_all_skills(self) -> Mapping[str, "BaseSkill"]:
+        """获取所有注册的技能（只读视图）"""
+        return self._skills_view
 
-    def get_skills_for_planner(self) -> Dict[str, Dict[str, Any]]:
+    def get_skills_for_planner(self) -> Mapping[str, Dict[str, Any]]:
         """
         获取供 Planner 使用的技能描述
 
+        返回随注册/注销实时更新的只读视图，可配合 skills_version 判断是否变化
+
         Returns:
             技能名称到描述的映射
         """
-        return self._skill_metadata.copy()
+        return self._skill_metadata_view
 
     def list_skills(self) -> List[Dict[str, Any]]:
         """
         列出所有技能信息
 
+        结果在技能集合变化前复用同一个快照，调用方不应修改
+
         Returns:
             技能信息列表
         """
-        return [
-            {
-                "name": name,
-                "description": meta.get("description", ""),
-                "tools": meta.get("tools", []),
-            }
-            for name, meta in self._skill_metadata.items()
-        ]
+        if self._list_cache is None:
+            self._list_cache = [
+                {
+                    "name": name,
+                    "description": meta.get("description", ""),
+                    "tools": meta.get("tools", []),
+                }
+                for name, meta in self._skill_metadata.items()
+            ]
+        return self._list_cache
 
     def validate_skill_availability(self, skill_names: List[str]) -> Dict[str, bool]:
         """
@@ -156,6 +194,19 @@ class SkillSelector:
         """
         return {name: name in self._skills for name in skill_names}
 
+    def available_subset(self, skill_names: Iterable[str]) -> Set[str]:
+        """
+        获取已注册的技能名称子集
+
+        Args:
+            skill_names: 技能名称
+
+        Returns:
+            其中已注册的技能名称集合
+        """
+        # dict 键视图直接做集合交集，不复制注册表
+        return self._skills.keys() & skill_names
+
     def __contains__(self, name: str) -> bool:
         """检查技能是否已注册"""
         return name in self._skills
@@ -0,0 +1,130 @@
+"""
+工具调用缓存
+
+对相同 (tool_name, params) 的 MCP 工具调用结果做 LRU + TTL 缓存，
+避免同一规划内重复的确定性查询反复走 MCP 往返
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Optional, Tuple
+
+from src.core.logging import get_logger
+
+if TYPE_CHECKING:
+    from src.mcp.client import MCPClient
+
+logger = get_logger("agent.tool_cache")
+
+# 工具参数中的禁用缓存标记（用于有副作用的工具）
+NO_CACHE_FLAG = "__no_cache__"
+
+_MISSING = object()
+
+
+class ToolRunCache:
+    """
+    工具调用结果缓存
+
+    - OrderedDict 实现 LRU 淘汰
+    - 可选 TTL 过期
+    """
+
+    def __init__(self, maxsize: int = 512, ttl_seconds: Optional[float] = None):
+        """
+        初始化缓存
+
+        Args:
+            maxsize: 最大缓存条目数
+            ttl_seconds: 过期时间（秒），为空则不过期
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(tool_name: str, params: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+        """生成缓存键：工具名 + 规范化 JSON 参数"""
+        return (
+            tool_name,
+            json.dumps(params or {}, sort_keys=True, default=str, ensure_ascii=False),
+        )
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取缓存值，未命中或已过期返回 default"""
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            self.misses += 1
+            return default
+
+        stored_at, value = item
+        if self.ttl_seconds is not None and (
+            time.monotonic() - stored_at > self.ttl_seconds
+        ):
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """写入缓存"""
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class CachedToolClient:
+    """
+    带缓存的 MCP 客户端代理
+
+    传给技能使用，call_tool 走缓存，其他属性透传给原客户端
+    """
+
+    def __init__(self, client: "MCPClient", cache: ToolRunCache):
+        self._client = client
+        self._cache = cache
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any] = None) -> Any:
+        """调用工具（命中缓存时直接返回）"""
+        arguments = arguments or {}
+        if arguments.get(NO_CACHE_FLAG):
+            arguments = {k: v for k, v in arguments.items() if k != NO_CACHE_FLAG}
+            return await self._client.call_tool(tool_name, arguments)
+
+        key = ToolRunCache.make_key(tool_name, arguments)
+        cached = self._cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            logger.debug(f"Tool cache hit: {tool_name}")
+            return cached
+
+        result = await self._client.call_tool(tool_name, arguments)
+        self._cache.set(key, result)
+        return result
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
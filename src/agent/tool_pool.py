@@ -0,0 +1,91 @@
+"""
+工具调用并发控制
+
+按工具名限制 MCP 工具的并发调用数，并以全局上限兜底，
+避免规划步骤并发展开后同时压向同一工具端点造成限流
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from src.core.exceptions import ToolCallException
+from src.core.logging import get_logger
+
+if TYPE_CHECKING:
+    from src.mcp.client import MCPClient
+
+logger = get_logger("agent.tool_pool")
+
+
+class BoundedToolClient:
+    """
+    带并发上限的 MCP 客户端代理
+
+    - 每个工具名一个信号量，按需创建
+    - 全局信号量限制同时进行的工具调用总数
+    - 单次调用超时，避免慢工具长期占用并发名额
+    """
+
+    def __init__(
+        self,
+        client: "MCPClient",
+        tool_concurrency: Optional[Dict[str, int]] = None,
+        default_concurrency: int = 4,
+        max_concurrent: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        """
+        初始化客户端代理
+
+        Args:
+            client: 原 MCP 客户端
+            tool_concurrency: 各工具的最大并发数
+            default_concurrency: 未单独配置的工具的最大并发数
+            max_concurrent: 全部工具的最大并发数，为空则不限制
+            timeout: 单次工具调用超时（秒），为空则不限制
+        """
+        self._client = client
+        self._tool_concurrency = tool_concurrency or {}
+        self._default_concurrency = default_concurrency
+        self._global_semaphore = (
+            asyncio.Semaphore(max_concurrent) if max_concurrent else None
+        )
+        self._timeout = timeout
+        self._tool_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_tool_semaphore(self, tool_name: str) -> asyncio.Semaphore:
+        """获取（必要时创建）工具对应的信号量"""
+        semaphore = self._tool_semaphores.get(tool_name)
+        if semaphore is None:
+            limit = self._tool_concurrency.get(tool_name, self._default_concurrency)
+            semaphore = asyncio.Semaphore(limit)
+            self._tool_semaphores[tool_name] = semaphore
+        return semaphore
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any] = None) -> Any:
+        """在并发上限内调用工具"""
+        # 先占工具名额再占全局名额，排队等待同一工具时不占用全局名额
+        async with self._get_tool_semaphore(tool_name):
+            if self._global_semaphore is None:
+                return await self._call_with_timeout(tool_name, arguments)
+            async with self._global_semaphore:
+                return await self._call_with_timeout(tool_name, arguments)
+
+    async def _call_with_timeout(
+        self, tool_name: str, arguments: Optional[Dict[str, Any]]
+    ) -> Any:
+        """调用工具，超时则抛出 ToolCallException"""
+        call = self._client.call_tool(tool_name, arguments)
+        if self._timeout is None:
+            return await call
+        try:
+            return await asyncio.wait_for(call, timeout=self._timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {tool_name} timed out after {self._timeout}s")
+            raise ToolCallException(
+                message=f"工具 {tool_name} 调用超时",
+                details={"tool_name": tool_name, "timeout": self._timeout},
+            )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
@@ -8,28 +8,54 @@ Tool 调用记录器
 - 调用链路
 
 支持：
-- 持久化存储 (JSON/SQLite)
+- 持久化存储 (JSON Lines，每次调用追加一行，由后台线程写盘；或 SQLite)
 - 查询和分析
 - 导出报告
 """
 
 import asyncio
-import json
-from collections import defaultdict
+import atexit
+import heapq
+import io
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime
+from operator import itemgetter
+from os import urandom
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple
 
 from src.core.config import get_settings
 from src.core.logging import get_logger
+from src.core.serialization import dumps, dumps_bytes, loads
 
 logger = get_logger("tool.recorder")
 
+# 条目 ID：进程级随机前缀 + 自增序号（记录会持久化，前缀避免重启后重复）
+_ID_PREFIX = urandom(4).hex()
+_id_counter = itertools.count()
 
-@dataclass
+# 按工具聚合的统计槽位：[调用数, 失败数, 总耗时(ms)]
+_AGG_COUNT, _AGG_FAILED, _AGG_TOTAL_MS = range(3)
+
+
+def _read_timestamp(data: Dict[str, Any], ts_key: str, iso_key: str) -> Optional[float]:
+    """读取 epoch 秒时间戳，兼容旧记录中的 ISO 时间字符串"""
+    ts = data.get(ts_key)
+    if ts is not None:
+        return ts
+    iso = data.get(iso_key)
+    return datetime.fromisoformat(iso).timestamp() if iso else None
+
+
+@dataclass(slots=True)
 class ToolCallEntry:
-    """工具调用条目"""
+    """工具调用条目（slots dataclass，省去每条记录的实例 __dict__）"""
 
     id: str
     tool_name: str
@@ -38,9 +64,9 @@ class ToolCallEntry:
     success: bool = True
     error: Optional[str] = None
 
-    # 时间信息
-    start_time: datetime = field(default_factory=datetime.now)
-    end_time: Optional[datetime] = None
+    # 时间信息（epoch 秒，仅在展示时转换为 datetime）
+    start_ts: float = field(default_factory=time.time)
+    end_ts: Optional[float] = None
     duration_ms: Optional[float] = None
 
     # 上下文信息
@@ -54,8 +80,8 @@ class ToolCallEntry:
 
     def complete(self, result: Dict[str, Any] = None, error: str = None):
         """完成调用"""
-        self.end_time = datetime.now()
-        self.duration_ms = (self.end_time - self.start_time).total_seconds() * 1000
+        self.end_ts = time.time()
+        self.duration_ms = (self.end_ts - self.start_ts) * 1000.0
 
         if error:
             self.success = False
@@ -64,6 +90,16 @@ class ToolCallEntry:
             self.success = True
             self.result = result
 
+    @property
+    def start_time(self) -> datetime:
+        """开始时间"""
+        return datetime.fromtimestamp(self.start_ts)
+
+    @property
+    def end_time(self) -> Optional[datetime]:
+        """结束时间"""
+        return datetime.fromtimestamp(self.end_ts) if self.end_ts else None
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             "id": self.id,
@@ -72,8 +108,8 @@ class ToolCallEntry:
             "result": self.result,
             "success": self.success,
             "error": self.error,
-            "start_time": self.start_time.isoformat(),
-            "end_time": self.end_time.isoformat() if self.end_time else None,
+            "start_ts": self.start_ts,
+            "end_ts": self.end_ts,
             "duration_ms": self.duration_ms,
             "session_id": self.session_id,
             "trace_id": self.trace_id,
@@ -91,16 +127,8 @@ class ToolCallEntry:
             result=data.get("result"),
             success=data.get("success", True),
             error=data.get("error"),
-            start_time=(
-                datetime.fromisoformat(data["start_time"])
-                if data.get("start_time")
-                else datetime.now()
-            ),
-            end_time=(
-                datetime.fromisoformat(data["end_time"])
-                if data.get("end_time")
-                else None
-            ),
+            start_ts=_read_timestamp(data, "start_ts", "start_time") or time.time(),
+            end_ts=_read_timestamp(data, "end_ts", "end_time"),
             duration_ms=data.get("duration_ms"),
             session_id=data.get("session_id"),
             trace_id=data.get("trace_id"),
@@ -149,15 +177,41 @@ class ToolRecorder:
         self.max_entries = max_entries
 
         self.entries: Dict[str, ToolCallEntry] = {}
-        self._call_order: List[str] = []  # 保持顺序
-
-        # 统计缓存
+        # 保持顺序，超出上限时自动丢弃最早的 ID
+        self._call_order: Deque[str] = deque(maxlen=max_entries)
+
+        # 二级索引：属性值 -> 按调用顺序排列的条目 ID
+        self._by_tool: Dict[str, Deque[str]] = {}
+        self._by_session: Dict[str, Deque[str]] = {}
+        self._by_trace: Dict[str, Deque[str]] = {}
+        # 失败条目 ID（按完成顺序）
+        self._failed: Dict[str, None] = {}
+
+        # 增量统计：按工具的调用数/失败数/总耗时，以及已计入的各条目耗时
+        self._tool_agg: Dict[str, List[float]] = {}
+        self._durations: Dict[str, float] = {}
+        self._duration_sum = 0.0
+        self._duration_min: Optional[float] = None
+        self._duration_max: Optional[float] = None
+        # 淘汰了最小/最大耗时的条目后需重新计算边界
+        self._duration_bounds_stale = False
+        # 汇总后的统计结果，记录变化时置空
         self._stats_cache: Optional[Dict[str, Any]] = None
-        self._stats_cache_time: Optional[datetime] = None
 
-        # 从存储加载
+        # 后台写盘：队列元素交给 _write_item 写入，None 表示退出
+        self._write_queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        # 写线程持有的追加文件句柄，以及文件中的记录行数
+        self._fp: Optional[BinaryIO] = None
+        self._stored_lines = 0
+
+        # 从存储加载；首次启动时导入旧版 JSON 格式的记录
         if self.storage_path and self.storage_path.exists():
             self._load_from_storage()
+        elif self.storage_path:
+            legacy_path = self.storage_path.with_suffix(".json")
+            if legacy_path != self.storage_path and legacy_path.exists():
+                self._import_legacy_storage(legacy_path)
 
     def start_call(
         self,
@@ -184,9 +238,7 @@ class ToolRecorder:
         Returns:
             ToolCallEntry: 调用条目
         """
-        import uuid
-
-        entry_id = f"call_{uuid.uuid4().hex[:12]}"
+        entry_id = f"call_{_ID_PREFIX}_{next(_id_counter):x}"
 
         entry = ToolCallEntry(
             id=entry_id,
@@ -199,14 +251,7 @@ class ToolRecorder:
             metadata=metadata,
         )
 
-        self.entries[entry_id] = entry
-        self._call_order.append(entry_id)
-
-        # 清理旧记录
-        self._cleanup_old_entries()
-
-        # 清除统计缓存
-        self._stats_cache = None
+        self._add_entry(entry)
 
         logger.debug(f"Started tool call: {tool_name} ({entry_id})")
         return entry
@@ -231,13 +276,11 @@ class ToolRecorder:
             return None
 
         entry.complete(result=result, error=error)
-
-        # 清除统计缓存
-        self._stats_cache = None
+        self._record_completion(entry)
 
         # 持久化
         if self.storage_path:
-            self._save_to_storage()
+            self._save_to_storage(entry)
 
         status = "success" if entry.success else "failed"
         logger.debug(
@@ -246,6 +289,25 @@ class ToolRecorder:
 
         return entry
 
+    async def end_call_async(
+        self, entry_id: str, result: Dict[str, Any] = None, error: str = None
+    ) -> Optional[ToolCallEntry]:
+        """
+        完成工具调用记录，并等待记录写入存储后返回
+
+        Args:
+            entry_id: 条目 ID
+            result: 调用结果
+            error: 错误信息
+
+        Returns:
+            ToolCallEntry: 更新后的条目
+        """
+        entry = self.end_call(entry_id, result=result, error=error)
+        if entry is not None and self.storage_path:
+            await asyncio.to_thread(self.flush)
+        return entry
+
     def record_call(
         self,
         tool_name: str,
@@ -253,6 +315,7 @@ class ToolRecorder:
         result: Dict[str, Any] = None,
         error: str = None,
         duration_ms: float = None,
+        persist: bool = True,
         **context,
     ) -> ToolCallEntry:
         """
@@ -264,6 +327,7 @@ class ToolRecorder:
             result: 调用结果
             error: 错误信息
             duration_ms: 执行时间
+            persist: 是否立即提交持久化（批量记录时由调用方统一提交）
             **context: 上下文信息
 
         Returns:
@@ -273,104 +337,133 @@ class ToolRecorder:
         entry.complete(result=result, error=error)
         if duration_ms is not None:
             entry.duration_ms = duration_ms
+        self._record_completion(entry)
 
-        if self.storage_path:
-            self._save_to_storage()
+        if persist and self.storage_path:
+            self._save_to_storage(entry)
 
         return entry
 
+    def record_batch(self, calls: List[Dict[str, Any]]) -> List[ToolCallEntry]:
+        """
+        批量记录完整的工具调用，所有记录合并为一次写入
+
+        Args:
+            calls: record_call 的关键字参数字典列表
+
+        Returns:
+            调用条目列表
+        """
+        entries = [self.record_call(**call, persist=False) for call in calls]
+        if entries and self.storage_path:
+            self._save_to_storage(*entries)
+        return entries
+
     def get_call(self, entry_id: str) -> Optional[ToolCallEntry]:
         """获取调用记录"""
         return self.entries.get(entry_id)
 
+    def iter_calls(self) -> Iterator[ToolCallEntry]:
+        """按调用顺序迭代所有调用记录（不复制列表）"""
+        # 淘汰时 entries 与 _call_order 同步移除，无需逐个检查
+        return map(self.entries.__getitem__, self._call_order)
+
     def get_all_calls(self) -> List[ToolCallEntry]:
         """获取所有调用记录"""
-        return [self.entries[id] for id in self._call_order if id in self.entries]
+        return list(self.iter_calls())
 
     def get_calls_by_tool(self, tool_name: str) -> List[ToolCallEntry]:
         """按工具名获取调用记录"""
-        return [e for e in self.get_all_calls() if e.tool_name == tool_name]
+        return [self.entries[i] for i in self._by_tool.get(tool_name, ())]
 
     def get_calls_by_session(self, session_id: str) -> List[ToolCallEntry]:
         """按会话获取调用记录"""
-        return [e for e in self.get_all_calls() if e.session_id == session_id]
+        return [self.entries[i] for i in self._by_session.get(session_id, ())]
 
     def get_calls_by_trace(self, trace_id: str) -> List[ToolCallEntry]:
         """按追踪 ID 获取调用记录"""
-        return [e for e in self.get_all_calls() if e.trace_id == trace_id]
+        return [self.entries[i] for i in self._by_trace.get(trace_id, ())]
 
     def get_recent_calls(self, limit: int = 100) -> List[ToolCallEntry]:
         """获取最近的调用记录"""
-        return self.get_all_calls()[-limit:]
+        order = self._call_order
+        return [
+            self.entries[entry_id]
+            for entry_id in itertools.islice(order, max(0, len(order) - limit), None)
+        ]
 
     def get_failed_calls(self) -> List[ToolCallEntry]:
-        """获取失败的调用记录"""
-        return [e for e in self.get_all_calls() if not e.success]
+        """获取失败的调用记录（按完成顺序）"""
+        return [self.entries[i] for i in self._failed]
+
+    def top_slow(self, n: int = 10) -> List[ToolCallEntry]:
+        """获取耗时最长的 n 条已完成调用（由慢到快）"""
+        top = heapq.nlargest(n, self._durations.items(), key=itemgetter(1))
+        return [self.entries[entry_id] for entry_id, _ in top]
+
+    def top_fast(self, n: int = 10) -> List[ToolCallEntry]:
+        """获取耗时最短的 n 条已完成调用（由快到慢）"""
+        top = heapq.nsmallest(n, self._durations.items(), key=itemgetter(1))
+        return [self.entries[entry_id] for entry_id, _ in top]
 
     def get_statistics(self, force_refresh: bool = False) -> Dict[str, Any]:
         """
         获取统计信息
 
+        汇总结果缓存到下一次记录变化为止，调用方不应修改
+
+        Args:
+            force_refresh: 是否忽略缓存重新汇总
+
         Returns:
             统计数据字典
         """
-        # 检查缓存
-        if not force_refresh and self._stats_cache:
-            cache_age = datetime.now() - self._stats_cache_time
-            if cache_age < timedelta(seconds=30):
-                return self._stats_cache
-
-        all_calls = self.get_all_calls()
-
-        # 基础统计
-        total_calls = len(all_calls)
-        successful_calls = sum(1 for e in all_calls if e.success)
-        failed_calls = total_calls - successful_calls
-
-        # 按工具统计
-        tool_stats = defaultdict(
-            lambda: {"count": 0, "success": 0, "total_duration_ms": 0}
-        )
-        for entry in all_calls:
-            stats = tool_stats[entry.tool_name]
-            stats["count"] += 1
-            if entry.success:
-                stats["success"] += 1
-            if entry.duration_ms:
-                stats["total_duration_ms"] += entry.duration_ms
-
-        # 计算平均时间
-        for tool_name, stats in tool_stats.items():
-            if stats["count"] > 0:
-                stats["avg_duration_ms"] = stats["total_duration_ms"] / stats["count"]
-                stats["success_rate"] = stats["success"] / stats["count"] * 100
-
-        # 时间分布
-        durations = [e.duration_ms for e in all_calls if e.duration_ms]
-
-        result = {
+        if force_refresh or self._stats_cache is None:
+            self._stats_cache = self._compute_statistics()
+        return self._stats_cache
+
+    def _compute_statistics(self) -> Dict[str, Any]:
+        """汇总增量维护的统计量"""
+        total_calls = len(self.entries)
+        failed_calls = len(self._failed)
+        successful_calls = total_calls - failed_calls
+
+        tool_stats = {}
+        for tool_name, (count, failed, total_ms) in self._tool_agg.items():
+            success = count - failed
+            tool_stats[tool_name] = {
+                "count": count,
+                "success": success,
+                "total_duration_ms": total_ms,
+                "avg_duration_ms": total_ms / count,
+                "success_rate": success / count * 100,
+            }
+
+        if self._duration_bounds_stale:
+            durations = self._durations.values()
+            self._duration_min = min(durations) if durations else None
+            self._duration_max = max(durations) if durations else None
+            self._duration_bounds_stale = False
+
+        duration_count = len(self._durations)
+
+        return {
             "total_calls": total_calls,
             "successful_calls": successful_calls,
             "failed_calls": failed_calls,
             "success_rate": (
                 successful_calls / total_calls * 100 if total_calls > 0 else 0
             ),
-            "tool_stats": dict(tool_stats),
-            "avg_duration_ms": sum(durations) / len(durations) if durations else 0,
-            "min_duration_ms": min(durations) if durations else 0,
-            "max_duration_ms": max(durations) if durations else 0,
-            "unique_tools": len(tool_stats),
-            "unique_sessions": len(
-                set(e.session_id for e in all_calls if e.session_id)
+            "tool_stats": tool_stats,
+            "avg_duration_ms": (
+                self._duration_sum / duration_count if duration_count else 0
             ),
+            "min_duration_ms": self._duration_min or 0,
+            "max_duration_ms": self._duration_max or 0,
+            "unique_tools": len(tool_stats),
+            "unique_sessions": len(self._by_session),
         }
 
-        # 更新缓存
-        self._stats_cache = result
-        self._stats_cache_time = datetime.now()
-
-        return result
-
     def export_report(self, format: str = "json") -> str:
         """
         导出报告
@@ -382,60 +475,61 @@ class ToolRecorder:
             报告内容
         """
         stats = self.get_statistics()
-        calls = self.get_all_calls()
 
         if format == "json":
-            return json.dumps(
+            return dumps(
                 {
                     "statistics": stats,
-                    "calls": [e.to_dict() for e in calls],
+                    "calls": [e.to_dict() for e in self.iter_calls()],
                     "generated_at": datetime.now().isoformat(),
                 },
-                ensure_ascii=False,
-                indent=2,
+                indent=True,
             )
 
         elif format == "markdown":
-            lines = [
-                "# Tool Call Report",
-                "",
-                f"Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                "",
-                "## Statistics",
-                "",
-                f"- Total Calls: {stats['total_calls']}",
-                f"- Success Rate: {stats['success_rate']:.1f}%",
-                f"- Average Duration: {stats['avg_duration_ms']:.1f}ms",
-                f"- Unique Tools: {stats['unique_tools']}",
-                "",
-                "## Tool Breakdown",
-                "",
-                "| Tool | Calls | Success Rate | Avg Duration |",
-                "|------|-------|--------------|--------------|",
-            ]
+            buf = io.StringIO()
+            w = buf.write
+            w("# Tool Call Report\n\n")
+            w(f"Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+            w("## Statistics\n\n")
+            w("- Total Calls: %d\n" % stats["total_calls"])
+            w("- Success Rate: %.1f%%\n" % stats["success_rate"])
+            w("- Average Duration: %.1fms\n" % stats["avg_duration_ms"])
+            w("- Unique Tools: %d\n\n" % stats["unique_tools"])
+            w("## Tool Breakdown\n\n")
+            w("| Tool | Calls | Success Rate | Avg Duration |\n")
+            w("|------|-------|--------------|--------------|\n")
 
             for tool_name, tool_stat in stats["tool_stats"].items():
-                lines.append(
-                    f"| {tool_name} | {tool_stat['count']} | "
-                    f"{tool_stat['success_rate']:.1f}% | "
-                    f"{tool_stat.get('avg_duration_ms', 0):.1f}ms |"
+                w(
+                    "| %s | %d | %.1f%% | %.1fms |\n"
+                    % (
+                        tool_name,
+                        tool_stat["count"],
+                        tool_stat["success_rate"],
+                        tool_stat.get("avg_duration_ms", 0),
+                    )
                 )
 
-            lines.extend(
-                [
-                    "",
-                    "## Recent Calls",
-                    "",
-                ]
-            )
+            w("\n## Recent Calls\n\n")
 
-            for entry in calls[-10:]:
-                status = "✅" if entry.success else "❌"
-                lines.append(
-                    f"- {status} `{entry.tool_name}` - {entry.duration_ms:.1f}ms"
+            for entry in self.get_recent_calls(10):
+                w(
+                    "- %s `%s` - %.1fms\n"
+                    % (
+                        "✅" if entry.success else "❌",
+                        entry.tool_name,
+                        entry.duration_ms or 0,
+                    )
                 )
 
-            return "\n".join(lines)
+            w("\n## Slowest Calls\n\n")
+
+            for entry in self.top_slow(10):
+                w("- `%s` - %.1fms\n" % (entry.tool_name, entry.duration_ms))
+
+            # 与原先 "\n".join 的输出保持一致：末尾不带换行
+            return buf.getvalue()[:-1]
 
         else:
             raise ValueError(f"Unsupported format: {format}")
@@ -444,31 +538,197 @@ class ToolRecorder:
         """清除所有记录"""
         self.entries.clear()
         self._call_order.clear()
+        self._by_tool.clear()
+        self._by_session.clear()
+        self._by_trace.clear()
+        self._failed.clear()
+        self._tool_agg.clear()
+        self._durations.clear()
+        self._duration_sum = 0.0
+        self._duration_min = None
+        self._duration_max = None
+        self._duration_bounds_stale = False
         self._stats_cache = None
 
+        self.close()
+        self._stored_lines = 0
         if self.storage_path and self.storage_path.exists():
             self.storage_path.unlink()
 
-    def _cleanup_old_entries(self):
-        """清理旧记录"""
-        while len(self._call_order) > self.max_entries:
-            old_id = self._call_order.pop(0)
-            self.entries.pop(old_id, None)
-
-    def _save_to_storage(self):
-        """保存到存储"""
+    def flush(self):
+        """阻塞等待已提交的记录全部写入存储"""
+        if self._writer is not None:
+            self._write_queue.join()
+
+    def close(self):
+        """写完待写入的记录，停止写线程并关闭文件句柄"""
+        if self._writer is not None:
+            self._write_queue.put(None)
+            self._writer.join()
+            self._writer = None
+            atexit.unregister(self.close)
+
+    def _index_entry(self, entry: ToolCallEntry):
+        """将条目加入二级索引"""
+        self._stats_cache = None
+        for index, key in (
+            (self._by_tool, entry.tool_name),
+            (self._by_session, entry.session_id),
+            (self._by_trace, entry.trace_id),
+        ):
+            if key is not None:
+                index.setdefault(key, deque()).append(entry.id)
+
+        agg = self._tool_agg.get(entry.tool_name)
+        if agg is None:
+            agg = self._tool_agg[entry.tool_name] = [0, 0, 0.0]
+        agg[_AGG_COUNT] += 1
+        self._record_completion(entry)
+
+    def _unindex_entry(self, entry: ToolCallEntry):
+        """将被淘汰的条目移出二级索引"""
+        self._stats_cache = None
+        for index, key in (
+            (self._by_tool, entry.tool_name),
+            (self._by_session, entry.session_id),
+            (self._by_trace, entry.trace_id),
+        ):
+            ids = index.get(key)
+            if not ids:
+                continue
+            # 按调用顺序淘汰，被淘汰的条目总在各索引队首
+            if ids[0] == entry.id:
+                ids.popleft()
+            elif entry.id in ids:
+                ids.remove(entry.id)
+            if not ids:
+                del index[key]
+
+        agg = self._tool_agg[entry.tool_name]
+        if entry.id in self._failed:
+            del self._failed[entry.id]
+            agg[_AGG_FAILED] -= 1
+        duration = self._durations.pop(entry.id, None)
+        if duration is not None:
+            self._duration_sum -= duration
+            agg[_AGG_TOTAL_MS] -= duration
+            if duration in (self._duration_min, self._duration_max):
+                self._duration_bounds_stale = True
+        agg[_AGG_COUNT] -= 1
+        if agg[_AGG_COUNT] == 0:
+            del self._tool_agg[entry.tool_name]
+
+    def _record_completion(self, entry: ToolCallEntry):
+        """根据条目完成状态更新失败索引与耗时统计"""
+        self._stats_cache = None
+        agg = self._tool_agg[entry.tool_name]
+        if entry.success:
+            if entry.id in self._failed:
+                del self._failed[entry.id]
+                agg[_AGG_FAILED] -= 1
+        elif entry.id not in self._failed:
+            self._failed[entry.id] = None
+            agg[_AGG_FAILED] += 1
+
+        # 重复完成时先撤销之前计入的耗时
+        previous = self._durations.pop(entry.id, None)
+        if previous is not None:
+            self._duration_sum -= previous
+            agg[_AGG_TOTAL_MS] -= previous
+            if previous in (self._duration_min, self._duration_max):
+                self._duration_bounds_stale = True
+
+        duration = entry.duration_ms
+        if duration is None:
+            return
+        self._durations[entry.id] = duration
+        self._duration_sum += duration
+        agg[_AGG_TOTAL_MS] += duration
+        if self._duration_min is None or duration < self._duration_min:
+            self._duration_min = duration
+        if self._duration_max is None or duration > self._duration_max:
+            self._duration_max = duration
+
+    def _add_entry(self, entry: ToolCallEntry):
+        """加入条目，达到上限时淘汰最早的记录"""
+        order = self._call_order
+        # 记录即将被 deque 挤出的 ID，同步移出条目与索引
+        evicted_id = order[0] if order and len(order) == order.maxlen else None
+
+        self.entries[entry.id] = entry
+        order.append(entry.id)
+        self._index_entry(entry)
+
+        if evicted_id is not None:
+            evicted = self.entries.pop(evicted_id, None)
+            if evicted is not None:
+                self._unindex_entry(evicted)
+
+    def _save_to_storage(self, *entries: ToolCallEntry):
+        """将完成的调用提交给写线程追加到存储文件"""
         if not self.storage_path:
             return
 
-        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
-
-        data = {
-            "entries": [e.to_dict() for e in self.get_all_calls()],
-            "saved_at": datetime.now().isoformat(),
-        }
+        self._start_writer()
+        # 在调用方线程序列化，写线程只负责落盘
+        data = b"".join(dumps_bytes(e.to_dict()) + b"\n" for e in entries)
+        self._write_queue.put(("ab", data))
+        self._stored_lines += len(entries)
+
+        # 文件中已淘汰/重复的记录过多时重写一次
+        if self._stored_lines > 2 * self.max_entries:
+            self._compact_storage()
+
+    def _compact_storage(self):
+        """只保留当前记录，重写存储文件"""
+        data = b"".join(dumps_bytes(e.to_dict()) + b"\n" for e in self.iter_calls())
+        self._write_queue.put(("wb", data))
+        self._stored_lines = len(self._call_order)
+
+    def _start_writer(self):
+        """按需启动写线程"""
+        if self._writer is not None:
+            return
 
-        with open(self.storage_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = threading.Thread(
+            target=self._write_loop, name="tool-recorder-writer", daemon=True
+        )
+        self._writer.start()
+        # 未显式关闭时，在解释器退出前写完队列中的记录
+        atexit.register(self.close)
+
+    def _write_loop(self):
+        """写线程：按提交顺序写入存储"""
+        while True:
+            item = self._write_queue.get()
+            try:
+                if item is None:
+                    return
+                self._write_item(item)
+            except Exception as e:
+                logger.error(f"Failed to write tool call records: {e}")
+            finally:
+                if item is None:
+                    self._close_storage()
+                self._write_queue.task_done()
+
+    def _write_item(self, item: Tuple[str, bytes]):
+        """写线程：按打开模式将字节数据写入存储文件"""
+        mode, data = item
+        if mode == "wb" and self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        if self._fp is None:
+            self._fp = open(self.storage_path, mode)
+        self._fp.write(data)
+        self._fp.flush()
+
+    def _close_storage(self):
+        """写线程退出时关闭文件句柄"""
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
 
     def _load_from_storage(self):
         """从存储加载"""
@@ -476,19 +736,278 @@ class ToolRecorder:
             return
 
         try:
-            with open(self.storage_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            for entry_data in data.get("entries", []):
-                entry = ToolCallEntry.from_dict(entry_data)
-                self.entries[entry.id] = entry
-                self._call_order.append(entry.id)
+            # 同一调用可能被追加多次，保留最后一次的记录
+            latest: Dict[str, ToolCallEntry] = {}
+            with open(self.storage_path, "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    self._stored_lines += 1
+                    try:
+                        entry = ToolCallEntry.from_dict(loads(line))
+                    except (ValueError, KeyError):
+                        # 跳过写入中断造成的残缺行
+                        continue
+                    latest[entry.id] = entry
+
+            for entry in latest.values():
+                self._add_entry(entry)
 
             logger.info(f"Loaded {len(self.entries)} tool call records")
 
         except Exception as e:
             logger.error(f"Failed to load tool call records: {e}")
 
+    def _import_legacy_storage(self, legacy_path: Path):
+        """
+        导入旧版存储文件
+
+        旧版将全部记录保存为单个 JSON 文档 {"entries": [...], "saved_at": ...}，
+        导入后立即写成 JSON Lines 存储文件，旧文件保留不动
+
+        Args:
+            legacy_path: 旧版 JSON 文件路径
+        """
+        try:
+            with open(legacy_path, "rb") as f:
+                data = loads(f.read())
+            for item in data.get("entries", []):
+                self._add_entry(ToolCallEntry.from_dict(item))
+
+            self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.storage_path, "wb") as f:
+                for entry in self.iter_calls():
+                    f.write(dumps_bytes(entry.to_dict()) + b"\n")
+            self._stored_lines = len(self._call_order)
+
+            logger.info(
+                f"Imported {len(self.entries)} tool call records from {legacy_path}"
+            )
+
+        except Exception as e:
+            logger.error(f"Failed to import legacy tool call records: {e}")
+
+
+class SQLiteToolRecorder(ToolRecorder):
+    """
+    SQLite 存储的工具调用记录器
+
+    已完成的调用只保存在 SQLite 中，内存中仅保留进行中和待写入的调用；
+    写入与淘汰由写线程使用独立连接完成，查询前先等待待写入的记录落盘。
+    按工具/会话/追踪 ID/失败状态的查询走索引，统计由聚合 SQL 完成。
+    接口与 ToolRecorder 一致，统计只包含已完成的调用。
+    """
+
+    _SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS calls (
+            id TEXT PRIMARY KEY,
+            tool_name TEXT NOT NULL,
+            session_id TEXT,
+            trace_id TEXT,
+            skill_name TEXT,
+            success INTEGER NOT NULL,
+            start_ts REAL,
+            duration_ms REAL,
+            data BLOB NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_calls_tool ON calls(tool_name)",
+        "CREATE INDEX IF NOT EXISTS idx_calls_session ON calls(session_id)",
+        "CREATE INDEX IF NOT EXISTS idx_calls_trace ON calls(trace_id)",
+        "CREATE INDEX IF NOT EXISTS idx_calls_success ON calls(success)",
+    )
+
+    def __init__(self, storage_path: str, max_entries: int = 10000):
+        """
+        初始化记录器
+
+        Args:
+            storage_path: SQLite 数据库路径
+            max_entries: 最大记录数
+        """
+        super().__init__(storage_path=None, max_entries=max_entries)
+        self.storage_path = Path(storage_path)
+        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = self._connect(check_same_thread=False)
+        for statement in self._SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        # 写线程持有的连接
+        self._write_conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        """打开数据库连接（WAL 模式，写入时读取不阻塞）"""
+        conn = sqlite3.connect(str(self.storage_path), **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _add_entry(self, entry: ToolCallEntry):
+        """进行中的调用只保存在内存中"""
+        self.entries[entry.id] = entry
+
+    def _record_completion(self, entry: ToolCallEntry):
+        """统计由 SQL 聚合完成，无需维护内存统计"""
+
+    def _save_to_storage(self, *entries: ToolCallEntry):
+        """将完成的调用提交给写线程写入数据库"""
+        self._stats_cache = None
+        self._start_writer()
+        # 在调用方线程序列化，写线程只负责写库
+        rows = [
+            (
+                e.id,
+                e.tool_name,
+                e.session_id,
+                e.trace_id,
+                e.skill_name,
+                int(e.success),
+                e.start_ts,
+                e.duration_ms,
+                dumps_bytes(e.to_dict()),
+            )
+            for e in entries
+        ]
+        self._write_queue.put((rows, [e.id for e in entries]))
+
+    def _write_item(self, item: Tuple[List[tuple], List[str]]):
+        """写线程：写入已完成的调用，并只保留最新的 max_entries 条记录"""
+        rows, entry_ids = item
+        if self._write_conn is None:
+            self._write_conn = self._connect()
+        conn = self._write_conn
+        conn.executemany(
+            "INSERT OR REPLACE INTO calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        # 按条数淘汰：重复写入的 ID 会重新分配 rowid，rowid 不连续
+        conn.execute(
+            "DELETE FROM calls WHERE rowid IN "
+            "(SELECT rowid FROM calls ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        conn.commit()
+        # 落库后才移出内存，期间 get_call 仍能取到
+        for entry_id in entry_ids:
+            self.entries.pop(entry_id, None)
+
+    def _close_storage(self):
+        """写线程退出时关闭写连接"""
+        if self._write_conn is not None:
+            self._write_conn.close()
+            self._write_conn = None
+
+    def _select(
+        self, where: str = "", params: tuple = (), order: str = "ORDER BY rowid"
+    ) -> List[ToolCallEntry]:
+        """按条件查询已完成的调用（默认按写入顺序）"""
+        self.flush()
+        rows = self._conn.execute(f"SELECT data FROM calls {where} {order}", params)
+        return [ToolCallEntry.from_dict(loads(data)) for (data,) in rows]
+
+    def get_call(self, entry_id: str) -> Optional[ToolCallEntry]:
+        """获取调用记录"""
+        entry = self.entries.get(entry_id)
+        if entry is not None:
+            return entry
+        calls = self._select("WHERE id = ?", (entry_id,))
+        return calls[0] if calls else None
+
+    def iter_calls(self) -> Iterator[ToolCallEntry]:
+        """按写入顺序迭代已完成的调用"""
+        return iter(self._select())
+
+    def get_calls_by_tool(self, tool_name: str) -> List[ToolCallEntry]:
+        """按工具名获取调用记录"""
+        return self._select("WHERE tool_name = ?", (tool_name,))
+
+    def get_calls_by_session(self, session_id: str) -> List[ToolCallEntry]:
+        """按会话获取调用记录"""
+        return self._select("WHERE session_id = ?", (session_id,))
+
+    def get_calls_by_trace(self, trace_id: str) -> List[ToolCallEntry]:
+        """按追踪 ID 获取调用记录"""
+        return self._select("WHERE trace_id = ?", (trace_id,))
+
+    def get_recent_calls(self, limit: int = 100) -> List[ToolCallEntry]:
+        """获取最近的调用记录"""
+        self.flush()
+        rows = self._conn.execute(
+            "SELECT data FROM calls ORDER BY rowid DESC LIMIT ?", (max(0, limit),)
+        ).fetchall()
+        return [ToolCallEntry.from_dict(loads(data)) for (data,) in reversed(rows)]
+
+    def get_failed_calls(self) -> List[ToolCallEntry]:
+        """获取失败的调用记录"""
+        return self._select("WHERE success = 0")
+
+    def top_slow(self, n: int = 10) -> List[ToolCallEntry]:
+        """获取耗时最长的 n 条已完成调用（由慢到快）"""
+        return self._select(
+            "WHERE duration_ms IS NOT NULL",
+            (n,),
+            order="ORDER BY duration_ms DESC LIMIT ?",
+        )
+
+    def top_fast(self, n: int = 10) -> List[ToolCallEntry]:
+        """获取耗时最短的 n 条已完成调用（由快到慢）"""
+        return self._select(
+            "WHERE duration_ms IS NOT NULL", (n,), order="ORDER BY duration_ms LIMIT ?"
+        )
+
+    def _compute_statistics(self) -> Dict[str, Any]:
+        """用聚合 SQL 计算统计信息"""
+        self.flush()
+        tool_stats = {}
+        for tool_name, count, success, total_ms in self._conn.execute(
+            "SELECT tool_name, COUNT(*), SUM(success), TOTAL(duration_ms) "
+            "FROM calls GROUP BY tool_name ORDER BY MIN(rowid)"
+        ):
+            tool_stats[tool_name] = {
+                "count": count,
+                "success": success,
+                "total_duration_ms": total_ms,
+                "avg_duration_ms": total_ms / count,
+                "success_rate": success / count * 100,
+            }
+
+        total_calls, successful_calls, sessions = self._conn.execute(
+            "SELECT COUNT(*), TOTAL(success), COUNT(DISTINCT session_id) FROM calls"
+        ).fetchone()
+        avg_ms, min_ms, max_ms = self._conn.execute(
+            "SELECT AVG(duration_ms), MIN(duration_ms), MAX(duration_ms) FROM calls"
+        ).fetchone()
+        successful_calls = int(successful_calls)
+
+        return {
+            "total_calls": total_calls,
+            "successful_calls": successful_calls,
+            "failed_calls": total_calls - successful_calls,
+            "success_rate": (
+                successful_calls / total_calls * 100 if total_calls > 0 else 0
+            ),
+            "tool_stats": tool_stats,
+            "avg_duration_ms": avg_ms or 0,
+            "min_duration_ms": min_ms or 0,
+            "max_duration_ms": max_ms or 0,
+            "unique_tools": len(tool_stats),
+            "unique_sessions": sessions,
+        }
+
+    def clear(self):
+        """清除所有记录"""
+        self.flush()
+        self.entries.clear()
+        self._stats_cache = None
+        self._conn.execute("DELETE FROM calls")
+        self._conn.commit()
+
+    def close(self):
+        """写完待写入的记录，停止写线程并关闭数据库连接"""
+        super().close()
+        self._conn.close()
+
 
 # 全局记录器
 _global_recorder: Optional[ToolRecorder] = None
@@ -499,8 +1018,12 @@ def get_tool_recorder() -> ToolRecorder:
     global _global_recorder
     if _global_recorder is None:
         settings = get_settings()
-        storage_path = Path(settings.data_dir) / "tool_calls.json"
-        _global_recorder = ToolRecorder(storage_path=str(storage_path))
+        if settings.tool_recorder_backend == "sqlite":
+            storage_path = Path(settings.data_dir) / "tool_calls.db"
+            _global_recorder = SQLiteToolRecorder(storage_path=str(storage_path))
+        else:
+            storage_path = Path(settings.data_dir) / "tool_calls.jsonl"
+            _global_recorder = ToolRecorder(storage_path=str(storage_path))
     return _global_recorder
 
 
@@ -15,17 +15,41 @@ Agent 执行追踪器
 """
 
 import asyncio
-import json
+import atexit
+import logging
+import queue
 import time
+from collections import deque
+from contextvars import ContextVar, Token
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import (IO, Any, Awaitable, Callable, Deque, Dict, Iterator, List,
+                    Optional, Set, Tuple, Union)
 
 from src.core.logging import get_logger
+from src.core.serialization import dumps, dumps_bytes
 
 logger = get_logger("agent.tracer")
 
+# 单调时钟与墙上时间的对应点，时间戳只在输出时换算为本地时间
+_EPOCH_WALL = time.time()
+_EPOCH_MONO = time.monotonic_ns()
+
+
+def _mono_to_datetime(timestamp_ns: int) -> datetime:
+    """将 time.monotonic_ns() 时间戳换算为本地时间"""
+    return datetime.fromtimestamp(_EPOCH_WALL + (timestamp_ns - _EPOCH_MONO) / 1e9)
+
+
+def _mono_to_iso(timestamp_ns: Optional[int]) -> Optional[str]:
+    """将 time.monotonic_ns() 时间戳格式化为 ISO 字符串，为空时返回 None"""
+    if timestamp_ns is None:
+        return None
+    return _mono_to_datetime(timestamp_ns).isoformat()
+
 
 class TraceEventType(str, Enum):
     """追踪事件类型"""
@@ -66,29 +90,38 @@ class TraceEventType(str, Enum):
     REASONER_END = "reasoner_end"
 
 
-@dataclass
+@dataclass(slots=True)
 class TraceEvent:
     """追踪事件"""
 
     event_type: TraceEventType
-    timestamp: datetime = field(default_factory=datetime.now)
+    timestamp_ns: int = field(default_factory=time.monotonic_ns)
     duration_ms: Optional[float] = None
     data: Dict[str, Any] = field(default_factory=dict)
     parent_id: Optional[str] = None
     trace_id: Optional[str] = None
 
+    @property
+    def timestamp(self) -> datetime:
+        """事件时间（按需换算）"""
+        return _mono_to_datetime(self.timestamp_ns)
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             "event_type": self.event_type.value,
-            "timestamp": self.timestamp.isoformat(),
+            "timestamp": _mono_to_datetime(self.timestamp_ns).isoformat(),
             "duration_ms": self.duration_ms,
             "data": self.data,
             "parent_id": self.parent_id,
             "trace_id": self.trace_id,
         }
 
+    def to_json_bytes(self) -> bytes:
+        """序列化为 JSON 字节串"""
+        return dumps_bytes(self.to_dict())
+
 
-@dataclass
+@dataclass(slots=True)
 class ToolCallRecord:
     """工具调用记录"""
 
@@ -97,10 +130,20 @@ class ToolCallRecord:
     result: Optional[Dict[str, Any]] = None
     success: bool = True
     error: Optional[str] = None
-    start_time: datetime = field(default_factory=datetime.now)
-    end_time: Optional[datetime] = None
+    start_ns: int = field(default_factory=time.monotonic_ns)
+    end_ns: Optional[int] = None
     duration_ms: Optional[float] = None
 
+    @property
+    def start_time(self) -> datetime:
+        """开始时间（按需换算）"""
+        return _mono_to_datetime(self.start_ns)
+
+    @property
+    def end_time(self) -> Optional[datetime]:
+        """结束时间（按需换算），未结束时为 None"""
+        return _mono_to_datetime(self.end_ns) if self.end_ns is not None else None
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             "tool_name": self.tool_name,
@@ -108,12 +151,133 @@ class ToolCallRecord:
             "result": self.result,
             "success": self.success,
             "error": self.error,
-            "start_time": self.start_time.isoformat(),
-            "end_time": self.end_time.isoformat() if self.end_time else None,
+            "start_time": _mono_to_datetime(self.start_ns).isoformat(),
+            "end_time": _mono_to_iso(self.end_ns),
             "duration_ms": self.duration_ms,
         }
 
 
+# 控制台输出的事件图标
+_ICONS = {
+    TraceEventType.AGENT_START: "🚀",
+    TraceEventType.AGENT_END: "✅",
+    TraceEventType.AGENT_ERROR: "❌",
+    TraceEventType.PLANNER_START: "🎯",
+    TraceEventType.PLANNER_INTENT: "💡",
+    TraceEventType.PLANNER_PLAN: "📋",
+    TraceEventType.PLANNER_END: "✓",
+    TraceEventType.SKILL_SELECTED: "⚡",
+    TraceEventType.SKILL_EXECUTE_START: "▶️",
+    TraceEventType.SKILL_EXECUTE_END: "✓",
+    TraceEventType.MCP_CALL_START: "🔧",
+    TraceEventType.MCP_CALL_END: "✓",
+    TraceEventType.MCP_CALL_ERROR: "❌",
+    TraceEventType.RAG_QUERY_START: "📚",
+    TraceEventType.RAG_QUERY_END: "✓",
+    TraceEventType.LLM_CALL_START: "🤖",
+    TraceEventType.LLM_CALL_END: "✓",
+    TraceEventType.REASONER_START: "🧠",
+    TraceEventType.REASONER_END: "✓",
+}
+_DEFAULT_ICON = "•"
+
+# 各嵌套深度的缩进（超出部分按最大深度显示）
+_INDENTS = tuple("  " * depth for depth in range(32))
+
+# 时间线中各事件类型的摘要格式（未列出的类型显示事件类型名）
+_SUMMARY_FMT: Dict[TraceEventType, Callable[[Dict[str, Any]], str]] = {
+    TraceEventType.AGENT_START: lambda d: f"开始处理: {d.get('query', '')[:30]}...",
+    TraceEventType.PLANNER_INTENT: lambda d: f"识别意图: {d.get('intent')}",
+    TraceEventType.SKILL_SELECTED: lambda d: f"选择技能: {d.get('skill')}",
+    TraceEventType.MCP_CALL_START: lambda d: f"MCP 工具: {d.get('tool')}",
+    TraceEventType.RAG_QUERY_END: lambda d: f"RAG 检索: {d.get('count')} 条结果",
+    TraceEventType.AGENT_END: lambda d: (
+        f"完成 (共 {d.get('total_tool_calls', 0)} 次工具调用)"
+    ),
+}
+_SUMMARY_FMT[TraceEventType.MCP_CALL_END] = _SUMMARY_FMT[TraceEventType.MCP_CALL_START]
+
+# 控制台输出中显示的关键数据字段
+_KEY_DATA = ("query", "intent", "tool", "skill", "result", "error", "count")
+
+
+@lru_cache(maxsize=256)
+def _console_prefix(depth: int, event_type: TraceEventType) -> str:
+    """控制台消息前缀：缩进、图标与事件类型"""
+    indent = _INDENTS[min(depth, len(_INDENTS) - 1)]
+    return f"{indent}{_ICONS.get(event_type, _DEFAULT_ICON)} [{event_type.value}]"
+
+
+class _ConsoleMessage:
+    """延迟格式化的控制台消息，日志记录被实际输出时才拼接字符串"""
+
+    __slots__ = ("entries",)
+
+    def __init__(self, entries: List[Tuple[TraceEvent, int]]):
+        # (事件, 发送时的嵌套深度)
+        self.entries = entries
+
+    def __str__(self) -> str:
+        return "\n".join(self._format(event, depth) for event, depth in self.entries)
+
+    @staticmethod
+    def _format(event: TraceEvent, depth: int) -> str:
+        """格式化单个事件"""
+        msg = _console_prefix(depth, event.event_type)
+
+        if event.duration_ms is not None:
+            msg += f" ({event.duration_ms:.1f}ms)"
+
+        data = event.data
+        if data:
+            # 只显示关键数据
+            key_data = {k: data[k] for k in _KEY_DATA if k in data}
+            if key_data:
+                msg += f" {dumps(key_data)}"
+
+        return msg
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """原样入队日志记录，消息留到后台线程中的处理器再格式化"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_async_console_logger: Optional[logging.Logger] = None
+
+
+def _get_async_console_logger() -> logging.Logger:
+    """
+    获取经队列输出的控制台日志器（首次调用时创建）
+
+    日志记录只在调用线程中入队，由后台 QueueListener 线程交给 tracer 日志器
+    此时生效的处理器格式化并写出，使日志 I/O 不占用事件循环
+    """
+    global _async_console_logger
+    if _async_console_logger is None:
+        handlers = []
+        current = logger
+        while current is not None:
+            handlers.extend(current.handlers)
+            if not current.propagate:
+                break
+            current = current.parent
+
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+
+        console_logger = get_logger("agent.tracer.console")
+        console_logger.propagate = False
+        console_logger.setLevel(logger.getEffectiveLevel())
+        console_logger.addHandler(_DeferredQueueHandler(log_queue))
+        _async_console_logger = console_logger
+    return _async_console_logger
+
+
 class AgentTracer:
     """
     Agent 执行追踪器
@@ -137,96 +301,199 @@ class AgentTracer:
     ```
     """
 
-    def __init__(self, trace_id: str = None, enable_console: bool = True):
+    def __init__(
+        self,
+        trace_id: str = None,
+        enable_console: Union[bool, str] = True,
+        flush_threshold: int = 32,
+        max_events: int = 10_000,
+    ):
         """
         初始化追踪器
 
+        事件先进入待发送缓冲，达到 flush_threshold 条或调用 end()/flush() 时
+        再批量写入事件列表、通知监听器并输出控制台日志；
+        事件与工具调用记录各自最多保留 max_events 条，超出时丢弃最早的
+
         Args:
             trace_id: 追踪 ID
-            enable_console: 是否输出到控制台
+            enable_console: 是否输出到控制台，"async" 表示经后台线程输出
+            flush_threshold: 缓冲多少条事件后批量发送
+            max_events: 保留的最大事件数与工具调用记录数
         """
         import uuid
 
         self.trace_id = trace_id or f"trace_{uuid.uuid4().hex[:8]}"
         self.enable_console = enable_console
+        self._console_logger = (
+            _get_async_console_logger() if enable_console == "async" else logger
+        )
 
-        self.events: List[TraceEvent] = []
-        self.tool_calls: List[ToolCallRecord] = []
-        self.start_time: Optional[datetime] = None
-        self.end_time: Optional[datetime] = None
-
-        self._event_stack: List[TraceEvent] = []
+        self.max_events = max_events
+        self._events: Deque[TraceEvent] = deque(maxlen=max_events)
+        self.tool_calls: Deque[ToolCallRecord] = deque(maxlen=max_events)
+        # 因超出上限被丢弃的事件数与工具调用记录数
+        self.dropped_events = 0
+        self.dropped_tool_calls = 0
+        # time.monotonic_ns() 时间戳
+        self.start_ns: Optional[int] = None
+        self.end_ns: Optional[int] = None
+
+        self._event_stack: List["_TraceContext"] = []
+        # 普通监听器的异常会被记录并吞掉，可信监听器直接调用
         self._listeners: List[Callable[[TraceEvent], None]] = []
+        self._raw_listeners: List[Callable[[TraceEvent], None]] = []
+        # 异步监听器及其所在事件循环，以及尚未完成的通知任务
+        self._async_listeners: List[
+            Tuple[Callable[[TraceEvent], Awaitable[None]], asyncio.AbstractEventLoop]
+        ] = []
+        self._listener_tasks: Set[asyncio.Task] = set()
+        # 已退出的追踪上下文，供 trace() 复用
+        self._ctx_pool: List["_TraceContext"] = []
+
+        # 待发送的事件，以及需要输出到控制台的 (事件, 嵌套深度)
+        self._pending: List[TraceEvent] = []
+        self._pending_console: List[Tuple[TraceEvent, int]] = []
+        self._flush_threshold = flush_threshold
+        # create_tracer() 设置当前追踪器时的 token，end() 时恢复
+        self._context_token: Optional[Token] = None
+
+    @property
+    def events(self) -> Deque[TraceEvent]:
+        """已发送的事件列表（读取前先发送缓冲中的事件）"""
+        if self._pending:
+            self.flush()
+        return self._events
+
+    @property
+    def start_time(self) -> Optional[datetime]:
+        """追踪开始时间（按需换算）"""
+        return _mono_to_datetime(self.start_ns) if self.start_ns is not None else None
+
+    @property
+    def end_time(self) -> Optional[datetime]:
+        """追踪结束时间（按需换算）"""
+        return _mono_to_datetime(self.end_ns) if self.end_ns is not None else None
+
+    def add_listener(self, listener: Callable[[TraceEvent], None], safe: bool = True):
+        """
+        添加事件监听器
+
+        普通监听器各自做异常保护，某个监听器出错只记录日志，
+        不影响其余监听器；safe=False 的监听器不做保护，异常直接抛出
+
+        Args:
+            listener: 监听器，可提供 on_batch(events) 整批接收事件
+            safe: 是否捕获监听器抛出的异常
+        """
+        if safe:
+            self._listeners.append(listener)
+        else:
+            self._raw_listeners.append(listener)
 
-    def add_listener(self, listener: Callable[[TraceEvent], None]):
-        """添加事件监听器"""
-        self._listeners.append(listener)
+    def add_async_listener(
+        self,
+        listener: Callable[[TraceEvent], Awaitable[None]],
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ):
+        """
+        添加异步事件监听器
+
+        发送事件时若已在监听器所在的事件循环中，直接创建任务；
+        否则通过 run_coroutine_threadsafe 提交到该循环
+
+        Args:
+            listener: 接收单个事件的协程函数
+            loop: 监听器运行的事件循环，为空则使用当前运行中的循环
+        """
+        self._async_listeners.append((listener, loop or asyncio.get_running_loop()))
 
     def _emit_event(self, event: TraceEvent):
-        """发送事件"""
-        self.events.append(event)
+        """将事件加入待发送缓冲，缓冲满时批量发送"""
+        self._pending.append(event)
+
+        # 嵌套深度在事件产生时记录（日志级别不输出 INFO 时跳过）
+        if self.enable_console and logger.isEnabledFor(logging.INFO):
+            self._pending_console.append((event, len(self._event_stack)))
+
+        if len(self._pending) >= self._flush_threshold:
+            self.flush()
 
-        # 控制台输出
-        if self.enable_console:
-            self._log_to_console(event)
+    def flush(self):
+        """
+        批量发送缓冲中的事件
+
+        监听器提供 on_batch(events) 时整批通知，否则逐条调用；
+        控制台日志合并为一条记录，在日志处理器格式化时才生成
+        """
+        batch = self._pending
+        if not batch:
+            return
+        self._pending = []
+        overflow = len(self._events) + len(batch) - self.max_events
+        if overflow > 0:
+            self.dropped_events += overflow
+        self._events.extend(batch)
+
+        if self._pending_console:
+            self._console_logger.info("%s", _ConsoleMessage(self._pending_console))
+            self._pending_console = []
 
         # 通知监听器
+        for listener in self._raw_listeners:
+            self._notify(listener, batch)
+        if self._async_listeners:
+            self._notify_async(batch)
         for listener in self._listeners:
             try:
-                listener(event)
+                self._notify(listener, batch)
             except Exception as e:
                 logger.error(f"Listener error: {e}")
 
-    def _log_to_console(self, event: TraceEvent):
-        """输出到控制台"""
-        indent = "  " * len(self._event_stack)
-
-        # 事件图标
-        icons = {
-            TraceEventType.AGENT_START: "🚀",
-            TraceEventType.AGENT_END: "✅",
-            TraceEventType.AGENT_ERROR: "❌",
-            TraceEventType.PLANNER_START: "🎯",
-            TraceEventType.PLANNER_INTENT: "💡",
-            TraceEventType.PLANNER_PLAN: "📋",
-            TraceEventType.PLANNER_END: "✓",
-            TraceEventType.SKILL_SELECTED: "⚡",
-            TraceEventType.SKILL_EXECUTE_START: "▶️",
-            TraceEventType.SKILL_EXECUTE_END: "✓",
-            TraceEventType.MCP_CALL_START: "🔧",
-            TraceEventType.MCP_CALL_END: "✓",
-            TraceEventType.MCP_CALL_ERROR: "❌",
-            TraceEventType.RAG_QUERY_START: "📚",
-            TraceEventType.RAG_QUERY_END: "✓",
-            TraceEventType.LLM_CALL_START: "🤖",
-            TraceEventType.LLM_CALL_END: "✓",
-            TraceEventType.REASONER_START: "🧠",
-            TraceEventType.REASONER_END: "✓",
-        }
-
-        icon = icons.get(event.event_type, "•")
-
-        # 格式化消息
-        msg = f"{indent}{icon} [{event.event_type.value}]"
-
-        if event.duration_ms is not None:
-            msg += f" ({event.duration_ms:.1f}ms)"
+    @staticmethod
+    def _notify(listener: Callable[[TraceEvent], None], batch: List[TraceEvent]):
+        """通知单个监听器：优先整批调用 on_batch"""
+        on_batch = getattr(listener, "on_batch", None)
+        if on_batch is not None:
+            on_batch(batch)
+        else:
+            for event in batch:
+                listener(event)
 
-        if event.data:
-            # 只显示关键数据
-            key_data = {
-                k: v
-                for k, v in event.data.items()
-                if k in ["query", "intent", "tool", "skill", "result", "error", "count"]
-            }
-            if key_data:
-                msg += f" {json.dumps(key_data, ensure_ascii=False)}"
+    def _notify_async(self, batch: List[TraceEvent]):
+        """为每个异步监听器调度一次整批通知"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        for listener, loop in self._async_listeners:
+            coro = self._deliver(listener, batch)
+            if loop is running:
+                task = loop.create_task(coro)
+                self._listener_tasks.add(task)
+                task.add_done_callback(self._listener_tasks.discard)
+            else:
+                asyncio.run_coroutine_threadsafe(coro, loop)
+
+    @staticmethod
+    async def _deliver(
+        listener: Callable[[TraceEvent], Awaitable[None]], batch: List[TraceEvent]
+    ):
+        """依次将批次中的事件交给异步监听器"""
+        try:
+            for event in batch:
+                await listener(event)
+        except Exception as e:
+            logger.error(f"Async listener error: {e}")
 
-        logger.info(msg)
+    async def flush_async(self):
+        """供异步调用方在请求结束时发送缓冲中的事件"""
+        self.flush()
 
     def start(self, query: str = None, **kwargs):
         """开始追踪"""
-        self.start_time = datetime.now()
+        self.start_ns = time.monotonic_ns()
         data = {"query": query, **kwargs} if query else kwargs
 
         event = TraceEvent(
@@ -237,8 +504,8 @@ class AgentTracer:
 
     def end(self, success: bool = True, result: Any = None, error: str = None):
         """结束追踪"""
-        self.end_time = datetime.now()
-        duration = (self.end_time - self.start_time).total_seconds() * 1000
+        self.end_ns = time.monotonic_ns()
+        duration = (self.end_ns - self.start_ns) / 1e6
 
         event = TraceEvent(
             event_type=(
@@ -249,22 +516,54 @@ class AgentTracer:
                 "success": success,
                 "result_length": len(str(result)) if result else 0,
                 "error": error,
-                "total_events": len(self.events),
+                "total_events": (
+                    len(self._events) + len(self._pending) + self.dropped_events
+                ),
                 "total_tool_calls": len(self.tool_calls),
             },
             trace_id=self.trace_id,
         )
         self._emit_event(event)
+        self.flush()
+
+        # 结束后才发布，导出报告时不会与仍在记录的追踪并发读写
+        global _latest_tracer
+        _latest_tracer = self
+
+        if self._context_token is not None:
+            try:
+                _current_tracer.reset(self._context_token)
+            except ValueError:
+                # 在其他上下文中结束时无法恢复，交由原上下文自行结束
+                pass
+            self._context_token = None
 
-    def trace(self, event_type: TraceEventType, data: Dict[str, Any] = None):
+    def trace(
+        self,
+        event_type: TraceEventType,
+        data: Dict[str, Any] = None,
+        mode: str = "span",
+    ):
         """
         上下文管理器追踪
 
+        退出时发送一个带耗时的事件（有对应结束类型时使用结束类型）；
+        mode="both" 时进入时额外发送开始事件，便于界面实时展示进度
+
         Usage:
             with tracer.trace(TraceEventType.PLANNER_START):
                 # 规划逻辑
+
+        Args:
+            event_type: 开始事件类型
+            data: 事件数据
+            mode: "span" 只发送结束事件，"both" 同时发送开始事件
         """
-        return _TraceContext(self, event_type, data or {})
+        ctx = self._ctx_pool.pop() if self._ctx_pool else _TraceContext(self)
+        ctx.event_type = event_type
+        ctx.data = data or {}
+        ctx.emit_start = mode == "both"
+        return ctx
 
     def log_event(
         self,
@@ -273,7 +572,7 @@ class AgentTracer:
         duration_ms: float = None,
     ):
         """记录单个事件"""
-        parent_id = self._event_stack[-1].trace_id if self._event_stack else None
+        parent_id = self.trace_id if self._event_stack else None
 
         event = TraceEvent(
             event_type=event_type,
@@ -319,8 +618,10 @@ class AgentTracer:
             success=success,
             error=error,
             duration_ms=duration_ms,
-            end_time=datetime.now(),
+            end_ns=time.monotonic_ns(),
         )
+        if len(self.tool_calls) == self.max_events:
+            self.dropped_tool_calls += 1
         self.tool_calls.append(record)
 
         self.log_event(
@@ -344,23 +645,69 @@ class AgentTracer:
             duration_ms,
         )
 
-    def get_report(self) -> Dict[str, Any]:
-        """获取追踪报告"""
+    def _report_header(self) -> Dict[str, Any]:
+        """追踪报告的汇总字段"""
         total_duration = None
-        if self.start_time and self.end_time:
-            total_duration = (self.end_time - self.start_time).total_seconds() * 1000
+        if self.start_ns is not None and self.end_ns is not None:
+            total_duration = (self.end_ns - self.start_ns) / 1e6
 
         return {
             "trace_id": self.trace_id,
-            "start_time": self.start_time.isoformat() if self.start_time else None,
-            "end_time": self.end_time.isoformat() if self.end_time else None,
+            "start_time": _mono_to_iso(self.start_ns),
+            "end_time": _mono_to_iso(self.end_ns),
             "total_duration_ms": total_duration,
             "event_count": len(self.events),
             "tool_call_count": len(self.tool_calls),
-            "events": [e.to_dict() for e in self.events],
-            "tool_calls": [t.to_dict() for t in self.tool_calls],
+            "dropped_events": self.dropped_events,
+            "dropped_tool_calls": self.dropped_tool_calls,
         }
 
+    def get_report(self) -> Dict[str, Any]:
+        """获取追踪报告"""
+        report = self._report_header()
+        report["events"] = [e.to_dict() for e in self.events]
+        report["tool_calls"] = [t.to_dict() for t in self.tool_calls]
+        return report
+
+    def iter_report_lines(self) -> Iterator[str]:
+        """
+        逐行生成 NDJSON 格式的追踪报告
+
+        第一行为汇总字段，之后每行一个事件或工具调用（以 kind 区分），
+        不在内存中构建完整报告
+
+        Returns:
+            以换行结尾的 JSON 行迭代器
+        """
+        # 先取快照，逐行生成期间追踪器继续记录也不影响遍历
+        events = list(self.events)
+        tool_calls = list(self.tool_calls)
+        yield self._json_line({"kind": "report", **self._report_header()})
+        # 直接在 to_dict() 的结果上补充 kind，不再复制一份字典
+        for event in events:
+            data = event.to_dict()
+            data["kind"] = "event"
+            yield self._json_line(data)
+        for record in tool_calls:
+            data = record.to_dict()
+            data["kind"] = "tool_call"
+            yield self._json_line(data)
+
+    def stream_report(self, fp: IO[str]) -> None:
+        """
+        将 NDJSON 格式的追踪报告逐行写入文件对象
+
+        Args:
+            fp: 文本模式的文件对象
+        """
+        for line in self.iter_report_lines():
+            fp.write(line)
+
+    @staticmethod
+    def _json_line(data: Dict[str, Any]) -> str:
+        """序列化为一行 JSON（无法序列化的值转为字符串）"""
+        return dumps(data) + "\n"
+
     def get_timeline(self) -> List[Dict[str, Any]]:
         """获取时间线视图"""
         timeline = []
@@ -377,71 +724,71 @@ class AgentTracer:
 
     def _get_event_summary(self, event: TraceEvent) -> str:
         """获取事件摘要"""
-        data = event.data
+        fmt = _SUMMARY_FMT.get(event.event_type)
+        return fmt(event.data) if fmt else event.event_type.value
+
 
-        if event.event_type == TraceEventType.AGENT_START:
-            return f"开始处理: {data.get('query', '')[:30]}..."
-        elif event.event_type == TraceEventType.PLANNER_INTENT:
-            return f"识别意图: {data.get('intent')}"
-        elif event.event_type == TraceEventType.SKILL_SELECTED:
-            return f"选择技能: {data.get('skill')}"
-        elif event.event_type in (
-            TraceEventType.MCP_CALL_START,
-            TraceEventType.MCP_CALL_END,
-        ):
-            return f"MCP 工具: {data.get('tool')}"
-        elif event.event_type == TraceEventType.RAG_QUERY_END:
-            return f"RAG 检索: {data.get('count')} 条结果"
-        elif event.event_type == TraceEventType.AGENT_END:
-            return f"完成 (共 {data.get('total_tool_calls', 0)} 次工具调用)"
-
-        return event.event_type.value
+# 追踪上下文的开始事件类型 -> 结束事件类型
+_END_EVENT_TYPES = {
+    TraceEventType.PLANNER_START: TraceEventType.PLANNER_END,
+    TraceEventType.SKILL_EXECUTE_START: TraceEventType.SKILL_EXECUTE_END,
+    TraceEventType.MCP_CALL_START: TraceEventType.MCP_CALL_END,
+    TraceEventType.RAG_QUERY_START: TraceEventType.RAG_QUERY_END,
+    TraceEventType.LLM_CALL_START: TraceEventType.LLM_CALL_END,
+    TraceEventType.REASONER_START: TraceEventType.REASONER_END,
+}
 
 
 class _TraceContext:
-    """追踪上下文管理器"""
+    """追踪上下文管理器（由 AgentTracer 复用，退出后归还）"""
 
-    def __init__(
-        self, tracer: AgentTracer, event_type: TraceEventType, data: Dict[str, Any]
-    ):
+    __slots__ = ("tracer", "event_type", "data", "emit_start", "start_ns", "parent_id")
+
+    def __init__(self, tracer: AgentTracer):
         self.tracer = tracer
-        self.event_type = event_type
-        self.data = data
-        self.start_time = None
-        self.event = None
+        self.event_type: Optional[TraceEventType] = None
+        self.data: Optional[Dict[str, Any]] = None
+        self.emit_start = False
+        self.start_ns = 0
+        self.parent_id: Optional[str] = None
 
     def __enter__(self):
-        self.start_time = time.time()
-        self.event = TraceEvent(
-            event_type=self.event_type,
-            data=self.data,
-            parent_id=(
-                self.tracer._event_stack[-1].trace_id
-                if self.tracer._event_stack
-                else None
-            ),
-            trace_id=self.tracer.trace_id,
-        )
-        self.tracer._event_stack.append(self.event)
-        self.tracer._emit_event(self.event)
+        tracer = self.tracer
+        self.parent_id = tracer.trace_id if tracer._event_stack else None
+        if self.emit_start:
+            tracer._emit_event(
+                TraceEvent(
+                    event_type=self.event_type,
+                    data=self.data,
+                    parent_id=self.parent_id,
+                    trace_id=tracer.trace_id,
+                )
+            )
+        tracer._event_stack.append(self)
+        self.start_ns = time.monotonic_ns()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        duration_ms = (time.time() - self.start_time) * 1000
-        self.tracer._event_stack.pop()
-
-        # 记录结束事件
-        end_type = self._get_end_event_type()
-        if end_type:
-            end_event = TraceEvent(
-                event_type=end_type,
+        duration_ms = (time.monotonic_ns() - self.start_ns) / 1e6
+        tracer = self.tracer
+        tracer._event_stack.pop()
+
+        data = self.data
+        if exc_val:
+            data = {**data, "error": str(exc_val)}
+        tracer._emit_event(
+            TraceEvent(
+                event_type=_END_EVENT_TYPES.get(self.event_type, self.event_type),
                 duration_ms=duration_ms,
-                data={"error": str(exc_val)} if exc_val else {},
-                parent_id=self.event.parent_id,
-                trace_id=self.tracer.trace_id,
+                data=data,
+                parent_id=self.parent_id,
+                trace_id=tracer.trace_id,
             )
-            self.tracer._emit_event(end_event)
+        )
 
+        self.event_type = None
+        self.data = None
+        tracer._ctx_pool.append(self)
         return False
 
     async def __aenter__(self):
@@ -450,36 +797,50 @@ class _TraceContext:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         return self.__exit__(exc_type, exc_val, exc_tb)
 
-    def _get_end_event_type(self) -> Optional[TraceEventType]:
-        """获取对应的结束事件类型"""
-        mapping = {
-            TraceEventType.PLANNER_START: TraceEventType.PLANNER_END,
-            TraceEventType.SKILL_EXECUTE_START: TraceEventType.SKILL_EXECUTE_END,
-            TraceEventType.MCP_CALL_START: TraceEventType.MCP_CALL_END,
-            TraceEventType.RAG_QUERY_START: TraceEventType.RAG_QUERY_END,
-            TraceEventType.LLM_CALL_START: TraceEventType.LLM_CALL_END,
-            TraceEventType.REASONER_START: TraceEventType.REASONER_END,
-        }
-        return mapping.get(self.event_type)
-
 
-# 全局追踪器
-_current_tracer: Optional[AgentTracer] = None
+# 当前上下文的追踪器（并发请求/任务之间互不覆盖）
+_current_tracer: ContextVar[Optional[AgentTracer]] = ContextVar(
+    "current_tracer", default=None
+)
+# 最近结束的追踪器，供导出最近一次追踪报告
+_latest_tracer: Optional[AgentTracer] = None
 
 
 def get_tracer() -> Optional[AgentTracer]:
-    """获取当前追踪器"""
-    return _current_tracer
+    """获取当前上下文的追踪器"""
+    return _current_tracer.get()
+
 
+def get_latest_tracer() -> Optional[AgentTracer]:
+    """获取最近结束的追踪器（不限上下文）"""
+    return _latest_tracer
 
-def set_tracer(tracer: AgentTracer):
-    """设置当前追踪器"""
-    global _current_tracer
-    _current_tracer = tracer
 
+def set_tracer(tracer: AgentTracer) -> Token:
+    """
+    设置当前上下文的追踪器
+
+    Args:
+        tracer: 追踪器
 
-def create_tracer(trace_id: str = None, enable_console: bool = True) -> AgentTracer:
-    """创建并设置新追踪器"""
-    tracer = AgentTracer(trace_id=trace_id, enable_console=enable_console)
-    set_tracer(tracer)
+    Returns:
+        用于 _current_tracer.reset() 恢复的 token
+    """
+    return _current_tracer.set(tracer)
+
+
+def create_tracer(
+    trace_id: str = None,
+    enable_console: Union[bool, str] = True,
+    flush_threshold: int = 32,
+    max_events: int = 10_000,
+) -> AgentTracer:
+    """创建并设置新追踪器，追踪器 end() 时恢复之前的当前追踪器"""
+    tracer = AgentTracer(
+        trace_id=trace_id,
+        enable_console=enable_console,
+        flush_threshold=flush_threshold,
+        max_events=max_events,
+    )
+    tracer._context_token = set_tracer(tracer)
     return tracer
@@ -17,6 +17,13 @@ from src.api import create_app
 app = create_app()
 # uvicorn src.api:app --reload
 ```
+
+生产环境启动（uvicorn[standard] 自带 uvloop 与 httptools，main.py 会自动选用）:
+```bash
+python main.py
+# 或直接指定
+uvicorn src.api:app --loop uvloop --http httptools
+```
 """
 
 from .app import create_app, get_app
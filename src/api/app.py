@@ -9,12 +9,15 @@ from typing import AsyncGenerator
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.openapi.utils import get_openapi
 
 from src.api.chat_service import get_chat_service
 from src.api.routes import api_router
 from src.core.config import get_settings
+from src.core.http import close_http_client, get_http_client
 from src.core.logging import get_logger
+from src.core.ollama import get_ollama_client
 
 logger = get_logger("api.app")
 
@@ -30,7 +33,10 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     # ========== Startup ==========
     logger.info("🚀 Starting SkillMCP-Agent API...")
 
-    settings = get_settings()
+    settings = app.state.settings
+
+    # 共享 HTTP 连接池，外部 API 调用复用连接
+    app.state.http_client = get_http_client()
 
     # 初始化 MCP Client Manager（连接外部 MCP Server）
     try:
@@ -53,10 +59,9 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     except Exception as e:
         logger.error(f"❌ ChatService initialization failed: {e}")
 
-    logger.info(f"🌐 API ready at http://{settings.api_host}:{settings.api_port}")
-    logger.info(
-        f"📚 Docs available at http://{settings.api_host}:{settings.api_port}/docs"
-    )
+    base_url = f"http://{settings.api_host}:{settings.api_port}"
+    logger.info(f"🌐 API ready at {base_url}")
+    logger.info(f"📚 Docs available at {base_url}/docs")
 
     yield
 
@@ -74,6 +79,16 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     session_manager = get_session_manager()
     await session_manager.clear_all()
 
+    # 写完待写入的工具调用记录
+    from src.agent.tool_recorder import get_tool_recorder
+
+    get_tool_recorder().close()
+    logger.info("✅ Tool recorder closed")
+
+    # 释放 HTTP 连接池
+    await get_ollama_client().close()
+    await close_http_client()
+
     logger.info("👋 Goodbye!")
 
 
@@ -128,6 +143,8 @@ print(response.json())
         openapi_url="/openapi.json",
         lifespan=lifespan,
     )
+    # 生命周期内复用同一份配置
+    app.state.settings = settings
 
     # 配置 CORS
     app.add_middleware(
@@ -138,6 +155,10 @@ print(response.json())
         allow_headers=["*"],
     )
 
+    # 压缩较大的 JSON 响应（规划/执行结果）
+    if settings.enable_gzip:
+        app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_minimum_size)
+
     # 注册路由
     app.include_router(api_router, prefix="/api/v1")
 
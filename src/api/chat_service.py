@@ -5,11 +5,15 @@ Chat 服务
 对外屏蔽内部实现细节
 """
 
+import asyncio
+import re
 import time
 from contextlib import nullcontext
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
+from src.agent.tool_cache import ToolRunCache
 from src.agent.tool_recorder import get_tool_recorder, record_tool_call
 from src.agent.tracer import (AgentTracer, TraceEventType, create_tracer,
                               set_tracer)
@@ -23,6 +27,127 @@ from .session import Session, get_session_manager
 
 logger = get_logger("api.chat_service")
 
+# 火车票查询中的相对日期表达式（交给 system_time parse_relative 解析）
+_REL_DATE_RE = re.compile(r"大后天|后天|明天|下周[一二三四五六日天]")
+
+# 火车票路线提取：时间词、"从A到B"/"A到B" 模式、起止城市中的多余字符
+_TIME_CLEAN_RE = re.compile(
+    r"(今天|明天|后天|大后天|下周[一二三四五六日天]?|这周[一二三四五六日天]?|周[一二三四五六日天])"
+)
+_ROUTE_PATTERNS = (
+    re.compile(r"从([^\s到去往从]{2,6}?)(?:到|去|往)([^\s的高动火车票]{2,6})"),
+    re.compile(r"([^\s从]{2,4}?)(?:到|去|往)([^\s的高动火车票]{2,4})"),
+)
+_CLEAN_ORIGIN_RE = re.compile(r"[从去往到的查一下]")
+_CLEAN_DEST_RE = re.compile(r"[从去往到的]")
+
+# 天气查询支持识别的城市
+_WEATHER_CITIES = (
+    "北京",
+    "上海",
+    "广州",
+    "深圳",
+    "杭州",
+    "成都",
+    "武汉",
+    "西安",
+    "南京",
+    "重庆",
+    "天津",
+    "苏州",
+    "青岛",
+    "厦门",
+    "大连",
+    "哈尔滨",
+    "长沙",
+    "郑州",
+)
+
+# 火车票查询中作为备选识别的城市
+_ROUTE_CITIES = (
+    "北京",
+    "上海",
+    "广州",
+    "深圳",
+    "杭州",
+    "成都",
+    "武汉",
+    "西安",
+    "南京",
+    "重庆",
+    "天津",
+    "苏州",
+    "石家庄",
+    "郑州",
+    "长沙",
+    "济南",
+    "青岛",
+    "大连",
+    "沈阳",
+    "哈尔滨",
+    "长春",
+    "合肥",
+    "福州",
+    "厦门",
+    "南昌",
+    "昆明",
+    "贵阳",
+    "南宁",
+    "海口",
+    "兰州",
+    "西宁",
+    "银川",
+    "乌鲁木齐",
+    "呼和浩特",
+    "拉萨",
+    "太原",
+    "保定",
+    "唐山",
+    "秦皇岛",
+    "邯郸",
+    "廊坊",
+    "无锡",
+    "常州",
+    "徐州",
+    "扬州",
+    "泰州",
+    "镇江",
+    "宁波",
+    "温州",
+    "嘉兴",
+    "绍兴",
+    "金华",
+    "台州",
+)
+
+
+def _compile_city_pattern(cities) -> "re.Pattern[str]":
+    """将城市列表编译为单个正则（长名优先），一次扫描找出全部城市"""
+    return re.compile("|".join(map(re.escape, sorted(cities, key=len, reverse=True))))
+
+
+_WEATHER_CITY_RE = _compile_city_pattern(_WEATHER_CITIES)
+_ROUTE_CITY_RE = _compile_city_pattern(_ROUTE_CITIES)
+
+# 意图关键词：(意图, 关键词)，编译为带命名分组的单个正则，一次扫描识别全部意图
+_INTENT_KEYWORDS = (
+    ("weather", ("天气", "气温", "下雨", "晴天", "温度", "穿什么")),
+    ("train", ("火车", "高铁", "动车", "车票", "12306", "火车票")),
+    ("knowledge", ("什么是", "如何", "怎么", "为什么", "介绍", "解释")),
+)
+_INTENT_RE = re.compile(
+    "|".join(
+        f"(?P<{intent}>{'|'.join(map(re.escape, keywords))})"
+        for intent, keywords in _INTENT_KEYWORDS
+    )
+)
+
+# 可并发处理的工具类意图：(意图, 技能名, 选择原因, 数据来源)
+_TOOL_INTENTS = (
+    ("weather", "weather_skill", "检测到天气查询关键词", "weather_api"),
+    ("train", "train_skill", "检测到火车票查询关键词", "12306_api"),
+)
+
 
 class ChatService:
     """
@@ -43,12 +168,67 @@ class ChatService:
         self._mcp = None
         self._rag = None
         self._initialized = False
+        # 并发的首批请求只触发一次初始化
+        self._init_lock = asyncio.Lock()
+        # 天气 / 车票查询结果的短期缓存
+        self._weather_cache = self._make_result_cache(self.settings.weather_cache_ttl)
+        self._train_cache = self._make_result_cache(self.settings.train_cache_ttl)
+
+    @staticmethod
+    def _make_result_cache(ttl_seconds: float) -> Optional[ToolRunCache]:
+        """创建查询结果缓存，ttl 不大于 0 时不缓存"""
+        if ttl_seconds <= 0:
+            return None
+        return ToolRunCache(maxsize=256, ttl_seconds=ttl_seconds)
+
+    async def _call_tool_cached(
+        self,
+        cache: Optional[ToolRunCache],
+        tool_name: str,
+        arguments: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        调用 MCP 工具，相同参数的成功结果在缓存有效期内直接复用
+
+        Args:
+            cache: 结果缓存，为空则直接调用
+            tool_name: 工具名称
+            arguments: 工具参数
+
+        Returns:
+            工具调用结果
+        """
+        if cache is None:
+            return await self._mcp.client.call_tool(tool_name, arguments)
+
+        key = ToolRunCache.make_key(tool_name, arguments)
+        result = cache.get(key)
+        if result is not None:
+            logger.debug(f"Result cache hit: {tool_name}")
+            return result
+
+        result = await self._mcp.client.call_tool(tool_name, arguments)
+        # 失败结果不缓存，下次仍重新查询
+        if result.get("success"):
+            cache.set(key, result)
+        return result
 
     async def initialize(self) -> None:
-        """初始化服务"""
+        """
+        初始化服务
+
+        应用启动时在 lifespan 中调用，请求到来前完成 MCP 与 RAG 的加载；
+        未经应用启动直接使用时由首个请求触发
+        """
         if self._initialized:
             return
 
+        async with self._init_lock:
+            if not self._initialized:
+                await self._initialize_components()
+
+    async def _initialize_components(self) -> None:
+        """加载 MCP 与 RAG 组件"""
         logger.info("Initializing ChatService...")
 
         # 初始化 MCP 系统
@@ -91,10 +271,12 @@ class ChatService:
         Returns:
             聊天响应
         """
-        await self.initialize()
+        if not self._initialized:
+            await self.initialize()
 
-        # 创建追踪器
-        tracer = create_tracer(enable_console=True)
+        # 创建追踪器：事件照常记录（供调试信息与 /trace/latest 使用），
+        # 仅调试请求输出到控制台
+        tracer = create_tracer(enable_console=debug)
         tracer.start(query=request.message[:100])
 
         # 获取或创建会话
@@ -155,6 +337,69 @@ class ChatService:
                 ),
             )
 
+    async def chat_stream(self, request: ChatRequest) -> AsyncGenerator[Dict, None]:
+        """
+        流式处理聊天请求
+
+        通用对话直接转发 LLM 生成的片段，首个片段无需等待完整回复；
+        工具类查询完成后一次性输出回复
+
+        Args:
+            request: 聊天请求
+
+        Yields:
+            事件字典：token（回复片段）、done（结构化数据与来源）或 error
+        """
+        if not self._initialized:
+            await self.initialize()
+
+        tracer = create_tracer(enable_console=False)
+        tracer.start(query=request.message[:100])
+
+        session_manager = get_session_manager()
+        session = await session_manager.get_or_create(request.session_id)
+        session.add_message("user", request.message)
+
+        try:
+            structured_data = None
+            sources = None
+            index = 0
+
+            if self._analyze_intent(request.message) == "general":
+                tracer.log_intent("general")
+                tracer.log_skill_selected("general_skill", "通用对话")
+                history = session.get_history_for_llm(limit=10)
+
+                # 边生成边输出，同时累积完整回复用于会话记录
+                parts = []
+                async for chunk in self._handle_general_stream(
+                    request.message, history
+                ):
+                    parts.append(chunk)
+                    yield {"event": "token", "data": chunk, "index": index}
+                    index += 1
+                reply = "".join(parts)
+            else:
+                reply, structured_data, sources, _ = await self._process_message(
+                    message=request.message, session=session, tracer=tracer
+                )
+                yield {"event": "token", "data": reply, "index": index}
+
+            session.add_message("assistant", reply)
+            tracer.end(success=True, result=reply)
+
+            yield {
+                "event": "done",
+                "session_id": session.session_id,
+                "structured_data": [sd.model_dump() for sd in (structured_data or [])],
+                "sources": sources,
+            }
+
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            tracer.end(success=False, error=str(e))
+            yield {"event": "error", "message": str(e)}
+
     async def _process_message(
         self,
         message: str,
@@ -182,36 +427,17 @@ class ChatService:
 
         # 分析意图并路由
         with tracer.trace(TraceEventType.PLANNER_START) if tracer else nullcontext():
-            intent = self._analyze_intent(message)
+            intents = self._analyze_intents(message)
             if tracer:
-                tracer.log_intent(intent)
+                tracer.log_intent("+".join(intents))
 
         if debug:
-            debug_info["intent"] = intent
+            debug_info["intent"] = intents[0]
+            debug_info["intents"] = list(intents)
             debug_info["history_length"] = len(history)
 
         # 根据意图处理
-        if intent == "weather":
-            if tracer:
-                tracer.log_skill_selected("weather_skill", "检测到天气查询关键词")
-            reply, data = await self._handle_weather(
-                message, tracer, tool_recorder, session.session_id
-            )
-            if data:
-                structured_data.append(data)
-                sources.append("weather_api")
-
-        elif intent == "train":
-            if tracer:
-                tracer.log_skill_selected("train_skill", "检测到火车票查询关键词")
-            reply, data = await self._handle_train(
-                message, tracer, tool_recorder, session.session_id
-            )
-            if data:
-                structured_data.append(data)
-                sources.append("12306_api")
-
-        elif intent == "knowledge":
+        if intents[0] == "knowledge":
             if tracer:
                 tracer.log_skill_selected("knowledge_skill", "检测到知识查询关键词")
             reply, data, rag_sources = await self._handle_knowledge(
@@ -221,12 +447,43 @@ class ChatService:
                 structured_data.append(data)
             sources.extend(rag_sources)
 
-        else:
+        elif intents[0] == "general":
             if tracer:
                 tracer.log_skill_selected("general_skill", "通用对话")
             # 通用对话
             reply = await self._handle_general(message, history)
 
+        else:
+            # 天气、火车票等工具查询并发执行，总耗时取决于最慢的一个
+            handlers = {
+                "weather": self._handle_weather,
+                "train": self._handle_train,
+            }
+            selected = [item for item in _TOOL_INTENTS if item[0] in intents]
+            for _, skill_name, reason, _ in selected:
+                if tracer:
+                    tracer.log_skill_selected(skill_name, reason)
+
+            results = await asyncio.gather(
+                *(
+                    handlers[intent](message, tracer, tool_recorder, session.session_id)
+                    for intent, _, _, _ in selected
+                ),
+                return_exceptions=True,
+            )
+
+            replies = []
+            for (intent, _, _, source), result in zip(selected, results):
+                if isinstance(result, Exception):
+                    logger.error(f"{intent} handler error: {result}")
+                    continue
+                intent_reply, data = result
+                replies.append(intent_reply)
+                if data:
+                    structured_data.append(data)
+                    sources.append(source)
+            reply = "\n\n".join(replies) or "查询时出现问题，请稍后再试。"
+
         if debug:
             debug_info["structured_data_count"] = len(structured_data)
             debug_info["sources"] = sources
@@ -240,28 +497,36 @@ class ChatService:
 
     def _analyze_intent(self, message: str) -> str:
         """
-        分析用户意图
+        分析用户的主要意图
 
         简单的关键词匹配，实际项目中可以用 LLM 分类
         """
-        message_lower = message.lower()
+        return self._analyze_intents(message)[0]
 
-        # 天气相关
-        weather_keywords = ["天气", "气温", "下雨", "晴天", "温度", "穿什么"]
-        if any(kw in message_lower for kw in weather_keywords):
-            return "weather"
+    # 意图识别与城市/路线提取只依赖消息文本且结果不可变，按消息做进程内有界缓存
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _analyze_intents(message: str) -> Tuple[str, ...]:
+        """
+        分析用户意图（一条消息可同时包含多个工具查询意图）
+
+        天气、火车票可同时命中；均未命中时再判断知识查询，否则为通用对话
 
-        # 火车票相关
-        train_keywords = ["火车", "高铁", "动车", "车票", "12306", "火车票"]
-        if any(kw in message_lower for kw in train_keywords):
-            return "train"
+        Returns:
+            按优先级排序的意图元组，至少包含一个意图
+        """
+        found = {m.lastgroup for m in _INTENT_RE.finditer(message.lower())}
+
+        # 天气、火车票可同时命中
+        intents = tuple(intent for intent, _, _, _ in _TOOL_INTENTS if intent in found)
+        if intents:
+            return intents
 
         # 知识查询
-        knowledge_keywords = ["什么是", "如何", "怎么", "为什么", "介绍", "解释"]
-        if any(kw in message_lower for kw in knowledge_keywords):
-            return "knowledge"
+        if "knowledge" in found:
+            return ("knowledge",)
 
-        return "general"
+        return ("general",)
 
     async def _handle_weather(
         self,
@@ -277,19 +542,19 @@ class ChatService:
         try:
             if self._mcp:
                 # 记录工具调用开始
-                start_time = time.time()
+                start_ns = time.perf_counter_ns()
                 if tracer:
                     tracer.log_event(
                         TraceEventType.MCP_CALL_START,
                         {"tool": "weather_query", "city": city},
                     )
 
-                result = await self._mcp.client.call_tool(
-                    "weather_query", {"city": city, "type": "live"}
+                result = await self._call_tool_cached(
+                    self._weather_cache, "weather_query", {"city": city, "type": "live"}
                 )
 
                 # 记录工具调用结束
-                duration_ms = (time.time() - start_time) * 1000
+                duration_ms = (time.perf_counter_ns() - start_ns) / 1e6
                 if tracer:
                     tracer.log_tool_call(
                         tool_name="weather_query",
@@ -389,55 +654,51 @@ class ChatService:
 
         try:
             if self._mcp:
-                # 获取日期
-                start_time = time.time()
+                # 获取当前日期，消息含相对日期时同时解析，两次调用并发进行
+                rel_match = _REL_DATE_RE.search(message)
+                time_args = [{"action": "get_current"}]
+                if rel_match:
+                    time_args.append(
+                        {"action": "parse_relative", "relative_expr": rel_match[0]}
+                    )
+
+                start_ns = time.perf_counter_ns()
                 if tracer:
                     tracer.log_event(
                         TraceEventType.MCP_CALL_START, {"tool": "system_time"}
                     )
 
-                date_result = await self._mcp.client.call_tool(
-                    "system_time", {"action": "get_current"}
+                time_results = await asyncio.gather(
+                    *(
+                        self._mcp.client.call_tool("system_time", args)
+                        for args in time_args
+                    )
                 )
 
-                duration_ms = (time.time() - start_time) * 1000
+                duration_ms = (time.perf_counter_ns() - start_ns) / 1e6
                 if tracer:
-                    tracer.log_tool_call(
-                        "system_time",
-                        {"action": "get_current"},
-                        date_result,
-                        True,
-                        duration_ms=duration_ms,
-                    )
-
-                today = date_result["data"]["date"]
-
-                # 解析相对日期
-                if "明天" in message:
-                    start_time = time.time()
-                    date_result = await self._mcp.client.call_tool(
-                        "system_time",
-                        {"action": "parse_relative", "relative_expr": "明天"},
-                    )
-                    duration_ms = (time.time() - start_time) * 1000
-                    if tracer:
+                    for args, time_result in zip(time_args, time_results):
                         tracer.log_tool_call(
                             "system_time",
-                            {"action": "parse_relative"},
-                            date_result,
+                            args,
+                            time_result,
                             True,
                             duration_ms=duration_ms,
                         )
-                    today = date_result["data"]["parsed_date"]
+
+                today = time_results[0]["data"]["date"]
+                if rel_match and time_results[1].get("success", True):
+                    today = time_results[1]["data"].get("parsed_date", today)
 
                 # 查询车票
-                start_time = time.time()
+                query_start_ns = time.perf_counter_ns()
                 if tracer:
                     tracer.log_event(
                         TraceEventType.MCP_CALL_START, {"tool": "12306_query"}
                     )
 
-                result = await self._mcp.client.call_tool(
+                result = await self._call_tool_cached(
+                    self._train_cache,
                     "12306_query",
                     {
                         "action": "query_tickets",
@@ -447,7 +708,7 @@ class ChatService:
                     },
                 )
 
-                duration_ms = (time.time() - start_time) * 1000
+                duration_ms = (time.perf_counter_ns() - query_start_ns) / 1e6
                 if tracer:
                     tracer.log_tool_call(
                         tool_name="12306_query",
@@ -565,7 +826,7 @@ class ChatService:
         try:
             if self._rag and self._rag._initialized:
                 # RAG 检索
-                start_time = time.time()
+                start_ns = time.perf_counter_ns()
                 if tracer:
                     tracer.log_event(
                         TraceEventType.RAG_QUERY_START, {"query": message[:50]}
@@ -573,7 +834,7 @@ class ChatService:
 
                 results = await self._rag.retrieve(message, top_k=3)
 
-                duration_ms = (time.time() - start_time) * 1000
+                duration_ms = (time.perf_counter_ns() - start_ns) / 1e6
                 if tracer:
                     tracer.log_rag_query(message, len(results), duration_ms)
 
@@ -602,7 +863,7 @@ class ChatService:
 
             # 如果 RAG 不可用，尝试使用 MCP 工具
             if self._mcp:
-                start_time = time.time()
+                start_ns = time.perf_counter_ns()
                 if tracer:
                     tracer.log_event(
                         TraceEventType.MCP_CALL_START, {"tool": "rag_retriever"}
@@ -612,7 +873,7 @@ class ChatService:
                     "rag_retriever", {"query": message, "top_k": 3}
                 )
 
-                duration_ms = (time.time() - start_time) * 1000
+                duration_ms = (time.perf_counter_ns() - start_ns) / 1e6
                 if tracer:
                     tracer.log_tool_call(
                         tool_name="rag_retriever",
@@ -656,23 +917,7 @@ class ChatService:
         try:
             # 获取 Ollama 客户端
             client = get_ollama_client()
-
-            # 构建消息历史
-            messages = []
-
-            # 添加系统提示（可选）
-            system_prompt = (
-                "你是一个智能助手，可以帮助用户查询天气、火车票信息，"
-                "或者回答各种问题。请用友好、专业的语气回复用户。"
-            )
-            messages.append({"role": "system", "content": system_prompt})
-
-            # 添加历史对话
-            for msg in history[-10:]:  # 最多保留最近 10 轮对话
-                messages.append({"role": msg["role"], "content": msg["content"]})
-
-            # 添加当前用户消息
-            messages.append({"role": "user", "content": message})
+            messages = self._build_general_messages(message, history)
 
             # 调用 Ollama 模型
             logger.info(f"Calling Ollama model: {self.settings.ollama_model}")
@@ -704,62 +949,74 @@ class ChatService:
                 "你可以尝试运行：ollama pull qwen3:latest"
             )
 
-    def _extract_city(self, message: str) -> Optional[str]:
-        """从消息中提取城市名"""
-        cities = [
-            "北京",
-            "上海",
-            "广州",
-            "深圳",
-            "杭州",
-            "成都",
-            "武汉",
-            "西安",
-            "南京",
-            "重庆",
-            "天津",
-            "苏州",
-            "青岛",
-            "厦门",
-            "大连",
-            "哈尔滨",
-            "长沙",
-            "郑州",
-        ]
-        for city in cities:
-            if city in message:
-                return city
-        return None
+    async def _handle_general_stream(
+        self, message: str, history: List[Dict[str, str]]
+    ) -> AsyncGenerator[str, None]:
+        """
+        流式处理通用对话
 
-    def _extract_route(self, message: str) -> Tuple[Optional[str], Optional[str]]:
+        Yields:
+            Ollama 生成的回复片段
+        """
+        client = get_ollama_client()
+        messages = self._build_general_messages(message, history)
+
+        logger.info(f"Streaming Ollama model: {self.settings.ollama_model}")
+        async for chunk in client.chat_stream(
+            messages=messages, temperature=0.7, max_tokens=2048
+        ):
+            yield chunk
+
+    @staticmethod
+    def _build_general_messages(
+        message: str, history: List[Dict[str, str]]
+    ) -> List[Dict[str, str]]:
+        """构建通用对话发送给 LLM 的消息列表"""
+        # 构建消息历史
+        messages = []
+
+        # 添加系统提示（可选）
+        system_prompt = (
+            "你是一个智能助手，可以帮助用户查询天气、火车票信息，"
+            "或者回答各种问题。请用友好、专业的语气回复用户。"
+        )
+        messages.append({"role": "system", "content": system_prompt})
+
+        # 添加历史对话
+        for msg in history[-10:]:  # 最多保留最近 10 轮对话
+            messages.append({"role": msg["role"], "content": msg["content"]})
+
+        # 添加当前用户消息
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _extract_city(message: str) -> Optional[str]:
+        """从消息中提取城市名（多个城市时按已知城市列表的顺序取第一个）"""
+        found = set(_WEATHER_CITY_RE.findall(message))
+        return next((city for city in _WEATHER_CITIES if city in found), None)
+
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _extract_route(message: str) -> Tuple[Optional[str], Optional[str]]:
         """
         从消息中提取出发地和目的地
 
         使用多种模式匹配，支持任意城市名
         """
-        import re
-
         # 先移除时间相关的词
-        clean_message = re.sub(
-            r"(今天|明天|后天|大后天|下周[一二三四五六日天]?|这周[一二三四五六日天]?|周[一二三四五六日天])",
-            "",
-            message,
-        )
+        clean_message = _TIME_CLEAN_RE.sub("", message)
 
         # 模式1: "从A到B" 或 "A到B" 或 "A去B"
-        patterns = [
-            r"从([^\s到去往从]{2,6}?)(?:到|去|往)([^\s的高动火车票]{2,6})",
-            r"([^\s从]{2,4}?)(?:到|去|往)([^\s的高动火车票]{2,4})",
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, clean_message)
+        for pattern in _ROUTE_PATTERNS:
+            match = pattern.search(clean_message)
             if match:
                 origin = match.group(1).strip()
                 destination = match.group(2).strip()
                 # 清理多余字符
-                origin = re.sub(r"[从去往到的查一下]", "", origin)
-                destination = re.sub(r"[从去往到的]", "", destination)
+                origin = _CLEAN_ORIGIN_RE.sub("", origin)
+                destination = _CLEAN_DEST_RE.sub("", destination)
                 if (
                     origin
                     and destination
@@ -768,106 +1025,54 @@ class ChatService:
                 ):
                     return origin, destination
 
-        # 模式2: 已知城市列表匹配（作为备选）
-        cities = [
-            "北京",
-            "上海",
-            "广州",
-            "深圳",
-            "杭州",
-            "成都",
-            "武汉",
-            "西安",
-            "南京",
-            "重庆",
-            "天津",
-            "苏州",
-            "石家庄",
-            "郑州",
-            "长沙",
-            "济南",
-            "青岛",
-            "大连",
-            "沈阳",
-            "哈尔滨",
-            "长春",
-            "合肥",
-            "福州",
-            "厦门",
-            "南昌",
-            "昆明",
-            "贵阳",
-            "南宁",
-            "海口",
-            "兰州",
-            "西宁",
-            "银川",
-            "乌鲁木齐",
-            "呼和浩特",
-            "拉萨",
-            "太原",
-            "保定",
-            "唐山",
-            "秦皇岛",
-            "邯郸",
-            "廊坊",
-            "无锡",
-            "常州",
-            "徐州",
-            "扬州",
-            "泰州",
-            "镇江",
-            "宁波",
-            "温州",
-            "嘉兴",
-            "绍兴",
-            "金华",
-            "台州",
-        ]
-
+        # 模式2: 已知城市列表匹配（作为备选），一次扫描按出现位置取前两个城市
         found = []
-        for city in cities:
-            if city in message:
-                pos = message.find(city)
-                found.append((city, pos))
-
-        # 按出现位置排序
-        found.sort(key=lambda x: x[1])
+        for match in _ROUTE_CITY_RE.finditer(message):
+            if match[0] not in found:
+                found.append(match[0])
+                if len(found) == 2:
+                    break
 
         if len(found) >= 2:
-            return found[0][0], found[1][0]
+            return found[0], found[1]
         elif len(found) == 1:
-            return found[0][0], None
+            return found[0], None
         return None, None
 
     def _generate_knowledge_reply(self, query: str, results) -> str:
         """根据检索结果生成知识回复"""
-        if not results:
-            return f"抱歉，没有找到关于「{query}」的相关信息。"
-
-        # 简单拼接检索结果
-        parts = [f"关于「{query}」，我找到了以下信息：\n"]
-
-        for i, result in enumerate(results[:3], 1):
-            content = result.chunk.content[:200]
-            title = result.chunk.metadata.get("title", "")
-            parts.append(f"**{i}. {title}**\n{content}...\n")
-
-        return "\n".join(parts)
+        return self._format_knowledge_reply(
+            query,
+            ((r.chunk.metadata.get("title", ""), r.chunk.content) for r in results[:3]),
+        )
 
     def _generate_knowledge_reply_from_docs(self, query: str, docs: List[Dict]) -> str:
         """根据文档列表生成知识回复"""
-        if not docs:
-            return f"抱歉，没有找到关于「{query}」的相关信息。"
+        return self._format_knowledge_reply(
+            query, ((doc.get("title", ""), doc.get("content", "")) for doc in docs[:3])
+        )
+
+    @staticmethod
+    def _format_knowledge_reply(query: str, items) -> str:
+        """
+        拼接知识回复
 
-        parts = [f"关于「{query}」，我找到了以下信息：\n"]
+        Args:
+            query: 用户查询
+            items: (标题, 内容) 迭代器，内容截取前 200 字
 
-        for i, doc in enumerate(docs[:3], 1):
-            content = doc.get("content", "")[:200]
-            title = doc.get("title", "")
-            parts.append(f"**{i}. {title}**\n{content}...\n")
+        Returns:
+            回复文本，一次 join 生成
+        """
+        sections = [
+            f"**{i}. {title}**\n{content[:200]}...\n"
+            for i, (title, content) in enumerate(items, 1)
+        ]
+        if not sections:
+            return f"抱歉，没有找到关于「{query}」的相关信息。"
 
-        return "\n".join(parts)
+        # 简单拼接检索结果
+        return f"关于「{query}」，我找到了以下信息：\n\n" + "\n".join(sections)
 
 
 # 全局服务实例
@@ -8,6 +8,7 @@ from fastapi import APIRouter
 
 from .chat import router as chat_router
 from .health import router as health_router
+from .trace import router as trace_router
 
 # 创建主路由
 api_router = APIRouter()
@@ -17,4 +18,6 @@ api_router.include_router(health_router, prefix="/health", tags=["健康检查"]
 
 api_router.include_router(chat_router, prefix="/chat", tags=["对话"])
 
+api_router.include_router(trace_router, prefix="/trace", tags=["追踪"])
+
 __all__ = ["api_router"]
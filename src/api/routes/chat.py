@@ -13,8 +13,7 @@ from fastapi.responses import StreamingResponse
 from src.api.chat_service import ChatService
 from src.api.deps import (get_chat_service_dep, get_debug_mode,
                           get_session_manager_dep)
-from src.api.schemas import (ChatRequest, ChatResponse, ResponseStatus,
-                             SessionInfo)
+from src.api.schemas import ChatRequest, ChatResponse, SessionInfo
 from src.api.session import SessionManager
 from src.core.logging import get_logger
 
@@ -90,29 +89,9 @@ async def chat_stream(
     """
 
     async def generate():
-        try:
-            # 获取完整响应
-            response = await chat_service.chat(request)
-
-            # 模拟流式输出（按字符）
-            for i, char in enumerate(response.reply):
-                chunk = {"event": "token", "data": char, "index": i}
-                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
-
-            # 发送完成事件
-            final = {
-                "event": "done",
-                "session_id": response.session_id,
-                "structured_data": [
-                    sd.model_dump() for sd in (response.structured_data or [])
-                ],
-                "sources": response.sources,
-            }
-            yield f"data: {json.dumps(final, ensure_ascii=False)}\n\n"
-
-        except Exception as e:
-            error = {"event": "error", "message": str(e)}
-            yield f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+        # 通用对话的回复片段随 LLM 生成实时推送
+        async for event in chat_service.chat_stream(request):
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
 
     return StreamingResponse(
         generate(),
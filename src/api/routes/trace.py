@@ -0,0 +1,43 @@
+"""
+追踪报告路由
+
+以 NDJSON 流的形式导出最近一次请求的追踪报告。
+报告包含其他客户端的请求内容，仅在服务端开启调试模式时提供，
+并在配置了 API Key 时要求验证
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from src.agent.tracer import get_latest_tracer
+from src.api.deps import verify_api_key
+from src.core.config import get_settings
+
+router = APIRouter()
+
+
+@router.get(
+    "/latest",
+    summary="最近一次追踪报告",
+    description="以 NDJSON 流返回最近一次请求的追踪报告（仅调试模式）",
+    dependencies=[Depends(verify_api_key)],
+)
+async def latest_trace() -> StreamingResponse:
+    """
+    最近一次追踪报告
+
+    第一行为汇总信息，之后每行一个事件或工具调用，逐行生成而不构建完整报告
+    """
+    # 按服务端配置判断，客户端的 debug 参数不能打开此接口
+    if not get_settings().debug:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    tracer = get_latest_tracer()
+    if tracer is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No trace available"
+        )
+
+    return StreamingResponse(
+        tracer.iter_report_lines(), media_type="application/x-ndjson"
+    )
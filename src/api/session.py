@@ -33,10 +33,11 @@ class Session:
     metadata: Dict[str, Any] = field(default_factory=dict)
 
     def add_message(self, role: str, content: str) -> ChatMessage:
-        """添加消息"""
-        message = ChatMessage(role=role, content=content)
+        """添加消息（进程内存储，直接追加，消息时间与活跃时间共用一次取时）"""
+        now = datetime.now()
+        message = ChatMessage(role=role, content=content, timestamp=now)
         self.messages.append(message)
-        self.last_active = datetime.now()
+        self.last_active = now
         return message
 
     def get_history(self, limit: int = 20) -> List[ChatMessage]:
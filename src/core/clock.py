@@ -0,0 +1,37 @@
+"""
+请求级时钟
+
+在一次逻辑操作内共享同一个 datetime.now()，避免热点循环中重复取时间
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Iterator, Optional
+
+_request_now: ContextVar[Optional[datetime]] = ContextVar("request_now", default=None)
+
+
+def now() -> datetime:
+    """获取当前时间：处于 request_clock() 作用域内时返回固定时间"""
+    current = _request_now.get()
+    return current if current is not None else datetime.now()
+
+
+@contextmanager
+def request_clock(at: Optional[datetime] = None) -> Iterator[datetime]:
+    """
+    在作用域内固定 now() 的返回值
+
+    Args:
+        at: 固定的时间，为空则使用进入作用域时的当前时间
+
+    Yields:
+        固定的时间
+    """
+    fixed = at or datetime.now()
+    token = _request_now.set(fixed)
+    try:
+        yield fixed
+    finally:
+        _request_now.reset(token)
@@ -3,7 +3,7 @@
 使用 Pydantic Settings 进行配置验证
 """
 
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -21,7 +21,12 @@ class Settings(BaseSettings):
     api_host: str = Field(default="127.0.0.1", description="API 服务地址")
     api_port: int = Field(default=8000, description="API 服务端口")
     api_key: Optional[str] = Field(default=None, description="API 访问密钥（可选）")
+    api_workers: int = Field(
+        default=1, description="API 工作进程数（reload 模式下无效）"
+    )
     cors_origins: list = Field(default=["*"], description="CORS 允许的来源")
+    enable_gzip: bool = Field(default=True, description="是否启用 GZip 响应压缩")
+    gzip_minimum_size: int = Field(default=1024, description="启用压缩的最小响应字节数")
 
     # LLM 配置 - Ollama
     llm_provider: str = Field(default="ollama", description="LLM 提供者: ollama/openai")
@@ -55,7 +60,17 @@ class Settings(BaseSettings):
     rag_top_k: int = Field(default=5, description="检索返回数量")
     rag_score_threshold: float = Field(default=0.3, description="检索分数阈值")
     rag_embedder_type: str = Field(
-        default="ollama", description="Embedder 类型: ollama/openai/local/mock"
+        default="ollama", description="Embedder 类型: ollama/openai/local/int8/mock"
+    )
+    local_embedding_model: str = Field(
+        default="sentence-transformers/all-MiniLM-L6-v2",
+        description="本地 Embedding 模型（local/int8 类型使用）",
+    )
+    rag_semantic_cache_size: int = Field(
+        default=128, description="语义检索缓存条目数（0 表示不缓存）"
+    )
+    rag_semantic_cache_threshold: float = Field(
+        default=0.95, description="语义检索缓存命中的最小余弦相似度"
     )
     rag_index_path: str = Field(
         default="data/rag_index", description="RAG 索引存储路径"
@@ -70,10 +85,59 @@ class Settings(BaseSettings):
     # 外部 API 配置
     amap_api_key: str = Field(default="", description="高德地图 API Key")
     use_real_api: bool = Field(default=True, description="是否使用真实 API（否则报错）")
+    weather_cache_ttl: float = Field(
+        default=60.0, description="天气查询结果缓存时间（秒），0 表示不缓存"
+    )
+    train_cache_ttl: float = Field(
+        default=300.0, description="车票查询结果缓存时间（秒），0 表示不缓存"
+    )
 
     # Agent 配置
     max_iterations: int = Field(default=10, description="Agent 最大迭代次数")
     max_history_length: int = Field(default=20, description="最大历史消息数")
+    max_parallel_steps: int = Field(default=4, description="规划步骤最大并发执行数")
+    tool_concurrency: Dict[str, int] = Field(
+        default={}, description="各工具的最大并发调用数（JSON 对象）"
+    )
+    default_tool_concurrency: int = Field(
+        default=4, description="未单独配置的工具最大并发调用数"
+    )
+    max_concurrent_tools: int = Field(default=8, description="全部工具的最大并发调用数")
+    tool_timeout: Optional[float] = Field(
+        default=30.0, description="单次工具调用超时（秒）"
+    )
+    tool_cache_ttl: float = Field(
+        default=30.0, description="规划内工具调用结果缓存时间（秒），0 表示不缓存"
+    )
+    tool_recorder_backend: str = Field(
+        default="jsonl", description="工具调用记录存储: jsonl/sqlite"
+    )
+    enable_batching: bool = Field(
+        default=False, description="是否对并发 LLM 请求做微批处理"
+    )
+    batch_window_ms: float = Field(
+        default=10.0, description="LLM 微批处理收集窗口（毫秒）"
+    )
+    max_batch_size: int = Field(default=32, description="LLM 微批处理单批最大请求数")
+    context_window_messages: int = Field(
+        default=5, description="规划上下文中逐字保留的最近消息数"
+    )
+    summary_trigger_chars: int = Field(
+        default=2000, description="窗口外对话达到该字符数时更新滚动摘要"
+    )
+    skip_plan_when_no_skills: bool = Field(
+        default=True, description="无专门技能或寒暄类查询时跳过 LLM 规划"
+    )
+    llm_cache_enabled: bool = Field(
+        default=True, description="是否缓存规划/推理的 LLM 响应"
+    )
+    llm_cache_size: int = Field(default=256, description="LLM 响应缓存最大条目数")
+    llm_cache_ttl: Optional[float] = Field(
+        default=300.0, description="LLM 响应缓存过期时间（秒），为空则不过期"
+    )
+    llm_cache_similarity: float = Field(
+        default=0.95, description="LLM 响应语义缓存命中阈值（需提供 Embedder）"
+    )
 
     # 兼容旧字段
     @property
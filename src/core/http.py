@@ -0,0 +1,43 @@
+"""
+共享 HTTP 客户端
+
+外部 API 调用复用同一个 httpx.AsyncClient 连接池，
+避免每次请求重新建立 TCP/TLS 连接；应用关闭时统一释放
+"""
+
+from typing import Optional
+
+import httpx
+
+from .logging import get_logger
+
+try:
+    import h2  # noqa: F401
+
+    _HTTP2 = True
+except ImportError:  # h2 为可选依赖，未安装时使用 HTTP/1.1
+    _HTTP2 = False
+
+logger = get_logger("core.http")
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享的 HTTP 客户端（首次调用时创建）"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            http2=_HTTP2,
+        )
+        logger.debug(f"Shared HTTP client created (http2={_HTTP2})")
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """关闭共享的 HTTP 客户端"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
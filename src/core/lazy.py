@@ -0,0 +1,38 @@
+"""
+包导出项按需加载（PEP 562）
+
+包的 __init__ 只声明导出项所在的子模块，首次访问时才导入，
+避免导入包时拉起全部子模块
+"""
+
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def lazy_exports(
+    package: str, namespace: Dict[str, Any], exports: Dict[str, str]
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    生成包级别的 __getattr__ 与 __dir__
+
+    Args:
+        package: 包名（传入 __name__）
+        namespace: 包的全局命名空间（传入 globals()），导入结果缓存于此
+        exports: 导出名 -> 相对子模块名，例如 {"Task": ".schemas.task"}
+
+    Returns:
+        (__getattr__, __dir__)
+    """
+
+    def __getattr__(name: str) -> Any:
+        module_name = exports.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(import_module(module_name, package), name)
+        namespace[name] = value
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(namespace) | set(exports))
+
+    return __getattr__, __dir__
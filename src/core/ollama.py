@@ -11,6 +11,7 @@ import httpx
 
 from src.core.config import get_settings
 from src.core.logging import get_logger
+from src.core.serialization import dumps_bytes
 
 logger = get_logger("core.ollama")
 
@@ -92,7 +93,11 @@ class OllamaClient:
             payload["tools"] = tools
 
         try:
-            response = await client.post("/api/chat", json=payload)
+            response = await client.post(
+                "/api/chat",
+                content=dumps_bytes(payload),
+                headers={"Content-Type": "application/json"},
+            )
             response.raise_for_status()
             data = response.json()
 
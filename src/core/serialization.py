@@ -0,0 +1,73 @@
+"""
+JSON 序列化工具
+
+安装了 orjson 时使用 orjson，否则回退到标准库 json
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+
+def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+    """
+    序列化为 UTF-8 JSON 字节串
+
+    Args:
+        obj: 待序列化对象
+        indent: 是否缩进（2 空格）
+
+    Returns:
+        JSON 字节串
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=str, option=option)
+        except TypeError:
+            # orjson 不支持的类型（如超大整数）交给标准库处理
+            pass
+    return json.dumps(
+        obj, ensure_ascii=False, default=str, indent=2 if indent else None
+    ).encode("utf-8")
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    反序列化 JSON
+
+    Args:
+        data: JSON 字符串或字节串
+
+    Returns:
+        反序列化后的对象
+
+    Raises:
+        ValueError: JSON 格式错误（json.JSONDecodeError 与 orjson.JSONDecodeError
+            均为其子类）
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """
+    序列化为 JSON 字符串（保留非 ASCII 字符）
+
+    Args:
+        obj: 待序列化对象
+        indent: 是否缩进（2 空格）
+
+    Returns:
+        JSON 字符串
+    """
+    return dumps_bytes(obj, indent=indent).decode("utf-8")
@@ -1,5 +1,19 @@
 # LLM module
+# OpenAIClient 依赖可选的 openai 包，按需加载（PEP 562）：未安装时在访问处抛出原始 ImportError
+from typing import TYPE_CHECKING
+
+from src.core.lazy import lazy_exports
+
 from .base import BaseLLM
-from .openai_client import OpenAIClient
+from .batched import BatchedLLM
+
+if TYPE_CHECKING:
+    from .openai_client import OpenAIClient
+
+_LAZY_EXPORTS = {
+    "OpenAIClient": ".openai_client",
+}
+
+__all__ = ["BaseLLM", "BatchedLLM", "OpenAIClient"]
 
-__all__ = ["BaseLLM", "OpenAIClient"]
+__getattr__, __dir__ = lazy_exports(__name__, globals(), _LAZY_EXPORTS)
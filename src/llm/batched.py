@@ -0,0 +1,171 @@
+"""
+微批处理 LLM 包装器
+
+在一个很短的时间窗口内收集并发的 chat 请求：
+- 完全相同的请求（消息、温度等参数一致）合并为一次调用，结果共享
+- 不同的请求在同一批次内并发下发，单批最多 max_batch_size 个
+- 窗口内只有一个请求时直接调用，不做额外处理
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from src.core.logging import get_logger
+
+from .base import BaseLLM
+
+logger = get_logger("llm.batched")
+
+
+class BatchedLLM(BaseLLM):
+    """
+    微批处理 LLM
+
+    包装任意 BaseLLM 实现，仅对 chat 做批处理，
+    chat_with_tools / stream_chat 直接透传
+    """
+
+    def __init__(
+        self, llm: BaseLLM, batch_window_ms: float = 10.0, max_batch_size: int = 32
+    ):
+        """
+        初始化批处理包装器
+
+        Args:
+            llm: 被包装的 LLM 实例
+            batch_window_ms: 收集请求的时间窗口（毫秒）
+            max_batch_size: 单批最大请求数
+        """
+        super().__init__(model=getattr(llm, "model", None))
+        self.llm = llm
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        # 待处理请求：(合并键, 请求参数, future)
+        self._pending: List[Tuple[str, Dict[str, Any], asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # 已下发、仍在执行的批次（持有引用，避免任务被回收）
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _make_key(request: Dict[str, Any]) -> str:
+        """生成合并键：请求参数的规范化 JSON"""
+        return json.dumps(request, sort_keys=True, default=str, ensure_ascii=False)
+
+    async def chat(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: float = 0.7,
+        max_tokens: int = None,
+        **kwargs,
+    ) -> str:
+        """
+        发送聊天请求（进入当前批次等待下发）
+
+        Args:
+            messages: 消息列表
+            temperature: 温度参数
+            max_tokens: 最大 token 数
+            **kwargs: 其他参数
+
+        Returns:
+            模型响应文本
+        """
+        request = {
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            **kwargs,
+        }
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((self._make_key(request), request, future))
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+        return await future
+
+    async def _flush_loop(self) -> None:
+        """
+        等待窗口结束后分批下发，直到队列清空
+
+        批次在独立任务中执行，收集循环不等待其完成，
+        上一批的 LLM 调用进行中到达的请求照常在下一个窗口下发
+        """
+        while self._pending:
+            await asyncio.sleep(self.batch_window)
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatch_tasks.add(task)
+            task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(
+        self, batch: List[Tuple[str, Dict[str, Any], asyncio.Future]]
+    ) -> None:
+        """下发一个批次：相同请求合并，不同请求并发"""
+        groups: Dict[str, Tuple[Dict[str, Any], List[asyncio.Future]]] = {}
+        for key, request, future in batch:
+            if key in groups:
+                groups[key][1].append(future)
+            else:
+                groups[key] = (request, [future])
+
+        self.batches += 1
+        self.coalesced += len(batch) - len(groups)
+        if len(batch) > 1:
+            logger.debug(
+                f"Dispatching LLM batch: {len(batch)} requests, {len(groups)} calls"
+            )
+
+        results = await asyncio.gather(
+            *(self.llm.chat(**request) for request, _ in groups.values()),
+            return_exceptions=True,
+        )
+
+        for (_, futures), result in zip(groups.values(), results):
+            for future in futures:
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def chat_with_tools(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        temperature: float = 0.7,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """带工具调用的聊天（不做批处理）"""
+        return await self.llm.chat_with_tools(
+            messages=messages, tools=tools, temperature=temperature, **kwargs
+        )
+
+    async def stream_chat(
+        self, messages: List[Dict[str, Any]], temperature: float = 0.7, **kwargs
+    ) -> AsyncIterator[str]:
+        """流式聊天（不做批处理）"""
+        async for chunk in self.llm.stream_chat(
+            messages=messages, temperature=temperature, **kwargs
+        ):
+            yield chunk
+
+    def count_tokens(self, text: str) -> int:
+        """计算 token 数量"""
+        return self.llm.count_tokens(text)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计"""
+        return {
+            "batches": self.batches,
+            "coalesced": self.coalesced,
+            "pending": len(self._pending),
+            "in_flight": len(self._dispatch_tasks),
+        }
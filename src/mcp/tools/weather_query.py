@@ -9,6 +9,7 @@ from typing import Any, Dict, List, Optional
 import httpx
 
 from src.core.config import get_settings
+from src.core.http import get_http_client
 from src.core.logging import get_logger
 
 from ..protocol.types import ParameterType, Tool, ToolParameter
@@ -147,42 +148,43 @@ class WeatherQueryTool(BaseTool):
 
             logger.info(f"Calling AMAP Weather API for {city} ({city_code})")
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    self.AMAP_WEATHER_URL,
-                    params={
-                        "key": self.api_key,
-                        "city": city_code,
-                        "extensions": extensions,
-                        "output": "JSON",
-                    },
-                )
-
-                if response.status_code != 200:
-                    return {
-                        "success": False,
-                        "error": f"高德 API 请求失败，HTTP {response.status_code}",
-                    }
-
-                data = response.json()
-                logger.info(
-                    f"AMAP API response status: {data.get('status')}, info: {data.get('info')}"
-                )
-
-                # 检查 API 返回状态
-                if data.get("status") != "1":
-                    error_info = data.get("info", "未知错误")
-                    infocode = data.get("infocode", "")
-                    return {
-                        "success": False,
-                        "error": f"高德 API 返回错误: {error_info} (code: {infocode})",
-                    }
-
-                # 解析天气数据
-                if query_type == "live":
-                    return self._parse_live_weather(data, city)
-                else:
-                    return self._parse_forecast_weather(data, city)
+            # 复用共享连接池，避免每次查询重新建立 TLS 连接
+            response = await get_http_client().get(
+                self.AMAP_WEATHER_URL,
+                params={
+                    "key": self.api_key,
+                    "city": city_code,
+                    "extensions": extensions,
+                    "output": "JSON",
+                },
+                timeout=10.0,
+            )
+
+            if response.status_code != 200:
+                return {
+                    "success": False,
+                    "error": f"高德 API 请求失败，HTTP {response.status_code}",
+                }
+
+            data = response.json()
+            logger.info(
+                f"AMAP API response status: {data.get('status')}, info: {data.get('info')}"
+            )
+
+            # 检查 API 返回状态
+            if data.get("status") != "1":
+                error_info = data.get("info", "未知错误")
+                infocode = data.get("infocode", "")
+                return {
+                    "success": False,
+                    "error": f"高德 API 返回错误: {error_info} (code: {infocode})",
+                }
+
+            # 解析天气数据
+            if query_type == "live":
+                return self._parse_live_weather(data, city)
+            else:
+                return self._parse_forecast_weather(data, city)
 
         except httpx.TimeoutException:
             return {"success": False, "error": "高德 API 请求超时，请稍后重试"}
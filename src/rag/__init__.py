@@ -9,6 +9,7 @@ RAG (Retrieval-Augmented Generation) 子系统
 - embedder: 向量化 (Embedding)
 - store: 向量存储 (FAISS)
 - retriever: 检索器
+- cache: 语义检索缓存
 - pipeline: RAG 管道
 
 使用示例:
@@ -21,6 +22,7 @@ results = await rag.retrieve("什么是 AI Agent?", top_k=5)
 ```
 """
 
+from .cache import SemanticCache
 from .chunker import ChunkStrategy, TextChunker
 from .document import Document, DocumentChunk, RetrievalResult
 from .embedder import Embedder, get_embedder
@@ -41,6 +43,7 @@ __all__ = [
     "VectorStore",
     "FAISSStore",
     "Retriever",
+    "SemanticCache",
     "RAGPipeline",
     "get_rag_pipeline",
 ]
@@ -0,0 +1,94 @@
+"""
+语义检索缓存
+
+按查询向量的余弦相似度复用近期检索结果，
+重复或近似重复的查询无需再次检索向量索引
+"""
+
+from collections import deque
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from src.core.logging import get_logger
+
+from .document import RetrievalResult
+
+logger = get_logger("rag.cache")
+
+
+class SemanticCache:
+    """
+    语义检索缓存
+
+    - 先进先出保留最近 maxsize 条 (查询向量, top_k, 检索结果)
+    - 新查询与缓存向量的最大余弦相似度超过阈值时直接返回缓存结果
+    - 索引内容变化时需调用 clear() 使缓存失效
+    """
+
+    def __init__(self, maxsize: int = 128, threshold: float = 0.95):
+        """
+        初始化语义缓存
+
+        Args:
+            maxsize: 最大缓存条目数
+            threshold: 命中所需的最小余弦相似度
+        """
+        self.threshold = threshold
+        self._entries: deque = deque(maxlen=maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        """转换为单位向量"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self, embedding: Sequence[float], top_k: int
+    ) -> Optional[List[RetrievalResult]]:
+        """
+        查找语义相近查询的检索结果
+
+        Args:
+            embedding: 查询向量
+            top_k: 需要的结果数量
+
+        Returns:
+            命中时返回检索结果（最多 top_k 条），未命中返回 None
+        """
+        # 只在缓存时取数量不少于本次需求的条目中查找
+        candidates = [entry for entry in self._entries if entry[1] >= top_k]
+        if candidates:
+            query = self._normalize(embedding)
+            sims = np.stack([entry[0] for entry in candidates]) @ query
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                self.hits += 1
+                logger.debug(f"Semantic cache hit (similarity={sims[best]:.3f})")
+                return candidates[best][2][:top_k]
+
+        self.misses += 1
+        return None
+
+    def add(
+        self, embedding: Sequence[float], top_k: int, results: List[RetrievalResult]
+    ) -> None:
+        """
+        缓存一次检索的结果
+
+        Args:
+            embedding: 查询向量
+            top_k: 检索时的结果数量
+            results: 检索结果
+        """
+        self._entries.append((self._normalize(embedding), top_k, list(results)))
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,12 +1,12 @@
 """
 文本向量化器
 
-支持 Ollama、OpenAI Embedding 和本地模型
+支持 Ollama、OpenAI Embedding 和本地模型（含 int8 量化的 CPU 推理）
 """
 
 import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 import httpx
 import numpy as np
@@ -179,7 +179,8 @@ class MockEmbedder(Embedder):
             dimension: 向量维度
         """
         self._dimension = dimension
-        self._vocab = {}
+        # 词 -> 伪随机词向量缓存，重复出现的词不再重新生成
+        self._vocab: Dict[str, np.ndarray] = {}
         self._vocab_size = 0
 
     @property
@@ -194,8 +195,12 @@ class MockEmbedder(Embedder):
 
         for i, word in enumerate(words):
             # 为每个词分配一个固定的伪随机向量
-            np.random.seed(hash(word) % (2**32))
-            word_vec = np.random.randn(self._dimension)
+            word_vec = self._vocab.get(word)
+            if word_vec is None:
+                np.random.seed(hash(word) % (2**32))
+                word_vec = np.random.randn(self._dimension)
+                self._vocab[word] = word_vec
+                self._vocab_size += 1
 
             # 位置衰减
             decay = 1.0 / (1 + i * 0.1)
@@ -351,16 +356,23 @@ class SentenceTransformerEmbedder(Embedder):
     需要安装: pip install sentence-transformers
     """
 
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: str = None):
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        device: str = None,
+        batch_size: int = 64,
+    ):
         """
         初始化 SentenceTransformer Embedder
 
         Args:
             model_name: 模型名称
             device: 设备 (cpu/cuda)
+            batch_size: 批处理大小
         """
         self.model_name = model_name
         self.device = device
+        self.batch_size = batch_size
         self._model = None
         self._dimension = None
 
@@ -397,14 +409,116 @@ class SentenceTransformerEmbedder(Embedder):
 
     async def embed_texts(self, texts: List[str]) -> List[List[float]]:
         """批量向量化文本"""
+        if not texts:
+            return []
+
         model = self._load_model()
         loop = asyncio.get_event_loop()
         embeddings = await loop.run_in_executor(
-            None, lambda: model.encode(texts).tolist()
+            None,
+            lambda: model.encode(
+                texts,
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ).tolist(),
         )
         return embeddings
 
 
+class QuantizedEmbedder(Embedder):
+    """
+    int8 量化本地向量化器
+
+    通过 optimum-intel 将模型导出为 OpenVINO 格式并做 int8 权重量化，
+    在支持 VNNI 的 CPU 上推理更快、内存占用更小
+    需要安装: pip install "optimum[openvino]"
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        batch_size: int = 64,
+        max_length: int = 512,
+    ):
+        """
+        初始化 int8 Embedder
+
+        Args:
+            model_name: HuggingFace 模型名称
+            batch_size: 批处理大小
+            max_length: 最大 token 数
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._model = None
+        self._tokenizer = None
+        self._dimension = None
+
+    def _load_model(self):
+        """懒加载模型（首次加载时导出并量化）"""
+        if self._model is None:
+            try:
+                from optimum.intel import OVModelForFeatureExtraction
+                from transformers import AutoTokenizer
+            except ImportError:
+                raise ImportError(
+                    'Please install optimum-intel: pip install "optimum[openvino]"'
+                )
+
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self._model = OVModelForFeatureExtraction.from_pretrained(
+                self.model_name, export=True, load_in_8bit=True
+            )
+            self._dimension = self._model.config.hidden_size
+            logger.info(f"Loaded int8 embedding model: {self.model_name}")
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._load_model()
+        return self._dimension
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """同步批量编码：均值池化后 L2 归一化"""
+        model = self._load_model()
+        embeddings = []
+
+        for i in range(0, len(texts), self.batch_size):
+            inputs = self._tokenizer(
+                texts[i : i + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            hidden = np.asarray(model(**inputs).last_hidden_state)
+
+            # 按 attention mask 做均值池化
+            mask = inputs["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            embeddings.extend((pooled / np.maximum(norms, 1e-12)).tolist())
+
+        return embeddings
+
+    async def embed_text(self, text: str) -> List[float]:
+        """向量化单个文本"""
+        embeddings = await self.embed_texts([text])
+        return embeddings[0]
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """批量向量化文本"""
+        if not texts:
+            return []
+        # 在线程池中运行同步推理
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._encode, texts)
+
+
 # 全局 Embedder 实例
 _embedder: Optional[Embedder] = None
 
@@ -414,7 +528,7 @@ def get_embedder(embedder_type: str = None) -> Embedder:
     获取 Embedder 实例
 
     Args:
-        embedder_type: 类型 (ollama/openai/local/mock)，默认从配置读取
+        embedder_type: 类型 (ollama/openai/local/int8/mock)，默认从配置读取
 
     Returns:
         Embedder 实例
@@ -438,8 +552,13 @@ def get_embedder(embedder_type: str = None) -> Embedder:
         _embedder = OpenAIEmbedder()
         logger.info("Using OpenAIEmbedder")
     elif embedder_type == "local":
-        _embedder = SentenceTransformerEmbedder()
+        _embedder = SentenceTransformerEmbedder(
+            model_name=settings.local_embedding_model
+        )
         logger.info("Using SentenceTransformerEmbedder")
+    elif embedder_type == "int8":
+        _embedder = QuantizedEmbedder(model_name=settings.local_embedding_model)
+        logger.info(f"Using QuantizedEmbedder: {settings.local_embedding_model}")
     else:
         _embedder = MockEmbedder()
         logger.warning("Using MockEmbedder for testing")
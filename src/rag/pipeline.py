@@ -10,6 +10,7 @@ from typing import Any, Dict, List, Optional, Union
 from src.core.config import get_settings
 from src.core.logging import get_logger
 
+from .cache import SemanticCache
 from .chunker import ChunkStrategy, TextChunker
 from .document import Document, DocumentChunk, RetrievalResult
 from .embedder import Embedder, get_embedder
@@ -58,6 +59,8 @@ class RAGPipeline:
         chunk_size: int = 500,
         chunk_overlap: int = 50,
         chunk_strategy: ChunkStrategy = ChunkStrategy.FIXED_SIZE,
+        embed_batch_size: int = 64,
+        semantic_cache: Optional[SemanticCache] = None,
     ):
         """
         初始化 RAG 管道
@@ -68,11 +71,14 @@ class RAGPipeline:
             chunk_size: 块大小
             chunk_overlap: 块重叠
             chunk_strategy: 分块策略
+            embed_batch_size: 索引时每批向量化并写入存储的块数量
+            semantic_cache: 语义检索缓存，为空时按配置创建（大小为 0 则不缓存）
         """
         settings = get_settings()
 
         # 初始化组件
         self.embedder = embedder or get_embedder()
+        self.embed_batch_size = embed_batch_size
         self.loader = DocumentLoader()
         self.chunker = TextChunker(
             chunk_size=chunk_size, overlap=chunk_overlap, strategy=chunk_strategy
@@ -91,6 +97,14 @@ class RAGPipeline:
             config=RetrievalConfig(top_k=settings.rag_top_k, score_threshold=0.3),
         )
 
+        # 近似重复查询复用检索结果
+        if semantic_cache is None and settings.rag_semantic_cache_size > 0:
+            semantic_cache = SemanticCache(
+                maxsize=settings.rag_semantic_cache_size,
+                threshold=settings.rag_semantic_cache_threshold,
+            )
+        self.semantic_cache = semantic_cache
+
         # 文档追踪
         self._documents: Dict[str, Document] = {}
         self._initialized = False
@@ -160,17 +174,18 @@ class RAGPipeline:
 
         logger.info(f"Created {len(all_chunks)} chunks")
 
-        # 向量化
+        # 分批向量化并写入存储，每批一次模型调用、一次索引写入
         logger.info("Embedding chunks...")
-        embedded_chunks = await self.embedder.embed_chunks(all_chunks)
-
-        # 存储
-        self.store.add(embedded_chunks)
+        batch_size = self.embed_batch_size
+        for i in range(0, len(all_chunks), batch_size):
+            batch = await self.embedder.embed_chunks(all_chunks[i : i + batch_size])
+            self.store.add(batch)
 
         self._initialized = True
-        logger.info(f"Indexed {len(embedded_chunks)} chunks")
+        self._invalidate_cache()
+        logger.info(f"Indexed {len(all_chunks)} chunks")
 
-        return len(embedded_chunks)
+        return len(all_chunks)
 
     async def add_document(
         self,
@@ -216,7 +231,23 @@ class RAGPipeline:
             logger.warning("RAG pipeline not initialized, no documents indexed")
             return []
 
-        return await self.retriever.retrieve(query, top_k=top_k, filters=filters)
+        cache = self.semantic_cache
+        if cache is None or filters:
+            return await self.retriever.retrieve(query, top_k=top_k, filters=filters)
+
+        # 查询向量只计算一次：先查语义缓存，未命中再检索索引
+        top_k = top_k or self.retriever.config.top_k
+        query_embedding = await self.embedder.embed_text(query)
+        results = cache.lookup(query_embedding, top_k)
+        if results is None:
+            results = self.retriever.retrieve_by_embedding(query_embedding, top_k=top_k)
+            cache.add(query_embedding, top_k, results)
+        return results
+
+    def _invalidate_cache(self) -> None:
+        """索引内容变化后清空语义缓存"""
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
 
     def get_context_for_prompt(
         self, results: List[RetrievalResult], max_length: int = 4000
@@ -286,6 +317,7 @@ class RAGPipeline:
 
         self.store.delete(doc_id)
         del self._documents[doc_id]
+        self._invalidate_cache()
 
         logger.info(f"Deleted document: {doc_id}")
         return True
@@ -344,6 +376,7 @@ class RAGPipeline:
                 )
 
         self._initialized = True
+        self._invalidate_cache()
         logger.info(f"Loaded RAG pipeline from {path}")
 
     def get_stats(self) -> Dict[str, Any]:
@@ -354,6 +387,15 @@ class RAGPipeline:
             "initialized": self._initialized,
             "embedder": type(self.embedder).__name__,
             "store": type(self.store).__name__,
+            "semantic_cache": (
+                {
+                    "size": len(self.semantic_cache),
+                    "hits": self.semantic_cache.hits,
+                    "misses": self.semantic_cache.misses,
+                }
+                if self.semantic_cache is not None
+                else None
+            ),
         }
 
 
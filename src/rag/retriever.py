@@ -80,14 +80,40 @@ class Retriever:
         Returns:
             RetrievalResult 列表
         """
-        top_k = top_k or self.config.top_k
-        score_threshold = score_threshold or self.config.score_threshold
-
         logger.info(f"Retrieving for query: {query[:50]}...")
 
         # 向量化查询
         query_embedding = await self.embedder.embed_text(query)
 
+        return self.retrieve_by_embedding(
+            query_embedding,
+            top_k=top_k,
+            score_threshold=score_threshold,
+            filters=filters,
+        )
+
+    def retrieve_by_embedding(
+        self,
+        query_embedding: List[float],
+        top_k: int = None,
+        score_threshold: float = None,
+        filters: Dict[str, Any] = None,
+    ) -> List[RetrievalResult]:
+        """
+        用已计算的查询向量检索相关文档
+
+        Args:
+            query_embedding: 查询向量
+            top_k: 返回数量
+            score_threshold: 分数阈值
+            filters: 过滤条件
+
+        Returns:
+            RetrievalResult 列表
+        """
+        top_k = top_k or self.config.top_k
+        score_threshold = score_threshold or self.config.score_threshold
+
         # 从向量存储搜索
         results = self.store.search(
             query_embedding, top_k=top_k * 2
@@ -16,6 +16,9 @@ if TYPE_CHECKING:
 
 logger = get_logger("skills.travel")
 
+# "从X到Y" 或 "X到Y"
+_ROUTE_RE = re.compile(r"(?:从)?([^\s到]+)到([^\s的]+)")
+
 
 class TravelQuerySkill(BaseSkill):
     """
@@ -189,8 +192,7 @@ class TravelQuerySkill(BaseSkill):
 
         # 尝试从描述中解析
         # 模式: "从X到Y" 或 "X到Y"
-        pattern = r"(?:从)?([^\s到]+)到([^\s的]+)"
-        match = re.search(pattern, description)
+        match = _ROUTE_RE.search(description)
         if match:
             params["origin"] = params.get("origin") or match.group(1)
             params["destination"] = params.get("destination") or match.group(2)
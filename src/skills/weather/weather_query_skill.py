@@ -15,6 +15,9 @@ if TYPE_CHECKING:
 
 logger = get_logger("skills.weather")
 
+# "X的天气" 或 "X天气"
+_CITY_WEATHER_RE = re.compile(r"([^\s]+?)(?:的)?天气")
+
 
 class WeatherQuerySkill(BaseSkill):
     """
@@ -33,6 +36,24 @@ class WeatherQuerySkill(BaseSkill):
     description = "查询城市天气信息，包括实时天气、预报、穿衣建议。适用于出行规划场景。"
     required_tools = ["mcp_amap_amap_maps_weather"]
 
+    # 描述中直接匹配的常见城市（按顺序取第一个）
+    COMMON_CITIES = (
+        "北京",
+        "上海",
+        "广州",
+        "深圳",
+        "杭州",
+        "成都",
+        "武汉",
+        "南京",
+        "西安",
+        "重庆",
+        "苏州",
+        "天津",
+        "青岛",
+        "厦门",
+    )
+
     # 天气与建议的映射
     WEATHER_SUGGESTIONS = {
         "晴": "天气晴好，适合户外活动，注意防晒。",
@@ -119,30 +140,13 @@ class WeatherQuerySkill(BaseSkill):
 
         # 尝试从描述中提取城市
         # 模式1: "X的天气" 或 "X天气"
-        pattern1 = r"([^\s]+?)(?:的)?天气"
-        match = re.search(pattern1, description)
+        match = _CITY_WEATHER_RE.search(description)
         if match:
             params["city"] = match.group(1)
             return params
 
         # 模式2: 常见城市名直接匹配
-        common_cities = [
-            "北京",
-            "上海",
-            "广州",
-            "深圳",
-            "杭州",
-            "成都",
-            "武汉",
-            "南京",
-            "西安",
-            "重庆",
-            "苏州",
-            "天津",
-            "青岛",
-            "厦门",
-        ]
-        for city in common_cities:
+        for city in self.COMMON_CITIES:
             if city in description:
                 params["city"] = city
                 return params
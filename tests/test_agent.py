@@ -3,8 +3,10 @@ Agent 模块单元测试
 """
 
 import asyncio
+import json
 # 添加项目路径
 import sys
+from datetime import datetime
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock
 
@@ -17,9 +19,11 @@ from agent.memory.long_term import LongTermMemory
 from agent.memory.manager import MemoryManager
 from agent.memory.short_term import ShortTermMemory
 from agent.planner import Planner
+from agent.reasoner import Reasoner
 from agent.schemas.message import Message, MessageRole
 from agent.schemas.task import StepStatus, Task, TaskPlan, TaskStep
 from agent.skill_selector import SkillSelector
+from agent.tool_cache import ToolRunCache
 
 
 class TestTaskSchemas:
@@ -32,6 +36,17 @@ class TestTaskSchemas:
         assert step.status == StepStatus.PENDING
         assert step.result is None
 
+    def test_task_timestamps(self):
+        """测试任务时间戳按需格式化"""
+        task = Task(task_id="t", user_query="q")
+        assert isinstance(task.created_at, int)
+        assert task.completed_at_iso is None
+
+        task.created_at = 1_700_000_000 * 10**9
+        task.completed_at = task.created_at + 1_500_000_000
+        assert task.created_at_iso == datetime.fromtimestamp(1_700_000_000).isoformat()
+        assert task.completed_at_iso.endswith(":21.500000")
+
     def test_task_plan_creation(self):
         """测试 TaskPlan 创建"""
         steps = [
@@ -67,6 +82,78 @@ class TestTaskSchemas:
         next_step = plan.get_next_step()
         assert next_step.step_id == 2
 
+    def test_plan_mark_completed(self):
+        """测试通过 mark_completed 推进就绪队列"""
+        steps = [
+            TaskStep(step_id=1, description="步骤1", skill_name="skill1"),
+            TaskStep(
+                step_id=2, description="步骤2", skill_name="skill2", depends_on=[1]
+            ),
+        ]
+        plan = TaskPlan(
+            plan_id="test", original_query="query", goal="goal", steps=steps
+        )
+        assert [s.step_id for s in plan.get_ready_steps()] == [1]
+
+        plan.mark_completed(1)
+        assert steps[0].status == StepStatus.COMPLETED
+        assert [s.step_id for s in plan.get_ready_steps()] == [2]
+
+        # 重复标记不影响调度状态
+        plan.mark_completed(1)
+        assert [s.step_id for s in plan.get_ready_steps()] == [2]
+
+    def test_plan_to_dict(self):
+        """测试规划字典格式"""
+        step = TaskStep(step_id=1, description="步骤1", skill_name="s", result="x" * 300)
+        plan = TaskPlan(plan_id="p", original_query="q", goal="g", steps=[step])
+
+        data = plan.to_dict()["steps"][0]
+        assert data["skill_name"] == "s"
+        assert data["status"] == "pending"
+        assert len(data["result"]) == 200
+
+    def test_plan_dependency_graph(self):
+        """测试依赖图与拓扑序"""
+        steps = [
+            TaskStep(
+                step_id=1, description="步骤1", skill_name="s", depends_on=[3]
+            ),
+            TaskStep(step_id=2, description="步骤2", skill_name="s"),
+            TaskStep(
+                step_id=3, description="步骤3", skill_name="s", depends_on=[2]
+            ),
+        ]
+        plan = TaskPlan(
+            plan_id="test", original_query="query", goal="goal", steps=steps
+        )
+
+        assert plan.get_topological_order() == [1, 2, 0]
+        assert plan.get_dependents() == [[], [2], [0]]
+        assert plan.get_pending_indegrees() == [1, 0, 1]
+        assert plan.get_blocked_steps() == []
+
+    def test_plan_blocked_steps(self):
+        """测试依赖环上及依赖环的步骤不在拓扑序中"""
+        steps = [
+            TaskStep(step_id=1, description="步骤1", skill_name="s"),
+            TaskStep(
+                step_id=2, description="步骤2", skill_name="s", depends_on=[3]
+            ),
+            TaskStep(
+                step_id=3, description="步骤3", skill_name="s", depends_on=[2]
+            ),
+            TaskStep(
+                step_id=4, description="步骤4", skill_name="s", depends_on=[3]
+            ),
+        ]
+        plan = TaskPlan(
+            plan_id="test", original_query="query", goal="goal", steps=steps
+        )
+
+        assert plan.get_topological_order() == [0]
+        assert [s.step_id for s in plan.get_blocked_steps()] == [2, 3, 4]
+
 
 class TestMemory:
     """测试记忆模块"""
@@ -95,6 +182,20 @@ class TestMemory:
         # 应该只保留最后 3 条
         assert len(memory) == 3
 
+        last_two = memory.get_last_n_messages(2)
+        assert [m.content for m in last_two] == ["消息 3", "消息 4"]
+        assert len(memory.get_last_n_messages(10)) == 3
+
+    def test_short_term_context_summary(self):
+        """测试上下文摘要截断"""
+        memory = ShortTermMemory(max_messages=10)
+        memory.add_user_message("你好")
+        memory.add_assistant_message("长" * 300)
+
+        summary = memory.get_context_summary().split("\n")
+        assert summary[0] == "用户: 你好"
+        assert summary[1] == "助手: " + "长" * 200 + "..."
+
     def test_long_term_memory(self):
         """测试长期记忆"""
         memory = LongTermMemory()
@@ -108,6 +209,55 @@ class TestMemory:
         assert len(entries) == 1
         assert entries[0].content == "测试记忆"
 
+    def test_long_term_memory_request_clock(self):
+        """测试请求级时钟内的记忆共享同一时间戳"""
+        from src.core.clock import request_clock
+
+        memory = LongTermMemory()
+        with request_clock() as fixed:
+            first = memory.store("记忆1")
+            second = memory.store("记忆2")
+
+        assert memory.get_by_id(first).created_at == fixed
+        assert memory.get_by_id(second).created_at == fixed
+
+    def test_long_term_memory_unique_ids(self):
+        """测试删除后再存储不会产生重复 ID"""
+        memory = LongTermMemory()
+        first = memory.store("记忆1")
+        memory.store("记忆2")
+        memory.delete(first)
+        third = memory.store("记忆3")
+
+        assert memory.get_stats()["total_count"] == 2
+        assert third != first
+
+    def test_long_term_memory_retrieve_updates_only_returned(self):
+        """测试检索只更新返回条目的访问信息"""
+        memory = LongTermMemory()
+        low_id = memory.store("低重要性", category="fact", importance=0.1)
+        high_id = memory.store("高重要性", category="fact", importance=0.9)
+
+        entries = memory.retrieve(category="fact", limit=1)
+
+        assert [e.entry_id for e in entries] == [high_id]
+        assert memory.get_by_id(high_id).access_count == 1
+        assert memory.get_by_id(low_id).access_count == 0
+
+    def test_long_term_relevant_history(self):
+        """测试按相关性检索任务历史"""
+        memory = LongTermMemory()
+        memory.store_task_summary("t1", "北京天气怎么样", "北京晴")
+        memory.store_task_summary("t2", "python list sort", "use sorted()")
+        memory.store_task_summary("t3", "上海到杭州的高铁", "G7501")
+
+        history = memory.get_relevant_history("python sort dict", limit=1)
+        assert len(history) == 1
+        assert "python" in history[0]
+
+        history = memory.get_relevant_history("明天北京天气", limit=1)
+        assert "北京天气" in history[0]
+
     def test_memory_manager(self):
         """测试记忆管理器"""
         manager = MemoryManager()
@@ -119,6 +269,75 @@ class TestMemory:
         # 应该有 2 条消息（不含系统消息）
         assert len(context) >= 2
 
+    def test_enhanced_context_skips_long_term(self):
+        """测试关闭长期记忆检索时不访问长期记忆"""
+        manager = MemoryManager()
+        manager.long_term = MagicMock()
+        manager.add_user_input("测试输入")
+
+        context = manager.get_enhanced_context(
+            "测试输入", include_history=False, include_preferences=False
+        )
+
+        manager.long_term.get_relevant_history.assert_not_called()
+        manager.long_term.retrieve.assert_not_called()
+        assert context["relevant_past_tasks"] == []
+        assert context["user_preferences"] == []
+        assert len(context["messages_for_llm"]) == 1
+
+    @pytest.mark.asyncio
+    async def test_rolling_conversation_summary(self):
+        """测试滑出窗口的对话被压缩为摘要"""
+        manager = MemoryManager(context_window=2, summary_trigger_chars=20)
+        mock_llm = AsyncMock()
+        mock_llm.chat.return_value = "用户在问天气"
+
+        manager.add_user_input("北京天气")
+        manager.add_agent_response("晴")
+        assert not await manager.refresh_summary(mock_llm)
+
+        manager.add_user_input("上海天气怎么样，明天会下雨吗")
+        manager.add_agent_response("多云转小雨")
+        assert not await manager.refresh_summary(mock_llm)  # 窗口外内容不足
+
+        manager.add_user_input("广州呢，需要带伞吗，温度大概多少")
+        manager.add_agent_response("有雷阵雨")
+        assert await manager.refresh_summary(mock_llm)
+        assert mock_llm.chat.await_count == 1
+
+        history = manager.get_enhanced_context("深圳呢")["conversation_history"]
+        assert history.startswith("[早前对话摘要]\n用户在问天气")
+        assert history.endswith("助手: 有雷阵雨")
+        assert "北京天气" not in history
+
+        # 摘要已覆盖的对话不会重复触发
+        assert not await manager.refresh_summary(mock_llm)
+
+    @pytest.mark.asyncio
+    async def test_summary_ignores_messages_added_during_llm_call(self):
+        """测试摘要进行中加入的消息在滑出窗口后仍会被摘要"""
+        manager = MemoryManager(context_window=2, summary_trigger_chars=10)
+        mock_llm = AsyncMock()
+
+        async def slow_chat(messages, **kwargs):
+            # 摘要请求未返回时下一轮对话已经开始
+            manager.add_user_input("第三个问题")
+            await asyncio.sleep(0)
+            return "摘要"
+
+        mock_llm.chat.side_effect = slow_chat
+        manager.add_user_input("第一个问题很长很长很长")
+        manager.add_agent_response("第一个回答")
+        manager.add_user_input("第二个问题")
+        manager.add_agent_response("第二个回答")
+        assert await manager.refresh_summary(mock_llm)
+
+        # "第二个问题" 发起摘要时仍在窗口内，之后滑出窗口但尚未被摘要
+        pending = manager.short_term.get_messages_before_window(
+            manager.context_window, since=manager._summarized_upto
+        )
+        assert [m.content for m in pending] == ["第二个问题"]
+
 
 class TestSkillSelector:
     """测试技能选择器"""
@@ -152,6 +371,56 @@ class TestSkillSelector:
         skill = selector.select_skill("nonexistent_skill", fallback=True)
         assert skill == mock_fallback
 
+    def test_skill_fuzzy_match(self):
+        """测试技能名模糊匹配"""
+        from src.core.exceptions import SkillNotFoundException
+
+        selector = SkillSelector()
+        weather = MagicMock()
+        selector.register_skill("query", MagicMock())
+        selector.register_skill("Weather_Query", weather)
+
+        # 忽略大小写的精确匹配优先于先注册的模糊候选
+        assert selector.select_skill("weather_query", fallback=False) is weather
+        selector.unregister_skill("query")
+
+        assert selector.select_skill("weather", fallback=False) is weather
+        assert selector.select_skill("weather_query_skill", fallback=False) is weather
+
+        selector.unregister_skill("Weather_Query")
+        with pytest.raises(SkillNotFoundException):
+            selector.select_skill("weather", fallback=False)
+
+    def test_skills_version(self):
+        """测试技能版本号随注册/注销递增"""
+        selector = SkillSelector()
+        assert selector.skills_version == 0
+
+        selector.register_skill("test_skill", MagicMock())
+        assert selector.skills_version == 1
+
+        selector.unregister_skill("test_skill")
+        selector.unregister_skill("test_skill")
+        assert selector.skills_version == 2
+
+    def test_skill_listing_cached(self):
+        """测试技能列表缓存随注册/注销失效，技能映射为只读视图"""
+        selector = SkillSelector()
+        selector.register_skill("a", MagicMock(), {"description": "A"})
+
+        planner_skills = selector.get_skills_for_planner()
+        skills_list = selector.list_skills()
+        assert selector.list_skills() is skills_list
+        with pytest.raises(TypeError):
+            planner_skills["b"] = {}
+        with pytest.raises(TypeError):
+            selector.get_all_skills()["b"] = MagicMock()
+
+        selector.register_skill("b", MagicMock(), {"description": "B"})
+        assert list(planner_skills) == ["a", "b"]
+        assert selector.available_subset(["a", "c", "b", "a"]) == {"a", "b"}
+        assert [s["name"] for s in selector.list_skills()] == ["a", "b"]
+
 
 class TestPlanner:
     """测试规划器"""
@@ -185,6 +454,592 @@ class TestPlanner:
         assert len(plan.steps) == 1
         assert plan.steps[0].skill_name == "direct_answer"
 
+    @pytest.mark.asyncio
+    async def test_planner_response_cache(self):
+        """测试相同查询复用缓存的规划响应，相似查询不复用"""
+        from src.agent.cache import SemanticResponseCache
+
+        class FakeEmbedder:
+            async def embed_text(self, text):
+                return [1.0, 0.0] if "天气" in text else [0.0, 1.0]
+
+        mock_llm = AsyncMock()
+        mock_llm.chat.return_value = (
+            '{"goal": "g", "reasoning": "r", "steps": [{"step_id": 1, '
+            '"description": "d", "skill_name": "direct_answer", "depends_on": []}]}'
+        )
+        cache = SemanticResponseCache(embedder=FakeEmbedder())
+        planner = Planner(llm=mock_llm, response_cache=cache)
+
+        await planner.plan("北京天气")
+        await planner.plan("北京天气")
+        assert mock_llm.chat.await_count == 1
+        assert cache.exact_hits == 1
+
+        await planner.plan("北京天气", context="用户: 上海呢")
+        await planner.plan("北京天气怎么样")
+        assert mock_llm.chat.await_count == 3
+        assert cache.semantic_hits == 0
+
+    @pytest.mark.asyncio
+    async def test_planner_cache_never_shares_city(self):
+        """测试不同城市的查询即使向量完全相同也不共用规划"""
+        from src.agent.cache import SemanticResponseCache
+
+        class SameVectorEmbedder:
+            async def embed_text(self, text):
+                return [1.0, 0.0]
+
+        def plan_for(messages, **kwargs):
+            city = "北京" if "北京" in messages[-1]["content"] else "上海"
+            return json.dumps(
+                {
+                    "goal": "g",
+                    "steps": [
+                        {
+                            "step_id": 1,
+                            "description": "查询天气",
+                            "skill_name": "weather_query",
+                            "tool_params": {"city": city},
+                        }
+                    ],
+                }
+            )
+
+        mock_llm = AsyncMock()
+        mock_llm.chat.side_effect = plan_for
+        planner = Planner(
+            llm=mock_llm,
+            response_cache=SemanticResponseCache(embedder=SameVectorEmbedder()),
+        )
+
+        beijing = await planner.plan("北京天气")
+        shanghai = await planner.plan("上海天气")
+        assert beijing.steps[0].tool_params == {"city": "北京"}
+        assert shanghai.steps[0].tool_params == {"city": "上海"}
+        assert mock_llm.chat.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_response_cache_ttl(self):
+        """测试 LLM 响应缓存条目过期"""
+        from src.agent.cache import SemanticResponseCache
+
+        cache = SemanticResponseCache(ttl_seconds=0.01)
+        await cache.put("k", "v")
+        assert await cache.get("k") == "v"
+
+        await asyncio.sleep(0.02)
+        assert await cache.get("k") is None
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_skip_trivial_plans(self):
+        """测试无专门技能或寒暄类查询时跳过 LLM 规划"""
+        mock_llm = AsyncMock()
+        mock_llm.chat.return_value = (
+            '{"goal": "g", "steps": [{"step_id": 1, "skill_name": "weather"}]}'
+        )
+        planner = Planner(llm=mock_llm, skip_trivial_plans=True)
+
+        plan = await planner.plan("北京天气怎么样")
+        assert plan.steps[0].skill_name == "direct_answer"
+        assert mock_llm.chat.await_count == 0
+
+        planner.update_skills({"weather": {"description": "天气查询"}})
+        plan = await planner.plan("你好！")
+        assert plan.steps[0].skill_name == "direct_answer"
+        assert mock_llm.chat.await_count == 0
+
+        plan = await planner.plan("北京天气怎么样")
+        assert plan.steps[0].skill_name == "weather"
+        assert mock_llm.chat.await_count == 1
+
+    def test_parse_plan_response_variants(self):
+        """测试规划响应的多种包裹格式"""
+        planner = Planner(llm=AsyncMock())
+        body = '{"goal": "g", "steps": [{"step_id": 1, "skill_name": "weather"}]}'
+
+        for response in (
+            body,
+            f"```json\n{body}\n```",
+            f"```\n{body}\n```",
+            f"好的，规划如下：\n{body}\n以上。",
+        ):
+            data = planner._parse_plan_response(response)
+            assert data["steps"][0]["skill_name"] == "weather"
+
+        fallback = planner._parse_plan_response("无法规划")
+        assert fallback["steps"][0]["skill_name"] == "direct_answer"
+
+    def test_build_task_plan_coerces_types(self):
+        """测试 LLM 输出的字符串序号被转换为整数"""
+        planner = Planner(llm=AsyncMock())
+        plan = planner._build_task_plan(
+            plan_data={
+                "steps": [
+                    {"step_id": "1", "description": "a", "skill_name": "s"},
+                    {"step_id": "2", "skill_name": "s", "depends_on": ["1"]},
+                ]
+            },
+            original_query="q",
+            max_steps=5,
+        )
+
+        assert plan.steps[1].step_id == 2
+        assert plan.steps[1].depends_on == [1]
+        assert plan.steps[0].status == StepStatus.PENDING
+        assert plan.get_topological_order() == [0, 1]
+
+    def test_system_prompt_cached_by_skills_version(self):
+        """测试技能未变化时复用技能列表提示词"""
+        planner = Planner(llm=AsyncMock())
+        first = planner._get_skills_prompt()
+        assert planner._get_skills_prompt() is first
+
+        planner.update_skills({"weather": {"description": "天气查询"}})
+        second = planner._get_skills_prompt()
+        assert second is not first
+        assert "weather" in second
+
+
+class TestReasoner:
+    """测试推理引擎"""
+
+    @pytest.mark.asyncio
+    async def test_synthesize_stream(self):
+        """测试流式生成最终回答"""
+
+        async def fake_stream(messages, temperature=0.7, **kwargs):
+            for chunk in ("北京", "今天", "晴"):
+                yield chunk
+
+        mock_llm = MagicMock()
+        mock_llm.stream_chat = fake_stream
+        reasoner = Reasoner(llm=mock_llm)
+
+        results = {
+            "completed": True,
+            "steps_results": [
+                {"step_id": 1, "status": "completed", "result": "晴"},
+                {"step_id": 2, "status": "completed", "result": "25度"},
+            ],
+        }
+        chunks = [
+            chunk
+            async for chunk in reasoner.synthesize_stream("北京天气", "查天气", results)
+        ]
+        assert chunks == ["北京", "今天", "晴"]
+
+    @pytest.mark.asyncio
+    async def test_direct_result_short_sentence(self):
+        """测试单步骤结果已是完整句子时不调用 LLM"""
+        mock_llm = AsyncMock()
+        reasoner = Reasoner(llm=mock_llm)
+        result = {"step_id": 1, "status": "completed", "result": "今天晴。"}
+
+        answer = await reasoner.synthesize(
+            "天气", "查天气", {"steps_results": [result], "final_result": result}
+        )
+        assert answer == "今天晴。"
+        mock_llm.chat.assert_not_awaited()
+
+
+    def test_format_results_truncates(self):
+        """测试过长结果在格式化时被截断"""
+        reasoner = Reasoner(llm=AsyncMock())
+        text = reasoner._format_results(
+            {
+                "steps_results": [
+                    {"step_id": 1, "status": "completed", "result": "甲" * 2000},
+                    {"step_id": 2, "status": "completed", "result": {"k": "乙" * 2000}},
+                    {"step_id": 3, "status": "failed", "error": "超时"},
+                ]
+            }
+        )
+
+        lines = text.split("\n")
+        assert lines[3] == "结果: " + "甲" * 1000 + "...(已截断)"
+        assert lines[7].startswith('结果: {"k":"乙')
+        assert lines[7].endswith("...(已截断)")
+        assert lines[-1] == "错误: 超时"
+
+
+class TestOrchestrator:
+    """测试 Agent 编排器"""
+
+    @pytest.mark.asyncio
+    async def test_task_result_saved_in_background(self, mock_mcp_client):
+        """测试长期记忆在后台写入，并在下一轮规划前完成"""
+        from agent.orchestrator import AgentOrchestrator
+
+        mock_llm = AsyncMock()
+        mock_llm.chat.return_value = "这是一个足够长的直接回答内容。"
+        orchestrator = AgentOrchestrator(llm=mock_llm, mcp_client=mock_mcp_client)
+        orchestrator.register_skill("direct_answer", AsyncMock(), {"description": "d"})
+
+        response = await orchestrator.chat("介绍一下 Python")
+        assert response["success"]
+        assert orchestrator._pending_writes
+
+        await orchestrator.aclose()
+        assert not orchestrator._pending_writes
+        assert orchestrator.memory.get_memory_stats()["long_term"]["total_count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_summary_does_not_block_next_turn(self, mock_mcp_client):
+        """测试下一轮请求不等待上一轮的后台摘要"""
+        from agent.orchestrator import AgentOrchestrator
+
+        mock_llm = AsyncMock()
+        mock_llm.chat.return_value = "这是一个足够长的直接回答内容。"
+        orchestrator = AgentOrchestrator(llm=mock_llm, mcp_client=mock_mcp_client)
+        orchestrator.register_skill("direct_answer", AsyncMock(), {"description": "d"})
+
+        release = asyncio.Event()
+        calls = []
+
+        async def slow_summary(llm):
+            calls.append(llm)
+            await release.wait()
+
+        orchestrator.memory.refresh_summary = slow_summary
+
+        await orchestrator.chat("介绍一下 Python")
+        response = await asyncio.wait_for(orchestrator.chat("介绍一下 Go"), 1)
+        assert response["success"]
+        # 上一次摘要未完成时不重复发起
+        assert len(calls) == 1
+
+        release.set()
+        await orchestrator.aclose()
+        assert orchestrator._summary_task is None
+
+    @pytest.mark.asyncio
+    async def test_request_clock_shared_with_memory_write(self, mock_mcp_client):
+        """测试规划执行与后台记忆写入共享同一个请求时间"""
+        from agent.orchestrator import AgentOrchestrator
+        from src.core.clock import now
+
+        mock_llm = AsyncMock()
+        mock_llm.chat.return_value = "这是一个足够长的直接回答内容。"
+        orchestrator = AgentOrchestrator(llm=mock_llm, mcp_client=mock_mcp_client)
+        orchestrator.register_skill("direct_answer", AsyncMock(), {"description": "d"})
+
+        seen = []
+        plan_and_execute = orchestrator._plan_and_execute
+
+        async def record_plan(*args):
+            seen.append(now())
+            await asyncio.sleep(0.01)
+            return await plan_and_execute(*args)
+
+        orchestrator._plan_and_execute = record_plan
+        orchestrator.memory.save_task_result = lambda **kw: seen.append(now())
+
+        await orchestrator.chat("介绍一下 Python")
+        await orchestrator.aclose()
+
+        assert len(seen) == 2 and seen[0] == seen[1]
+
+
+class TestBatchedLLM:
+    """测试 LLM 微批处理"""
+
+    @pytest.mark.asyncio
+    async def test_identical_requests_coalesced(self):
+        """测试同一窗口内的相同请求合并为一次调用"""
+        from src.llm.batched import BatchedLLM
+
+        mock_llm = AsyncMock()
+        mock_llm.chat.side_effect = lambda messages, **kw: messages[0]["content"]
+        llm = BatchedLLM(mock_llm, batch_window_ms=5)
+
+        same = [{"role": "user", "content": "hi"}]
+        other = [{"role": "user", "content": "bye"}]
+        results = await asyncio.gather(
+            llm.chat(same), llm.chat(same), llm.chat(other)
+        )
+
+        assert results == ["hi", "hi", "bye"]
+        assert mock_llm.chat.await_count == 2
+        assert llm.get_stats()["coalesced"] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_batch_does_not_block_next(self):
+        """测试上一批次未完成时，新请求不必等待其结束"""
+        from src.llm.batched import BatchedLLM
+
+        async def fake_chat(messages, **kwargs):
+            if messages[0]["content"] == "slow":
+                await asyncio.sleep(0.2)
+            return messages[0]["content"]
+
+        mock_llm = AsyncMock()
+        mock_llm.chat.side_effect = fake_chat
+        llm = BatchedLLM(mock_llm, batch_window_ms=5)
+
+        finished = []
+
+        async def ask(content):
+            finished.append(await llm.chat([{"role": "user", "content": content}]))
+
+        slow = asyncio.create_task(ask("slow"))
+        await asyncio.sleep(0.02)
+        await asyncio.wait_for(ask("fast"), timeout=0.1)
+        await slow
+
+        assert finished == ["fast", "slow"]
+        assert llm.get_stats()["batches"] == 2
+
+
+class TestExecutor:
+    """测试执行器"""
+
+    @pytest.mark.asyncio
+    async def test_call_tool_cached(self, mock_mcp_client):
+        """测试相同工具调用命中缓存"""
+        executor = Executor(skill_selector=SkillSelector(), mcp_client=mock_mcp_client)
+
+        await executor.call_tool("weather_query", {"city": "北京", "type": "live"})
+        await executor.call_tool("weather_query", {"type": "live", "city": "北京"})
+        assert mock_mcp_client.call_tool.await_count == 1
+
+        await executor.call_tool("weather_query", {"city": "上海"})
+        assert mock_mcp_client.call_tool.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_call_tool_cache_expires(self, mock_mcp_client):
+        """测试工具缓存过期后重新调用"""
+        executor = Executor(
+            skill_selector=SkillSelector(),
+            mcp_client=mock_mcp_client,
+            tool_cache_ttl=0.01,
+        )
+
+        params = {"city": "北京", "type": "live"}
+        await executor.call_tool("weather_query", params)
+        await executor.call_tool("weather_query", params)
+        assert mock_mcp_client.call_tool.await_count == 1
+
+        await asyncio.sleep(0.02)
+        await executor.call_tool("weather_query", params)
+        assert mock_mcp_client.call_tool.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_plans_isolated(self, mock_mcp_client):
+        """测试并发执行的规划各自使用独立的上下文与工具缓存"""
+        seen = []
+
+        async def fake_execute(**kwargs):
+            await kwargs["mcp_client"].call_tool("weather_query", {"city": "北京"})
+            await asyncio.sleep(0.01)
+            seen.append((kwargs["context"]["user"], kwargs["context"]["goal"]))
+
+        skill = MagicMock()
+        skill.execute = fake_execute
+        selector = SkillSelector()
+        selector.register_skill("skill", skill)
+        executor = Executor(skill_selector=selector, mcp_client=mock_mcp_client)
+
+        def make_plan(plan_id):
+            steps = [
+                TaskStep(step_id=1, description="步骤1", skill_name="skill"),
+                TaskStep(
+                    step_id=2, description="步骤2", skill_name="skill", depends_on=[1]
+                ),
+            ]
+            return TaskPlan(
+                plan_id=plan_id, original_query="q", goal=plan_id, steps=steps
+            )
+
+        results = await asyncio.gather(
+            executor.execute_plan(make_plan("a"), context={"user": "a"}),
+            executor.execute_plan(make_plan("b"), context={"user": "b"}),
+        )
+
+        assert all(r["completed"] for r in results)
+        assert sorted(seen) == [("a", "a"), ("a", "a"), ("b", "b"), ("b", "b")]
+        # 同一规划内复用工具结果，不同规划之间不共享
+        assert mock_mcp_client.call_tool.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_call_tool_no_cache(self, mock_mcp_client):
+        """测试 __no_cache__ 跳过缓存"""
+        executor = Executor(skill_selector=SkillSelector(), mcp_client=mock_mcp_client)
+
+        params = {"city": "北京", "__no_cache__": True}
+        await executor.call_tool("weather_query", params)
+        await executor.call_tool("weather_query", params)
+        assert mock_mcp_client.call_tool.await_count == 2
+        mock_mcp_client.call_tool.assert_awaited_with("weather_query", {"city": "北京"})
+
+    @pytest.mark.asyncio
+    async def test_execute_plan_parallel_steps(self, mock_mcp_client):
+        """测试无依赖步骤并发执行"""
+        running = 0
+        max_running = 0
+
+        async def fake_execute(**kwargs):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return kwargs["description"]
+
+        skill = MagicMock()
+        skill.execute = fake_execute
+        selector = SkillSelector()
+        selector.register_skill("skill", skill)
+
+        steps = [
+            TaskStep(step_id=1, description="步骤1", skill_name="skill"),
+            TaskStep(step_id=2, description="步骤2", skill_name="skill"),
+            TaskStep(
+                step_id=3, description="步骤3", skill_name="skill", depends_on=[1, 2]
+            ),
+        ]
+        plan = TaskPlan(plan_id="p", original_query="q", goal="g", steps=steps)
+
+        executor = Executor(skill_selector=selector, mcp_client=mock_mcp_client)
+        results = await executor.execute_plan(plan)
+
+        assert results["completed"]
+        assert max_running == 2
+        assert [r["step_id"] for r in results["steps_results"]] == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_execute_plan_max_parallel_steps(self, mock_mcp_client):
+        """测试步骤并发上限"""
+        running = 0
+        max_running = 0
+
+        async def fake_execute(**kwargs):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        skill = MagicMock()
+        skill.execute = fake_execute
+        selector = SkillSelector()
+        selector.register_skill("skill", skill)
+
+        steps = [
+            TaskStep(step_id=i, description=f"步骤{i}", skill_name="skill")
+            for i in range(1, 5)
+        ]
+        plan = TaskPlan(plan_id="p", original_query="q", goal="g", steps=steps)
+
+        executor = Executor(
+            skill_selector=selector, mcp_client=mock_mcp_client, max_parallel_steps=2
+        )
+        results = await executor.execute_plan(plan)
+
+        assert results["completed"]
+        assert max_running == 2
+
+    @pytest.mark.asyncio
+    async def test_execute_plan_cyclic_dependencies(self, mock_mcp_client):
+        """测试存在循环依赖的规划直接失败，不执行任何步骤"""
+        skill = MagicMock()
+        skill.execute = AsyncMock(return_value="ok")
+        selector = SkillSelector()
+        selector.register_skill("skill", skill)
+
+        steps = [
+            TaskStep(step_id=1, description="步骤1", skill_name="skill"),
+            TaskStep(
+                step_id=2, description="步骤2", skill_name="skill", depends_on=[3]
+            ),
+            TaskStep(
+                step_id=3, description="步骤3", skill_name="skill", depends_on=[2]
+            ),
+        ]
+        plan = TaskPlan(plan_id="p", original_query="q", goal="g", steps=steps)
+
+        executor = Executor(skill_selector=selector, mcp_client=mock_mcp_client)
+        results = await executor.execute_plan(plan)
+
+        assert not results["completed"]
+        assert [r["step_id"] for r in results["steps_results"]] == [2, 3]
+        assert all(r["status"] == "failed" for r in results["steps_results"])
+        assert steps[1].status == StepStatus.FAILED
+        skill.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_execute_plan_fail_fast(self, mock_mcp_client):
+        """测试步骤失败后停止执行"""
+        skill = MagicMock()
+        skill.execute = AsyncMock(side_effect=RuntimeError("boom"))
+        selector = SkillSelector()
+        selector.register_skill("skill", skill)
+
+        steps = [
+            TaskStep(step_id=1, description="步骤1", skill_name="skill"),
+            TaskStep(
+                step_id=2, description="步骤2", skill_name="skill", depends_on=[1]
+            ),
+        ]
+        plan = TaskPlan(plan_id="p", original_query="q", goal="g", steps=steps)
+
+        executor = Executor(skill_selector=selector, mcp_client=mock_mcp_client)
+        results = await executor.execute_plan(plan)
+
+        assert not results["completed"]
+        assert len(results["steps_results"]) == 1
+        assert results["steps_results"][0]["status"] == "failed"
+        assert steps[1].status == StepStatus.PENDING
+
+    @pytest.mark.asyncio
+    async def test_tool_concurrency_and_timeout(self):
+        """测试按工具名限制并发及调用超时"""
+        from src.core.exceptions import ToolCallException
+
+        running = {}
+        max_running = {}
+
+        async def fake_call_tool(tool_name, arguments=None):
+            running[tool_name] = running.get(tool_name, 0) + 1
+            max_running[tool_name] = max(
+                max_running.get(tool_name, 0), running[tool_name]
+            )
+            await asyncio.sleep(arguments.get("delay", 0.01))
+            running[tool_name] -= 1
+            return tool_name
+
+        client = MagicMock()
+        client.call_tool = fake_call_tool
+        executor = Executor(
+            skill_selector=SkillSelector(),
+            mcp_client=client,
+            tool_concurrency={"slow_api": 1},
+            default_tool_concurrency=3,
+            tool_timeout=0.5,
+        )
+
+        await asyncio.gather(
+            *(executor.call_tool("slow_api", {"i": i}) for i in range(3)),
+            *(executor.call_tool("fast_api", {"i": i}) for i in range(3)),
+        )
+        assert max_running == {"slow_api": 1, "fast_api": 3}
+
+        with pytest.raises(ToolCallException):
+            await executor.call_tool("slow_api", {"delay": 1})
+
+    def test_tool_run_cache_lru(self):
+        """测试缓存 LRU 淘汰"""
+        cache = ToolRunCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert len(cache) == 2
+
 
 class TestMessage:
     """测试消息结构"""
@@ -197,6 +1052,257 @@ class TestMessage:
         assert llm_format["role"] == "user"
         assert llm_format["content"] == "测试消息"
 
+    def test_message_llm_format_cached(self):
+        """测试短期记忆复用预生成的 LLM 格式"""
+        memory = ShortTermMemory(max_messages=5)
+        memory.set_system_message("系统")
+        msg = memory.add_user_message("你好")
+
+        first = memory.get_messages_for_llm()
+        second = memory.get_messages_for_llm()
+
+        assert first[0] == {"role": "system", "content": "系统"}
+        assert first[1] is msg.get_llm_format()
+        assert second[1] is first[1]
+
+        assert json.loads(memory.get_messages_json()) == first
+
+
+
+class _FakeMCPClient:
+    """按工具名返回预设结果的 MCP 客户端，记录调用参数与最大并发数"""
+
+    def __init__(self, responses, delay: float = 0.01):
+        self.responses = responses
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def call_tool(self, tool_name, arguments=None):
+        self.calls.append((tool_name, arguments))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            response = self.responses[tool_name]
+            return response(arguments) if callable(response) else response
+        finally:
+            self.running -= 1
+
+
+_WEATHER_RESULT = {
+    "success": True,
+    "data": {"weather": "晴", "temperature": 25, "suggestion": "适合出行"},
+}
+_TRAIN_RESULT = {
+    "success": True,
+    "data": {"date": "2024-01-16", "total": 0, "trains": []},
+}
+
+
+def _system_time_result(arguments):
+    """system_time 工具：get_current 返回今天，parse_relative 返回解析后的日期"""
+    if arguments["action"] == "get_current":
+        return {"success": True, "data": {"date": "2024-01-15"}}
+    return {"success": True, "data": {"parsed_date": "2024-01-16"}}
+
+
+class TestChatService:
+    """测试聊天服务"""
+
+    @pytest.fixture
+    def chat_service(self, monkeypatch):
+        """使用模拟 MCP 客户端、内存工具记录器的聊天服务"""
+        from types import SimpleNamespace
+
+        from src.agent import tool_recorder
+        from src.api.chat_service import ChatService
+
+        monkeypatch.setattr(
+            tool_recorder, "_global_recorder", tool_recorder.ToolRecorder()
+        )
+        service = ChatService()
+        service._initialized = True
+        service._mcp = SimpleNamespace(
+            client=_FakeMCPClient(
+                {
+                    "weather_query": _WEATHER_RESULT,
+                    "12306_query": _TRAIN_RESULT,
+                    "system_time": _system_time_result,
+                }
+            )
+        )
+        return service
+
+    @pytest.mark.asyncio
+    async def test_weather_and_train_run_concurrently(self, chat_service):
+        """测试天气与车票查询并发执行，回复按意图顺序合并"""
+        from src.api.schemas import ChatRequest
+
+        response = await chat_service.chat(
+            ChatRequest(message="北京到上海的高铁，顺便查下上海天气")
+        )
+
+        client = chat_service._mcp.client
+        assert client.max_running == 2
+        assert response.reply.index("当前天气") < response.reply.index("🚄")
+        assert [d.type for d in response.structured_data] == ["weather", "train"]
+
+    @pytest.mark.asyncio
+    async def test_failed_handler_does_not_drop_others(self, chat_service):
+        """测试一个查询出错时仍返回其他查询的结果"""
+        from src.api.schemas import ChatRequest
+
+        async def broken(*args):
+            raise RuntimeError("boom")
+
+        chat_service._handle_weather = broken
+        response = await chat_service.chat(
+            ChatRequest(message="北京到上海的高铁，顺便查下上海天气")
+        )
+
+        assert response.reply.startswith("🚄 北京 → 上海")
+        assert [d.type for d in response.structured_data] == ["train"]
+
+    @pytest.mark.asyncio
+    async def test_train_date_from_relative_expression(self, chat_service):
+        """测试当前日期与相对日期并发解析，车票按解析后的日期查询"""
+        await chat_service._handle_train("明天北京到上海的高铁")
+
+        client = chat_service._mcp.client
+        assert [c[0] for c in client.calls] == [
+            "system_time",
+            "system_time",
+            "12306_query",
+        ]
+        assert client.max_running == 2
+        assert client.calls[-1][1]["date"] == "2024-01-16"
+
+    @pytest.mark.asyncio
+    async def test_train_date_falls_back_to_today(self, chat_service):
+        """测试相对日期解析失败时按今天查询"""
+
+        def system_time(arguments):
+            if arguments["action"] == "get_current":
+                return {"success": True, "data": {"date": "2024-01-15"}}
+            return {"success": False, "error": "无法解析"}
+
+        client = chat_service._mcp.client
+        client.responses["system_time"] = system_time
+        await chat_service._handle_train("明天北京到上海的高铁")
+
+        assert client.calls[-1][0] == "12306_query"
+        assert client.calls[-1][1]["date"] == "2024-01-15"
+
+    @pytest.mark.asyncio
+    async def test_result_cache_hit_and_expiry(self, chat_service):
+        """测试相同查询命中结果缓存，过期后重新查询"""
+        chat_service._weather_cache = ToolRunCache(maxsize=8, ttl_seconds=0.05)
+        client = chat_service._mcp.client
+
+        await chat_service._handle_weather("北京天气")
+        await chat_service._handle_weather("北京今天天气怎么样")
+        assert len(client.calls) == 1
+
+        await chat_service._handle_weather("上海天气")
+        assert len(client.calls) == 2
+
+        await asyncio.sleep(0.06)
+        await chat_service._handle_weather("北京天气")
+        assert len(client.calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_result_cache_skips_failures(self, chat_service):
+        """测试失败的查询结果不缓存"""
+        chat_service._weather_cache = ToolRunCache(maxsize=8, ttl_seconds=60)
+        client = chat_service._mcp.client
+        client.responses["weather_query"] = {"success": False, "error": "限流"}
+
+        reply, data = await chat_service._handle_weather("北京天气")
+        assert data.type == "error"
+        await chat_service._handle_weather("北京天气")
+        assert len(client.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_chat_stream_events(self, chat_service, monkeypatch):
+        """测试通用对话逐片段输出 token 事件，最后输出 done 事件"""
+        from src.api import chat_service as chat_service_module
+        from src.api.schemas import ChatRequest
+
+        class FakeOllama:
+            async def chat_stream(self, **kwargs):
+                for chunk in ("你好", "，", "世界"):
+                    yield chunk
+
+        monkeypatch.setattr(chat_service_module, "get_ollama_client", FakeOllama)
+        events = [
+            e async for e in chat_service.chat_stream(ChatRequest(message="你好"))
+        ]
+
+        assert [e["event"] for e in events] == ["token", "token", "token", "done"]
+        assert [e["data"] for e in events[:3]] == ["你好", "，", "世界"]
+        assert [e["index"] for e in events[:3]] == [0, 1, 2]
+        assert events[-1]["structured_data"] == []
+
+        # 工具类查询一次性输出回复，done 事件携带结构化数据
+        events = [
+            e
+            async for e in chat_service.chat_stream(
+                ChatRequest(message="北京天气", session_id=events[-1]["session_id"])
+            )
+        ]
+        assert [e["event"] for e in events] == ["token", "done"]
+        assert events[-1]["structured_data"][0]["type"] == "weather"
+        assert events[-1]["sources"] == ["weather_api"]
+
+    @pytest.mark.asyncio
+    async def test_chat_stream_error_event(self, chat_service, monkeypatch):
+        """测试生成中途出错时输出 error 事件"""
+        from src.api import chat_service as chat_service_module
+        from src.api.schemas import ChatRequest
+
+        class BrokenOllama:
+            async def chat_stream(self, **kwargs):
+                yield "你好"
+                raise ConnectionError("连接中断")
+
+        monkeypatch.setattr(chat_service_module, "get_ollama_client", BrokenOllama)
+        events = [
+            e async for e in chat_service.chat_stream(ChatRequest(message="你好"))
+        ]
+
+        assert [e["event"] for e in events] == ["token", "error"]
+        assert events[-1]["message"] == "连接中断"
+
+    @pytest.mark.asyncio
+    async def test_initialize_runs_once(self):
+        """测试并发的首批请求只初始化一次"""
+        from src.api.chat_service import ChatService
+
+        service = ChatService()
+        calls = []
+
+        async def slow_init():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            service._initialized = True
+
+        service._initialize_components = slow_init
+        await asyncio.gather(*(service.initialize() for _ in range(5)))
+        await service.initialize()
+
+        assert len(calls) == 1
+        assert service._initialized
+
+    def test_extract_city_list_priority(self):
+        """测试多个城市时按已知城市列表顺序取城市"""
+        from src.api.chat_service import ChatService
+
+        assert ChatService._extract_city("杭州明天天气") == "杭州"
+        assert ChatService._extract_city("杭州和北京哪里天气好") == "北京"
+        assert ChatService._extract_city("今天天气怎么样") is None
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -280,6 +280,35 @@ AI Agent 有哪些核心组件?
     print("=" * 60)
 
 
+def test_semantic_cache():
+    """测试语义检索缓存：近似重复查询复用结果，索引变化后失效"""
+    from src.rag import RAGPipeline, SemanticCache
+    from src.rag.embedder import MockEmbedder
+
+    cache = SemanticCache(maxsize=2, threshold=0.95)
+    assert cache.lookup([1.0, 0.0], top_k=3) is None
+    cache.add([1.0, 0.0], top_k=3, results=["a", "b", "c"])
+    assert cache.lookup([0.99, 0.01], top_k=2) == ["a", "b"]
+    assert cache.lookup([0.0, 1.0], top_k=2) is None
+    # 缓存的结果数量不足时不命中
+    assert cache.lookup([1.0, 0.0], top_k=5) is None
+    assert cache.hits == 1 and cache.misses == 3
+
+    rag = RAGPipeline(embedder=MockEmbedder(), semantic_cache=SemanticCache())
+
+    async def run():
+        await rag.add_document("AI Agent 包含 规划器 执行器 记忆系统", title="agent")
+        first = await rag.retrieve("AI Agent 规划器", top_k=3)
+        second = await rag.retrieve("AI Agent 规划器", top_k=3)
+        assert second == first
+        assert rag.semantic_cache.hits == 1
+
+        await rag.add_document("RAG 是 检索增强生成", title="rag")
+        assert len(rag.semantic_cache) == 0
+
+    asyncio.run(run())
+
+
 if __name__ == "__main__":
     print("开始 RAG 测试...\n")
 
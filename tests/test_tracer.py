@@ -5,14 +5,25 @@
 """
 
 import asyncio
+import io
+import json
+import logging
+import subprocess
 import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
 
 sys.path.insert(0, "E:\\SkillMCP-Agent")
 
-from src.agent.tool_recorder import (ToolRecorder, get_tool_recorder,
+from src.agent import tool_recorder as tool_recorder_module
+from src.agent import tracer as tracer_module
+from src.agent.tool_recorder import (SQLiteToolRecorder, ToolCallEntry,
+                                     ToolRecorder, get_tool_recorder,
                                      record_tool_call)
-from src.agent.tracer import (AgentTracer, TraceEventType, create_tracer,
-                              get_tracer)
+from src.agent.tracer import (AgentTracer, TraceEventType, _ConsoleMessage,
+                              create_tracer, get_tracer)
 
 
 def test_tracer():
@@ -63,6 +74,200 @@ def test_tracer():
     print("\n✅ 追踪器测试完成")
 
 
+def test_trace_context():
+    """测试追踪上下文：退出时发送单个带耗时的事件，并复用上下文对象"""
+    tracer = AgentTracer(enable_console=False)
+
+    with tracer.trace(TraceEventType.PLANNER_START, {"query": "q"}) as outer:
+        with tracer.trace(TraceEventType.LLM_CALL_START):
+            pass
+
+    types = [e.event_type for e in tracer.events]
+    assert types == [TraceEventType.LLM_CALL_END, TraceEventType.PLANNER_END]
+    assert tracer.events[0].parent_id == tracer.trace_id
+    assert tracer.events[1].parent_id is None
+    assert tracer.events[1].data == {"query": "q"}
+    assert all(e.duration_ms is not None for e in tracer.events)
+    assert tracer.events[0].timestamp_ns <= tracer.events[1].timestamp_ns
+    assert tracer.events[1].to_dict()["timestamp"].startswith(
+        str(tracer.events[1].timestamp.year)
+    )
+
+    # 退出后的上下文被下一次 trace() 复用
+    try:
+        with tracer.trace(TraceEventType.MCP_CALL_START) as ctx:
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert ctx is outer
+    assert "[mcp_call_end]" in str(_ConsoleMessage([(tracer.events[-1], 1)]))
+    assert tracer.events[-1].event_type == TraceEventType.MCP_CALL_END
+    assert tracer.events[-1].data == {"error": "boom"}
+
+    # mode="both" 额外发送开始事件
+    with tracer.trace(TraceEventType.RAG_QUERY_START, {"query": "q"}, mode="both"):
+        pass
+    assert [e.event_type for e in list(tracer.events)[-2:]] == [
+        TraceEventType.RAG_QUERY_START,
+        TraceEventType.RAG_QUERY_END,
+    ]
+    assert tracer.events[-2].duration_ms is None
+
+
+def test_tracer_batching():
+    """测试事件缓冲：达到阈值或 end() 时批量通知监听器"""
+    tracer = AgentTracer(enable_console=False, flush_threshold=3)
+    received = []
+    batches = []
+
+    class BatchListener:
+        def __call__(self, event):
+            raise AssertionError("on_batch should be used")
+
+        def on_batch(self, events):
+            batches.append(len(events))
+
+    tracer.add_listener(received.append, safe=False)
+    tracer.add_listener(BatchListener())
+
+    tracer.start(query="q")
+    tracer.log_intent("weather")
+    assert received == []
+    tracer.log_skill_selected("weather_skill")
+    assert len(received) == 3
+    assert batches == [3]
+
+    tracer.log_event(TraceEventType.MCP_CALL_START, {"tool": "t"})
+    tracer.end(success=True)
+    assert len(received) == 5
+    assert batches == [3, 2]
+    assert len(tracer.events) == 5
+    assert tracer.events[-1].data["total_events"] == 4
+
+    # NDJSON 报告：汇总行 + 每个事件一行
+    buf = io.StringIO()
+    tracer.stream_report(buf)
+    lines = [json.loads(line) for line in buf.getvalue().splitlines()]
+    assert lines[0]["kind"] == "report"
+    assert lines[0]["event_count"] == 5
+    assert [line["kind"] for line in lines[1:]] == ["event"] * 5
+
+
+def test_tracer_listener_isolation():
+    """测试出错的监听器不影响其后的监听器"""
+    tracer = AgentTracer(enable_console=False)
+    received = []
+
+    def broken(event):
+        raise RuntimeError("boom")
+
+    tracer.add_listener(broken)
+    tracer.add_listener(received.append)
+
+    tracer.start(query="q")
+    tracer.log_intent("weather")
+    tracer.end(success=True)
+    assert len(received) == len(tracer.events) == 3
+
+
+def test_latest_tracer_published_on_end():
+    """测试追踪结束后才作为最近追踪发布，导出报告时遍历快照"""
+    previous = tracer_module.get_latest_tracer()
+    tracer = tracer_module.create_tracer(enable_console=False)
+    tracer.start(query="q")
+    assert tracer_module.get_latest_tracer() is previous
+    tracer.log_intent("weather")
+    tracer.end(success=True)
+    assert tracer_module.get_latest_tracer() is tracer
+
+    lines = tracer.iter_report_lines()
+    next(lines)
+    tracer.log_intent("train")
+    tracer.flush()
+    assert len(list(lines)) == 3
+
+
+def test_tracer_event_limit():
+    """测试事件与工具调用记录的数量上限"""
+    tracer = AgentTracer(enable_console=False, flush_threshold=2, max_events=3)
+    tracer.start(query="q")
+    for i in range(4):
+        tracer.log_tool_call(f"tool_{i}", {})
+    tracer.end()
+
+    assert len(tracer.events) == 3
+    assert tracer.dropped_events == 3
+    assert tracer.events[-1].data["total_events"] == 5
+    assert [t.tool_name for t in tracer.tool_calls] == ["tool_1", "tool_2", "tool_3"]
+    report = tracer.get_report()
+    assert report["dropped_events"] == 3
+    assert report["dropped_tool_calls"] == 1
+
+
+def test_tracer_context_var():
+    """测试当前追踪器按上下文隔离，end() 后恢复"""
+
+    async def run(name):
+        tracer = create_tracer(trace_id=name, enable_console=False)
+        tracer.start(query=name)
+        await asyncio.sleep(0)
+        assert get_tracer() is tracer
+        tracer.end()
+        return get_tracer()
+
+    async def main():
+        outer = create_tracer(trace_id="outer", enable_console=False)
+        leftovers = await asyncio.gather(run("a"), run("b"))
+        assert leftovers == [outer, outer]
+        assert get_tracer() is outer
+        outer.start()
+        outer.end()
+
+    asyncio.run(main())
+
+
+def test_tracer_async_listener():
+    """测试异步监听器在同一事件循环中被调度"""
+
+    async def main():
+        tracer = AgentTracer(enable_console=False, flush_threshold=2)
+        received = []
+
+        async def listener(event):
+            received.append(event.event_type)
+
+        tracer.add_async_listener(listener)
+        tracer.start(query="q")
+        tracer.end()
+        await asyncio.sleep(0)
+        assert received == [TraceEventType.AGENT_START, TraceEventType.AGENT_END]
+
+    asyncio.run(main())
+
+
+def test_tracer_async_console():
+    """测试经后台线程输出的控制台日志"""
+    records = []
+    handler = logging.Handler()
+    handler.emit = lambda record: records.append(record.getMessage())
+    level = tracer_module.logger.level
+    tracer_module.logger.addHandler(handler)
+    tracer_module.logger.setLevel(logging.INFO)
+    try:
+        tracer = AgentTracer(enable_console="async")
+        tracer.start(query="北京天气")
+        tracer.end()
+        for _ in range(100):
+            if records:
+                break
+            time.sleep(0.01)
+    finally:
+        tracer_module.logger.removeHandler(handler)
+        tracer_module.logger.setLevel(level)
+
+    assert records and "[agent_start]" in records[0]
+
+
 def test_tool_recorder():
     """测试工具记录器"""
     print("\n" + "=" * 60)
@@ -143,27 +348,295 @@ def test_tool_recorder():
     print("✅ 工具记录器测试完成")
 
 
+def test_tool_recorder_indexes():
+    """测试工具记录器二级索引随淘汰同步更新"""
+    recorder = ToolRecorder(max_entries=3)
+
+    first = recorder.start_call("weather_query", {}, session_id="s1", trace_id="t1")
+    recorder.end_call(first.id, error="超时")
+    recorder.record_call("train_query", {}, result={}, session_id="s1")
+    recorder.record_call("weather_query", {}, error="失败", session_id="s2")
+
+    assert [e.id for e in recorder.get_calls_by_tool("weather_query")][0] == first.id
+    assert len(recorder.get_calls_by_session("s1")) == 2
+    assert recorder.get_calls_by_trace("t1") == [first]
+    assert len(recorder.get_failed_calls()) == 2
+
+    # 超出上限后最早的记录被淘汰，索引同步移除
+    recorder.record_call("train_query", {}, result={}, session_id="s2")
+    assert len(recorder.get_calls_by_tool("weather_query")) == 1
+    assert len(recorder.get_calls_by_session("s1")) == 1
+    assert recorder.get_calls_by_trace("t1") == []
+    assert len(recorder.get_failed_calls()) == 1
+    assert [e.tool_name for e in recorder.get_recent_calls(2)] == [
+        "weather_query",
+        "train_query",
+    ]
+    assert len(recorder.get_all_calls()) == 3
+
+
+def test_tool_recorder_statistics():
+    """测试工具记录器增量统计"""
+    recorder = ToolRecorder(max_entries=3)
+
+    recorder.record_call("weather_query", {}, error="失败", duration_ms=30.0)
+    recorder.record_call("weather_query", {}, result={}, duration_ms=10.0)
+    recorder.record_call("train_query", {}, result={}, duration_ms=20.0)
+
+    stats = recorder.get_statistics()
+    assert recorder.get_statistics() is stats
+    assert stats["total_calls"] == 3
+    assert stats["failed_calls"] == 1
+    assert stats["min_duration_ms"] == 10.0
+    assert stats["max_duration_ms"] == 30.0
+    assert stats["tool_stats"]["weather_query"]["success_rate"] == 50.0
+
+    # 淘汰最早的（最慢的）记录后统计随之更新
+    recorder.record_call("train_query", {}, result={}, duration_ms=15.0)
+    stats = recorder.get_statistics()
+    assert stats["failed_calls"] == 0
+    assert stats["max_duration_ms"] == 20.0
+    assert stats["avg_duration_ms"] == 15.0
+    assert stats["tool_stats"]["weather_query"] == {
+        "count": 1,
+        "success": 1,
+        "total_duration_ms": 10.0,
+        "avg_duration_ms": 10.0,
+        "success_rate": 100.0,
+    }
+
+    assert [e.duration_ms for e in recorder.top_slow(2)] == [20.0, 15.0]
+    assert [e.duration_ms for e in recorder.top_fast(1)] == [10.0]
+
+    # 0ms 的调用（如命中缓存）同样计入耗时统计
+    recorder.record_call("cache_hit", {}, result={}, duration_ms=0.0)
+    stats = recorder.get_statistics()
+    assert stats["min_duration_ms"] == 0.0
+    assert stats["avg_duration_ms"] == 35.0 / 3
+
+
+def test_tool_recorder_persistence():
+    """测试工具记录器追加写入与重新加载"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage_path = Path(tmp_dir) / "tool_calls.jsonl"
+        recorder = ToolRecorder(storage_path=str(storage_path), max_entries=2)
+
+        entry = recorder.start_call("weather_query", {"city": "北京"})
+        recorder.end_call(entry.id, result={"temp": 25})
+        recorder.record_call("train_query", {}, error="失败")
+        recorder.record_call("system_time", {}, result={})
+        recorder.close()
+
+        # 每次调用追加一行，加载时只保留最近 max_entries 条
+        assert len(storage_path.read_text(encoding="utf-8").splitlines()) == 3
+        loaded = ToolRecorder(storage_path=str(storage_path), max_entries=2)
+        assert [e.tool_name for e in loaded.get_all_calls()] == [
+            "train_query",
+            "system_time",
+        ]
+        assert loaded.get_failed_calls()[0].error == "失败"
+        loaded.record_batch(
+            [
+                {"tool_name": "weather_query", "arguments": {}, "result": {}},
+                {"tool_name": "train_query", "arguments": {}, "error": "失败"},
+            ]
+        )
+        loaded.close()
+        # 文件行数超过 2 * max_entries 后压缩为当前记录
+        reloaded = ToolRecorder(storage_path=str(storage_path), max_entries=2)
+        assert reloaded._stored_lines == 2
+        assert [e.tool_name for e in reloaded.get_all_calls()] == [
+            "weather_query",
+            "train_query",
+        ]
+
+        loaded.clear()
+        assert not storage_path.exists()
+
+
+def test_tool_recorder_close_flushes():
+    """测试关闭或退出解释器时写完队列中的记录"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage_path = Path(tmp_dir) / "tool_calls.jsonl"
+        recorder = ToolRecorder(storage_path=str(storage_path))
+        for i in range(50):
+            recorder.record_call("weather_query", {"i": i}, result={})
+        recorder.close()
+        assert recorder._writer is None
+        reopened = ToolRecorder(storage_path=str(storage_path))
+        assert len(reopened.get_all_calls()) == 50
+
+        # 未调用 close() 直接退出时由 atexit 写完记录
+        exit_path = Path(tmp_dir) / "exit_calls.jsonl"
+        script = (
+            "from src.agent.tool_recorder import ToolRecorder\n"
+            f"recorder = ToolRecorder(storage_path={str(exit_path)!r})\n"
+            "for i in range(50):\n"
+            "    recorder.record_call('weather_query', {'i': i}, result={})\n"
+        )
+        subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=str(Path(__file__).parent.parent),
+            check=True,
+        )
+        assert len(exit_path.read_text(encoding="utf-8").splitlines()) == 50
+
+
+def test_tool_recorder_legacy_import():
+    """测试首次启动时导入旧版 JSON 存储"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = Path(tmp_dir) / "tool_calls.json"
+        storage_path = Path(tmp_dir) / "tool_calls.jsonl"
+        old = ToolRecorder(max_entries=10)
+        old.record_call("weather_query", {"city": "北京"}, result={"temp": 25})
+        old.record_call("train_query", {}, error="失败")
+        legacy_path.write_text(
+            json.dumps(
+                {"entries": [e.to_dict() for e in old.get_all_calls()], "saved_at": ""}
+            ),
+            encoding="utf-8",
+        )
+
+        recorder = ToolRecorder(storage_path=str(storage_path), max_entries=10)
+        assert [e.tool_name for e in recorder.get_all_calls()] == [
+            "weather_query",
+            "train_query",
+        ]
+        assert recorder.get_failed_calls()[0].error == "失败"
+        # 导入结果已写成 JSON Lines，再次启动直接读取新文件
+        assert len(storage_path.read_text(encoding="utf-8").splitlines()) == 2
+        assert legacy_path.exists()
+        reloaded = ToolRecorder(storage_path=str(storage_path), max_entries=10)
+        assert len(reloaded.get_all_calls()) == 2
+
+
+def test_sqlite_tool_recorder():
+    """测试 SQLite 存储的工具记录器"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = str(Path(tmp_dir) / "tool_calls.db")
+        recorder = SQLiteToolRecorder(storage_path=db_path, max_entries=3)
+
+        entry = recorder.start_call("weather_query", {}, session_id="s1")
+        assert recorder.get_call(entry.id) is entry
+        recorder.end_call(entry.id, error="超时")
+        recorder.record_batch(
+            [
+                {"tool_name": "train_query", "arguments": {}, "duration_ms": 20.0},
+                {"tool_name": "weather_query", "arguments": {}, "duration_ms": 10.0},
+            ]
+        )
+
+        assert len(recorder.get_calls_by_tool("weather_query")) == 2
+        assert recorder.get_failed_calls()[0].id == entry.id
+        assert recorder.get_calls_by_session("s1")[0].error == "超时"
+
+        stats = recorder.get_statistics()
+        assert stats["total_calls"] == 3
+        assert stats["failed_calls"] == 1
+        assert stats["max_duration_ms"] == 20.0
+        assert stats["tool_stats"]["weather_query"]["success_rate"] == 50.0
+
+        # 超出上限后淘汰最早的记录
+        recorder.record_call("system_time", {}, result={})
+        assert [e.tool_name for e in recorder.get_recent_calls(10)] == [
+            "train_query",
+            "weather_query",
+            "system_time",
+        ]
+        assert [e.tool_name for e in recorder.top_slow(1)] == ["train_query"]
+        assert [e.tool_name for e in recorder.top_fast(1)] == ["system_time"]
+        recorder.close()
+
+        reopened = SQLiteToolRecorder(storage_path=db_path, max_entries=3)
+        assert len(reopened.get_all_calls()) == 3
+        reopened.clear()
+        assert reopened.get_statistics()["total_calls"] == 0
+        reopened.close()
+
+
+def test_sqlite_tool_recorder_writer():
+    """测试 SQLite 记录器在写线程写库，并按条数淘汰"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = str(Path(tmp_dir) / "tool_calls.db")
+        recorder = SQLiteToolRecorder(storage_path=db_path, max_entries=3)
+        writer_threads = set()
+        write_item = recorder._write_item
+
+        def record_thread(item):
+            writer_threads.add(threading.current_thread().name)
+            write_item(item)
+
+        recorder._write_item = record_thread
+
+        first = recorder.record_call("a", {}, result={})
+        recorder.record_call("b", {}, result={})
+        recorder.record_call("c", {}, result={})
+        # 重复写入同一调用会分配新的 rowid，不能按 rowid 区间淘汰
+        recorder._save_to_storage(first)
+        recorder._save_to_storage(first)
+        assert [e.tool_name for e in recorder.get_all_calls()] == ["b", "c", "a"]
+
+        recorder.record_call("d", {}, result={})
+        assert [e.tool_name for e in recorder.get_all_calls()] == ["c", "a", "d"]
+        assert writer_threads == {"tool-recorder-writer"}
+        assert not recorder.entries
+        recorder.close()
+
+
+def test_tool_call_entry_timestamps():
+    """测试调用条目时间戳序列化及旧格式兼容"""
+    entry = ToolCallEntry(id="call_1", tool_name="weather_query", arguments={})
+    entry.complete(result={})
+    data = entry.to_dict()
+    assert isinstance(data["start_ts"], float)
+    assert ToolCallEntry.from_dict(data).end_ts == entry.end_ts
+
+    legacy = ToolCallEntry.from_dict(
+        {
+            "id": "call_2",
+            "tool_name": "weather_query",
+            "start_time": "2024-01-15T10:00:00",
+            "end_time": "2024-01-15T10:00:01.500000",
+        }
+    )
+    assert (legacy.end_ts - legacy.start_ts) == 1.5
+    assert legacy.start_time.isoformat() == "2024-01-15T10:00:00"
+
+
 def test_global_recorder():
     """测试全局记录器"""
     print("\n" + "=" * 60)
     print("测试 3: 全局记录器 (便捷函数)")
     print("=" * 60 + "\n")
 
-    # 使用便捷函数
-    entry = record_tool_call(
-        tool_name="test_tool",
-        arguments={"param": "value"},
-        result={"status": "ok"},
-        session_id="global_test",
-    )
-
-    print(f"记录成功: {entry.id}")
-    print(f"工具: {entry.tool_name}")
-    print(f"成功: {entry.success}")
-
-    # 获取全局记录器
-    global_recorder = get_tool_recorder()
-    print(f"\n全局记录器中的记录数: {len(global_recorder.get_all_calls())}")
+    # 全局记录器指向临时目录，避免测试写入数据目录
+    previous = tool_recorder_module._global_recorder
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage_path = Path(tmp_dir) / "tool_calls.jsonl"
+        tool_recorder_module._global_recorder = ToolRecorder(
+            storage_path=str(storage_path)
+        )
+        try:
+            # 使用便捷函数
+            entry = record_tool_call(
+                tool_name="test_tool",
+                arguments={"param": "value"},
+                result={"status": "ok"},
+                session_id="global_test",
+            )
+
+            print(f"记录成功: {entry.id}")
+            print(f"工具: {entry.tool_name}")
+            print(f"成功: {entry.success}")
+
+            # 获取全局记录器
+            global_recorder = get_tool_recorder()
+            assert global_recorder.get_call(entry.id) is entry
+            count = len(global_recorder.get_all_calls())
+            print(f"\n全局记录器中的记录数: {count}")
+        finally:
+            tool_recorder_module._global_recorder.close()
+            tool_recorder_module._global_recorder = previous
 
     print("\n✅ 全局记录器测试完成")
 
@@ -253,7 +726,23 @@ def main():
 
     # 同步测试
     test_tracer()
+    test_trace_context()
+    test_tracer_batching()
+    test_tracer_listener_isolation()
+    test_latest_tracer_published_on_end()
+    test_tracer_event_limit()
+    test_tracer_context_var()
+    test_tracer_async_listener()
+    test_tracer_async_console()
     test_tool_recorder()
+    test_tool_recorder_indexes()
+    test_tool_recorder_statistics()
+    test_tool_recorder_persistence()
+    test_tool_recorder_close_flushes()
+    test_tool_recorder_legacy_import()
+    test_sqlite_tool_recorder()
+    test_sqlite_tool_recorder_writer()
+    test_tool_call_entry_timestamps()
     test_global_recorder()
 
     # 异步测试